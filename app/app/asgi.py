@@ -0,0 +1,29 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, for example ``uvicorn app.asgi:application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# serve read endpoints with async views, see core.async_views
+os.environ.setdefault('ASYNC_READS', '1')
+
+django.setup(set_prefix=False)
+
+from django.conf import settings  # noqa: E402
+
+from core.async_views import StreamingASGIHandler  # noqa: E402
+from core.warmup import warm_up  # noqa: E402
+
+application = StreamingASGIHandler()
+
+if settings.WARM_UP_ON_LOAD:
+    warm_up()
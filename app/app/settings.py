@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -39,12 +40,13 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'core',
-    'users',
-    'recipe',
+    'core.apps.CoreConfig',
+    'users.apps.UsersConfig',
+    'recipe.apps.RecipeConfig',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,6 +77,24 @@ TEMPLATES = [
 WSGI_APPLICATION = 'app.wsgi.application'
 
 
+# Caches. Response cache versions, token versions and primary pins are
+# shared between worker processes through them, so outside DEBUG a
+# process local backend fails the system checks, see core.checks; set
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache and
+# CACHE_LOCATION=host:11211 for instance.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+REQUIRE_SHARED_CACHE = os.environ.get(
+    'REQUIRE_SHARED_CACHE', '0' if DEBUG else '1'
+) == '1'
+
+
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
@@ -85,9 +105,49 @@ DATABASES = {
         'NAME': os.environ.get("DB_NAME"),
         'USER': os.environ.get("DB_USER"),
         'PASSWORD': os.environ.get("DB_PASS"),
+        # seconds a connection is kept for following requests: 0 closes
+        # it after every request, "none" keeps it open indefinitely
+        'CONN_MAX_AGE': (
+            None if os.environ.get('DB_CONN_MAX_AGE', '').lower() == 'none'
+            else int(os.environ.get('DB_CONN_MAX_AGE', 60))
+        ),
     }
 }
 
+# Ping persistent connections at the start of each request and replace
+# broken ones, see core.db
+DB_HEALTH_CHECKS = os.environ.get('DB_HEALTH_CHECKS', '1') == '1'
+
+# Read replicas, see core.routers. DB_REPLICA_HOSTS lists `host[:port]`
+# of servers replicating the primary; list and retrieve requests read
+# from one of them, picked by DB_REPLICA_SELECTION (random, round_robin,
+# first or least_lag) among those at most DB_REPLICA_MAX_LAG seconds
+# behind. Without such a replica they read from the primary, or with
+# DB_REPLICA_LAG_FALLBACK=replica from the least lagging one. Users are
+# pinned to the primary for DB_PRIMARY_PIN_SECONDS after a write, which
+# should exceed the lag allowed. Deployments running several worker
+# processes must point DB_PIN_CACHE_ALIAS at a cache shared between them.
+DB_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get(
+        'DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica{index}'] = dict(
+        DATABASES['default'], HOST=host, PORT=port,
+        TEST={'MIRROR': 'default'},
+    )
+    DB_REPLICAS.append(f'replica{index}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DB_REPLICA_SELECTION = os.environ.get('DB_REPLICA_SELECTION', 'random')
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+DB_REPLICA_LAG_FALLBACK = os.environ.get('DB_REPLICA_LAG_FALLBACK', 'primary')
+DB_REPLICA_LAG_CHECK_INTERVAL = float(
+    os.environ.get('DB_REPLICA_LAG_CHECK_INTERVAL', 1)
+)
+DB_PRIMARY_PIN_SECONDS = float(os.environ.get('DB_PRIMARY_PIN_SECONDS', 10))
+DB_PIN_CACHE_ALIAS = 'default'
+
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -131,4 +191,120 @@ MEDIA_URL = '/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.User'
+
+REST_FRAMEWORK = {
+    # orjson when installed, the stock encoder otherwise, see
+    # core.renderers
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    # proxies in front of the app, whose X-Forwarded-For entries the
+    # request budgets trust, see core.throttling; with none the header is
+    # ignored, as clients can send any
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Keyset pagination of list endpoints, enabled per request by `cursor`
+# or `page_size` query params
+PAGINATION_PAGE_SIZE = int(os.environ.get('PAGINATION_PAGE_SIZE', 100))
+PAGINATION_MAX_PAGE_SIZE = int(
+    os.environ.get('PAGINATION_MAX_PAGE_SIZE', 500)
+)
+# Unpaginated lists longer than this are streamed as a JSON array in
+# chunks of STREAM_LIST_CHUNK_SIZE rows instead of rendered at once, see
+# recipe.rows
+STREAM_LIST_MIN_ROWS = int(os.environ.get('STREAM_LIST_MIN_ROWS', 5000))
+STREAM_LIST_CHUNK_SIZE = int(os.environ.get('STREAM_LIST_CHUNK_SIZE', 2000))
+
+# In-process token authentication cache, see users.authentication
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 300))
+# Cache holding per-user credential versions checked on every cache hit,
+# so a token deleted or user changed in one worker process stops
+# authenticating in all of them; must be shared between the processes
+TOKEN_CACHE_VERSION_ALIAS = 'default'
+
+# Per-token and per-address read and write budgets of the recipe and user
+# endpoints, see core.throttling. An empty rate turns that budget off.
+# Counters live in a file mapped by every worker process on the host, on
+# /dev/shm where available so it never touches a disk.
+THROTTLE_RATES = {
+    scope: os.environ.get(f'THROTTLE_{scope.upper()}', default)
+    for scope, default in (
+        ('token_read', '1200/min'),
+        ('token_write', '300/min'),
+        ('ip_read', '6000/min'),
+        ('ip_write', '600/min'),
+    )
+} if os.environ.get('THROTTLE_ENABLED', '1') == '1' else {}
+THROTTLE_STORE_PATH = os.environ.get('THROTTLE_STORE_PATH', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'recipe-app-throttle'
+))
+THROTTLE_STORE_SLOTS = int(os.environ.get('THROTTLE_STORE_SLOTS', 65536))
+# Test runs count budgets in a store of their own and get a second
+# database standing in for a replica, see core.test_runner
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Versioned per-user list response cache, see recipe.cache
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Number of users whose in-process facet index is kept, see recipe.facets
+FACET_INDEX_MAX_USERS = int(os.environ.get('FACET_INDEX_MAX_USERS', 1000))
+# Facet filters matching more recipes than this are run as subqueries
+# instead of listing the matched ids in the query
+FACET_MAX_ID_LIST = int(os.environ.get('FACET_MAX_ID_LIST', 500))
+
+# Full-text recipe search, see recipe.search. The in-memory index is only
+# used on databases without native full-text search (SQLite in tests).
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 100))
+SEARCH_INDEX_MAX_USERS = int(os.environ.get('SEARCH_INDEX_MAX_USERS', 100))
+
+# Bulk recipe writes, see recipe.bulk
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 10000))
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 500))
+
+# Uploads are always streamed to a temporary file in chunks instead of
+# being buffered in memory, and moved into MEDIA_ROOT on save
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Recipe image thumbnails, generated by a process pool of
+# THUMBNAIL_WORKERS processes (0 generates them inline), see
+# recipe.thumbnails
+THUMBNAIL_SIZES = (128, 512, 1024)
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Media files are stored under the sha256 of their content, see
+# core.storage, and served by core.views.serve_media. Set
+# MEDIA_ACCEL_REDIRECT to an internal nginx location aliasing MEDIA_ROOT
+# to let the proxy send file bodies instead of the app server.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
+
+# Rows fetched per server-side cursor round trip by recipe exports, see
+# recipe.export
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Under ASGI (app.asgi sets ASYNC_READS) list and retrieve actions are
+# async views running the ORM in a pool of ASYNC_DB_THREADS threads, each
+# holding its own database connection, see core.async_views
+ASYNC_READS = os.environ.get('ASYNC_READS', '0') == '1'
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 8))
+
+# Open connections, resolve urls and build serializers when app.wsgi or
+# app.asgi is loaded, see core.warmup. Turn off for servers that load
+# the application before forking workers (gunicorn --preload), which
+# must not share connections.
+WARM_UP_ON_LOAD = os.environ.get('WARM_UP_ON_LOAD', '1') == '1'
+
+# Per request sql, serialize and auth timings, sent in a Server-Timing
+# header when SERVER_TIMING and aggregated by view on /metrics, which
+# requires `Authorization: Bearer METRICS_TOKEN` when that is set, see
+# core.metrics
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
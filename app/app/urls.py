@@ -13,14 +13,26 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 from django.conf import settings
 
+from core.views import DatabaseStatsView, metrics, serve_media
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/user/", include('users.urls')),
     path("api/recipe/", include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path(
+        "api/health/db/", DatabaseStatsView.as_view(), name='database-stats'
+    ),
+    path("metrics", metrics, name='metrics'),
+    re_path(
+        r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        serve_media,
+        name='media'
+    ),
+]
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/2.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+from core.warmup import warm_up  # noqa: E402
+
+if settings.WARM_UP_ON_LOAD:
+    warm_up()
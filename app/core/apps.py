@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        """ connect media, recipe count, connection and query signals and
+        register system checks """
+        from core import checks, db, metrics, signals  # noqa: F401
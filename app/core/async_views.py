@@ -0,0 +1,158 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+
+from core.db import check_connections, count_closed_connections
+
+
+# viewset actions served off the event loop under ASGI
+ASYNC_ACTIONS = ('list', 'retrieve')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_THREADS,
+                thread_name_prefix='db',
+            )
+        return _executor
+
+
+def _open_connections(barrier):
+    barrier.wait()
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def open_thread_connections():
+    """ start every database thread and connect it ahead of requests """
+    executor = _get_executor()
+    # each thread blocks until all are started, so no thread takes two
+    barrier = threading.Barrier(settings.ASYNC_DB_THREADS, timeout=30)
+    futures = [
+        executor.submit(_open_connections, barrier)
+        for _ in range(settings.ASYNC_DB_THREADS)
+    ]
+    for future in futures:
+        future.result()
+
+
+def _run_in_request_scope(view, request, args, kwargs):
+    """ run view and render its response in a database thread
+
+    Django only manages connections of the thread its request signals run
+    in, so connections of the pool threads get the same per request
+    health check and CONN_MAX_AGE handling here.
+    """
+    close_old_connections()
+    check_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+        count_closed_connections()
+
+
+def async_reads(view):
+    """ return async version of a viewset view for serving under ASGI
+
+    ASYNC_ACTIONS run in a bounded pool of database threads while the
+    event loop keeps serving other connections, so slow clients cost a
+    coroutine instead of a thread. Other actions, such as writes, run in
+    Django's thread for sync code as before.
+    """
+    actions = view.actions
+    sync_view = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        method = 'get' if request.method == 'HEAD' else request.method.lower()
+        if actions.get(method) in ASYNC_ACTIONS:
+            return await sync_to_async(
+                _run_in_request_scope, thread_sensitive=False,
+                executor=_get_executor()
+            )(view, request, args, kwargs)
+
+        return await sync_view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class AsyncReadMixin:
+    """ viewset mixin serving read actions asynchronously when ASYNC_READS """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if settings.ASYNC_READS:
+            return async_reads(view)
+        return view
+
+
+def _close_stream(response):
+    """ close response and the connections of the thread that read it """
+    try:
+        response.close()
+    finally:
+        connections.close_all()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """ ASGI handler reading streaming responses off the event loop
+
+    Django 3.2 iterates streaming content, like recipe exports, on the
+    event loop, where the ORM refuses to run. Each stream is read in a
+    thread of its own instead, which also keeps server-side cursors of
+    the stream on one connection.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ] + [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        ]
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        in_thread = partial(
+            sync_to_async, thread_sensitive=False, executor=executor
+        )
+        parts = iter(response)
+        try:
+            while True:
+                part = await in_thread(next)(parts, None)
+                if part is None:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            await send({'type': 'http.response.body'})
+        finally:
+            await in_thread(_close_stream)(response)
+            executor.shutdown(wait=False)
@@ -0,0 +1,90 @@
+import time
+
+
+def percentile(sorted_samples, fraction):
+    """ return nearest-rank percentile of already sorted samples """
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(
+        len(sorted_samples) - 1,
+        int(round(fraction * len(sorted_samples))) - 1
+    ))
+    return sorted_samples[rank]
+
+
+def summarize(samples):
+    """ return count, mean and p50/p95/p99 of samples in milliseconds """
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        'count': count,
+        'mean_ms': sum(ordered) / count * 1000 if count else 0.0,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+    }
+
+
+def format_summary(label, summary):
+    """ return one line report of summarize() result """
+    return (
+        f"{label}: n={summary['count']} mean={summary['mean_ms']:.3f}ms "
+        f"p50={summary['p50_ms']:.3f}ms p95={summary['p95_ms']:.3f}ms "
+        f"p99={summary['p99_ms']:.3f}ms"
+    )
+
+
+def timed(func, *args, **kwargs):
+    """ call func and return (elapsed seconds, result) """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+# metric: (whether higher values are better, smallest change that counts
+# as a regression whatever the tolerance) compared by compare_runs()
+COMPARED_METRICS = {
+    'throughput': (True, 0.0),
+    'p95_ms': (False, 0.0),
+    # means over a mix of cached and uncached responses
+    'queries_per_request': (False, 0.5),
+}
+
+
+def compare_runs(baseline, current, tolerance):
+    """ compare endpoint results of two runs
+
+    Returns (label, metric, before, after, regressed) for every endpoint
+    and metric both runs report; regressed when after is worse than
+    before by more than the tolerance fraction.
+    """
+    rows = []
+    for label, after in sorted(current['endpoints'].items()):
+        before = baseline['endpoints'].get(label)
+        if before is None:
+            continue
+        for metric, (higher_is_better, slack) in COMPARED_METRICS.items():
+            if before.get(metric) is None or after.get(metric) is None:
+                continue
+            change = after[metric] - before[metric]
+            if higher_is_better:
+                change = -change
+            regressed = change > max(before[metric] * tolerance, slack)
+            rows.append(
+                (label, metric, before[metric], after[metric], regressed)
+            )
+
+    return rows
+
+
+def server_errors(results):
+    """ return {label: count} of 5xx responses of endpoint results """
+    errors = {}
+    for label, endpoint in sorted(results['endpoints'].items()):
+        count = sum(
+            count for code, count in endpoint['statuses'].items()
+            if int(code) >= 500
+        )
+        if count:
+            errors[label] = count
+    return errors
@@ -0,0 +1,182 @@
+import io
+
+from django.db import connection
+from django.db.models import Case, Value, When
+
+
+def can_return_bulk_ids():
+    """ return whether bulk_create sets primary keys on this database """
+    features = connection.features
+    return getattr(
+        features,
+        'can_return_rows_from_bulk_insert',
+        getattr(features, 'can_return_ids_from_bulk_insert', False)
+    )
+
+
+def bulk_insert(model, objs, batch_size):
+    """ insert objects in batches and return them with primary keys set
+
+    Must run inside a transaction. On SQLite, which cannot return keys
+    from a multi-row INSERT, the first object is saved alone and the rest
+    get the following keys: the open write transaction locks the whole
+    database, so no other writer can take them. Other databases without
+    key returning fall back to one INSERT per object.
+    """
+    if not objs or can_return_bulk_ids():
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+
+    if connection.vendor != 'sqlite':
+        for obj in objs:
+            obj.save(force_insert=True)
+        return objs
+
+    first, rest = objs[0], objs[1:]
+    first.save(force_insert=True)
+    for pk, obj in enumerate(rest, start=first.pk + 1):
+        obj.pk = pk
+    model.objects.bulk_create(rest, batch_size=batch_size)
+
+    return objs
+
+
+def bulk_update_fields(model, objs, fields, batch_size):
+    """ write given fields of objects with one CASE UPDATE per batch """
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        updates = {}
+        for field in fields:
+            output_field = model._meta.get_field(field)
+            updates[field] = Case(
+                *[When(pk=obj.pk, then=Value(getattr(obj, field)))
+                  for obj in batch],
+                output_field=output_field
+            )
+        model.objects.filter(pk__in=[obj.pk for obj in batch]).update(
+            **updates
+        )
+
+
+def bulk_link(relation, links, batch_size, replace_ids=()):
+    """ write (source id, target id) rows of a M2M relation in bulk
+
+    Existing rows of `replace_ids` sources are deleted first, giving
+    `set()` semantics without per-object queries or m2m_changed signals.
+    `links` must be a list.
+    """
+    through = relation.through
+    source = relation.field.m2m_field_name()
+    target = relation.field.m2m_reverse_field_name()
+
+    if replace_ids:
+        through.objects.filter(**{f'{source}__in': replace_ids}).delete()
+
+    # plain multi-row INSERTs: building a model instance per row costs
+    # more than the database work for these two-column rows
+    quote = connection.ops.quote_name
+    columns = [
+        through._meta.get_field(name).column for name in (source, target)
+    ]
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(
+        columns, links
+    ) or batch_size)
+    sql = 'INSERT INTO {} ({}) VALUES '.format(
+        quote(through._meta.db_table), ', '.join(map(quote, columns))
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(links), batch_size):
+            batch = links[start:start + batch_size]
+            cursor.execute(
+                sql + ', '.join(['(%s, %s)'] * len(batch)),
+                [value for link in batch for value in link]
+            )
+
+
+def _copy_value(value):
+    """ return value in PostgreSQL COPY text format """
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(table, columns, rows):
+    """ load rows into table with one COPY FROM STDIN """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {table} ({", ".join(columns)}) FROM STDIN', buffer
+        )
+
+
+def reserve_ids(model, count):
+    """ return count new primary keys taken from model's PostgreSQL
+    sequence, for rows loaded with copy_rows """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+            "FROM generate_series(1, %s)",
+            [model._meta.db_table, count]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def insert_rows(model, columns, rows, batch_size):
+    """ insert tuples of column values and return their primary keys
+
+    A leaner bulk_insert for generated data: no model instances are
+    built, so values must already be in database form. Must run inside
+    a transaction. PostgreSQL loads rows with COPY under reserved keys;
+    SQLite numbers rows after the first as bulk_insert does; other
+    databases fall back to bulk_insert.
+    """
+    if not rows:
+        return []
+
+    table = model._meta.db_table
+    pk_column = model._meta.pk.column
+    if connection.vendor == 'postgresql':
+        ids = reserve_ids(model, len(rows))
+        copy_rows(table, (pk_column,) + tuple(columns), (
+            (pk,) + tuple(row) for pk, row in zip(ids, rows)
+        ))
+        return ids
+    if connection.vendor != 'sqlite':
+        objs = bulk_insert(model, [
+            model(**dict(zip(columns, row))) for row in rows
+        ], batch_size)
+        return [obj.pk for obj in objs]
+
+    quote = connection.ops.quote_name
+    placeholders = '({})'.format(', '.join(['%s'] * (len(columns) + 1)))
+    sql = 'INSERT INTO {} ({}) VALUES '.format(
+        quote(table), ', '.join(map(quote, (pk_column,) + tuple(columns)))
+    )
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(
+        (pk_column,) + tuple(columns), rows
+    ) or batch_size)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {} ({}) VALUES ({})'.format(
+                quote(table), ', '.join(map(quote, columns)),
+                ', '.join(['%s'] * len(columns))
+            ),
+            list(rows[0])
+        )
+        first = connection.ops.last_insert_id(cursor, table, pk_column)
+        ids = list(range(first, first + len(rows)))
+        for start in range(1, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                sql + ', '.join([placeholders] * len(batch)),
+                [
+                    value for pk, row in zip(ids[start:], batch)
+                    for value in (pk,) + tuple(row)
+                ]
+            )
+
+    return ids
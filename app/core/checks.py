@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# backends keeping entries in the memory of each process
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# settings naming cache aliases whose entries worker processes share
+SHARED_CACHE_SETTINGS = (
+    'RESPONSE_CACHE_ALIAS', 'TOKEN_CACHE_VERSION_ALIAS', 'DB_PIN_CACHE_ALIAS'
+)
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """ fail on shared state kept in a process local cache when
+    REQUIRE_SHARED_CACHE, as other workers would never see its changes """
+    if not settings.REQUIRE_SHARED_CACHE:
+        return []
+
+    errors = []
+    for name in SHARED_CACHE_SETTINGS:
+        alias = getattr(settings, name)
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_BACKENDS:
+            errors.append(Error(
+                f"{name} cache '{alias}' uses {backend}, which is not "
+                f"shared between worker processes.",
+                hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared "
+                     "cache such as memcached.",
+                id='core.E001',
+            ))
+
+    return errors
@@ -0,0 +1,86 @@
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+class ConnectionStats:
+    """ per-process counters of database connection lifecycle events
+
+    opened: new connections established
+    reused: requests that started on an already open connection
+    recycled: open connections found broken on reuse and dropped
+    closed: connections closed by Django between requests
+    """
+
+    EVENTS = ('opened', 'reused', 'recycled', 'closed')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.EVENTS, 0)
+
+    def incr(self, event):
+        with self._lock:
+            self._counts[event] += 1
+
+    def snapshot(self):
+        """ return a copy of the counters """
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.EVENTS, 0)
+
+
+connection_stats = ConnectionStats()
+
+
+@receiver(connection_created)
+def count_opened(sender, connection, **kwargs):
+    """ count a newly established connection """
+    connection._stats_open = True
+    connection_stats.incr('opened')
+
+
+def _count_closed(connection):
+    """ count connection if Django closed it since it was last seen open """
+    if connection.connection is None and \
+            getattr(connection, '_stats_open', False):
+        connection._stats_open = False
+        connection_stats.incr('closed')
+        return True
+
+    return False
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """ health check persistent connections at the start of a request
+
+    Runs after Django's close_old_connections. A connection kept open
+    from an earlier request may have been dropped by the server or a
+    proxy meanwhile; it is pinged and, if broken, closed so the request
+    transparently opens a fresh one instead of failing on first query.
+    """
+    for connection in connections.all():
+        if _count_closed(connection) or connection.connection is None:
+            continue
+        if connection.in_atomic_block or not settings.DB_HEALTH_CHECKS or \
+                connection.is_usable():
+            connection_stats.incr('reused')
+            continue
+
+        connection_stats.incr('recycled')
+        connection.close()
+        connection._stats_open = False
+
+
+@receiver(request_finished)
+def count_closed_connections(**kwargs):
+    """ count connections closed by Django when a request finished """
+    for connection in connections.all():
+        _count_closed(connection)
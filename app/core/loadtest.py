@@ -0,0 +1,179 @@
+import asyncio
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+
+HOST = '127.0.0.1'
+
+# server: package serving it
+SERVERS = {'wsgi': 'gunicorn', 'asgi': 'uvicorn'}
+
+# query count reported in Server-Timing, see core.metrics
+QUERIES_RE = re.compile(r'sql;[^,]*desc="(\d+) queries"')
+
+
+def server_command(server, port, options):
+    """ return argv starting server on port """
+    if server == 'wsgi':
+        return [
+            sys.executable, '-m', 'gunicorn', 'app.wsgi:application',
+            '--bind', f'{HOST}:{port}', '--workers', str(options['workers']),
+            '--worker-class', 'gthread', '--threads', str(options['threads']),
+            '--backlog', '2048', '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+        '--host', HOST, '--port', str(port),
+        '--workers', str(options['workers']), '--backlog', '2048',
+        '--log-level', 'warning', '--no-access-log',
+    ]
+
+
+def wait_for_port(port, timeout):
+    """ wait until a server accepts connections on port """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"Server did not start listening on port {port}")
+
+
+@contextmanager
+def serving(server, port, options, **env):
+    """ run the app under server on port, with env added to its
+    environment, until the block exits """
+    # load comes from one address and a few tokens, which the request
+    # budgets would cut off, so they are off unless env turns them on
+    env = {
+        **os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+        'THROTTLE_ENABLED': '0', **env,
+    }
+    process = subprocess.Popen(
+        server_command(server, port, options), cwd=settings.BASE_DIR, env=env
+    )
+    try:
+        wait_for_port(port, timeout=30)
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+class LoadResult:
+    """ latencies and failures of one load run, grouped by label """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        # per label, query counts of responses reporting them
+        self.queries = defaultdict(list)
+        self.errors = Counter()
+        self.elapsed = 0.0
+
+    @property
+    def completed(self):
+        return sum(len(samples) for samples in self.samples.values())
+
+    @property
+    def throughput(self):
+        """ completed requests per second """
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+
+async def _read_response(reader):
+    """ read one HTTP/1.1 response, return (status, headers) """
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+
+    return status, headers
+
+
+def _encode_request(host, request):
+    """ return bytes of a (method, path, headers, body) request """
+    method, path, headers, body = request
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    if body:
+        lines.append(f'Content-Length: {len(body)}')
+
+    return '\r\n'.join(lines).encode('latin1') + b'\r\n\r\n' + (body or b'')
+
+
+async def _client(host, port, next_request, deadline, result):
+    """ send requests over one keep-alive connection until deadline """
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        label, request = next_request()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(_encode_request(host, request))
+            status, headers = await _read_response(reader)
+            result.samples[label].append(time.perf_counter() - start)
+            result.statuses[label][status] += 1
+            keep_alive = headers.get('connection') != 'close'
+            match = QUERIES_RE.match(headers.get('server-timing', ''))
+            if match is not None:
+                result.queries[label].append(int(match.group(1)))
+        except (OSError, ValueError, asyncio.IncompleteReadError) as exc:
+            result.errors[type(exc).__name__] += 1
+            keep_alive = False
+            # back off a little so a refusing server is not spun on
+            await asyncio.sleep(0.01)
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+def run_load(host, port, next_request, connections, duration):
+    """ drive the server with concurrent keep-alive connections
+
+    next_request() returns (label, (method, path, headers, body)) of the
+    next request to send. Each of `connections` clients sends requests
+    back to back for `duration` seconds; latencies are grouped by label.
+    """
+    result = LoadResult()
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _client(host, port, next_request, deadline, result)
+            for _ in range(connections)
+        ))
+        result.elapsed = time.perf_counter() - start
+
+    asyncio.run(main())
+
+    return result
@@ -0,0 +1,468 @@
+import importlib.util
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.benchmark import compare_runs, server_errors, summarize
+from core.loadtest import HOST, SERVERS, run_load, serving
+from core.models import Tag, Ingredient, Recipe
+from core.seed import seed_recipes, seed_users
+
+
+# scale profiles: seeded users, and recipes, tags and ingredients of each
+PROFILES = {
+    'small': {'users': 10, 'recipes': 100, 'tags': 20, 'ingredients': 50},
+    'medium': {
+        'users': 100, 'recipes': 1000, 'tags': 50, 'ingredients': 200
+    },
+    'large': {
+        'users': 1000, 'recipes': 1000, 'tags': 50, 'ingredients': 200
+    },
+}
+
+PREFIX = 'benchmark-endpoints'
+# users created through users:create during a run
+SIGNUP_PREFIX = 'benchmark-signup'
+PASSWORD = 'benchmark-password'
+
+# ids of each user's rows requests pick from
+SAMPLE_SIZE = 50
+
+
+class Fixture:
+    """ token and sampled row ids of one seeded user """
+
+    def __init__(self, user, token):
+        self.email = user.email
+        self.headers = {'Authorization': f'Token {token.key}'}
+        self.recipe_ids = list(Recipe.objects.filter(
+            user = user
+        ).values_list('id', flat=True)[:SAMPLE_SIZE])
+        self.tag_ids = list(Tag.objects.filter(
+            user = user
+        ).values_list('id', flat=True)[:SAMPLE_SIZE])
+        self.ingredient_ids = list(Ingredient.objects.filter(
+            user = user
+        ).values_list('id', flat=True)[:SAMPLE_SIZE])
+
+
+class EndpointRequests:
+    """ requests to every endpoint of recipe.urls and users.urls, each for
+    a random seeded user
+
+    Deletes are left out so the read endpoints keep their data; image
+    uploads, which write media files, are only read back.
+    """
+
+    def __init__(self, fixtures, rng):
+        self.fixtures = fixtures
+        self.rng = rng
+        self.counter = itertools.count()
+        self.builders = {
+            'GET recipe:api-root': self.api_root,
+            'GET recipe:tag-list': self.tag_list,
+            'POST recipe:tag-list': self.create_tag,
+            'GET recipe:ingredient-list': self.ingredient_list,
+            'POST recipe:ingredient-list': self.create_ingredient,
+            'GET recipe:recipe-list': self.recipe_list,
+            'GET recipe:recipe-list?tags': self.filtered_recipe_list,
+            'GET recipe:recipe-list?page_size': self.recipe_page,
+            'POST recipe:recipe-list': self.create_recipe,
+            'GET recipe:recipe-detail': self.recipe_detail,
+            'PATCH recipe:recipe-detail': self.update_recipe,
+            'GET recipe:recipe-facets': self.recipe_facets,
+            'POST recipe:recipe-bulk': self.bulk_recipes,
+            'GET recipe:recipe-export': self.export_recipes,
+            'GET recipe:recipe-upload-image': self.recipe_image,
+            'POST users:create': self.create_user,
+            'POST users:token': self.create_token,
+            'GET users:me': self.me,
+            'PATCH users:me': self.update_me,
+        }
+
+    def cycle(self, labels):
+        """ return next_request() for run_load, round robin over labels """
+        labels = itertools.cycle(labels)
+
+        def next_request():
+            label = next(labels)
+            fixture = self.rng.choice(self.fixtures)
+            method, path, headers, body = self.builders[label](fixture)
+            if body is not None:
+                headers = dict(headers, **{
+                    'Content-Type': 'application/json'
+                })
+                body = json.dumps(body).encode()
+            return label, (method, path, headers, body)
+
+        return next_request
+
+    def _recipe_url(self, name, fixture):
+        pk = self.rng.choice(fixture.recipe_ids)
+        return reverse(f'recipe:{name}', args=[pk])
+
+    def _recipe(self, fixture):
+        return {
+            'title': f'Benchmark {next(self.counter)}',
+            'time_minutes': self.rng.randint(5, 120),
+            'price': f'{self.rng.randint(100, 5000) / 100:.2f}',
+            'tags': self.rng.sample(fixture.tag_ids, 2),
+            'ingredients': self.rng.sample(fixture.ingredient_ids, 3),
+        }
+
+    def api_root(self, fixture):
+        return 'GET', reverse('recipe:api-root'), fixture.headers, None
+
+    def tag_list(self, fixture):
+        return 'GET', reverse('recipe:tag-list'), fixture.headers, None
+
+    def create_tag(self, fixture):
+        return 'POST', reverse('recipe:tag-list'), fixture.headers, {
+            'name': f'Benchmark {next(self.counter)}'
+        }
+
+    def ingredient_list(self, fixture):
+        path = reverse('recipe:ingredient-list') + '?assigned_only=1'
+        return 'GET', path, fixture.headers, None
+
+    def create_ingredient(self, fixture):
+        return 'POST', reverse('recipe:ingredient-list'), fixture.headers, {
+            'name': f'Benchmark {next(self.counter)}'
+        }
+
+    def recipe_list(self, fixture):
+        return 'GET', reverse('recipe:recipe-list'), fixture.headers, None
+
+    def filtered_recipe_list(self, fixture):
+        tags = ','.join(
+            str(pk) for pk in self.rng.sample(fixture.tag_ids, 2)
+        )
+        path = reverse('recipe:recipe-list') + f'?tags={tags}'
+        return 'GET', path, fixture.headers, None
+
+    def recipe_page(self, fixture):
+        path = reverse('recipe:recipe-list') + '?ordering=price&page_size=20'
+        return 'GET', path, fixture.headers, None
+
+    def create_recipe(self, fixture):
+        return 'POST', reverse('recipe:recipe-list'), fixture.headers, \
+            self._recipe(fixture)
+
+    def recipe_detail(self, fixture):
+        path = self._recipe_url('recipe-detail', fixture)
+        return 'GET', path, fixture.headers, None
+
+    def update_recipe(self, fixture):
+        path = self._recipe_url('recipe-detail', fixture)
+        return 'PATCH', path, fixture.headers, {
+            'time_minutes': self.rng.randint(5, 120)
+        }
+
+    def recipe_facets(self, fixture):
+        tag = self.rng.choice(fixture.tag_ids)
+        path = reverse('recipe:recipe-facets') + f'?tags={tag}'
+        return 'GET', path, fixture.headers, None
+
+    def bulk_recipes(self, fixture):
+        return 'POST', reverse('recipe:recipe-bulk'), fixture.headers, [
+            self._recipe(fixture) for _ in range(10)
+        ]
+
+    def export_recipes(self, fixture):
+        return 'GET', reverse('recipe:recipe-export'), fixture.headers, None
+
+    def recipe_image(self, fixture):
+        path = self._recipe_url('recipe-upload-image', fixture)
+        return 'GET', path, fixture.headers, None
+
+    def create_user(self, fixture):
+        return 'POST', reverse('users:create'), {}, {
+            'email': f'{SIGNUP_PREFIX}-{next(self.counter)}@example.com',
+            'password': PASSWORD,
+            'name': 'Benchmark',
+        }
+
+    def create_token(self, fixture):
+        return 'POST', reverse('users:token'), {}, {
+            'email': fixture.email, 'password': PASSWORD
+        }
+
+    def me(self, fixture):
+        return 'GET', reverse('users:me'), fixture.headers, None
+
+    def update_me(self, fixture):
+        return 'PATCH', reverse('users:me'), fixture.headers, {
+            'name': f'Benchmark {next(self.counter)}'
+        }
+
+
+class Command(BaseCommand):
+    """ Django command to load test every API endpoint at a scale profile """
+
+    help = (
+        "Seed --profile users with recipes, tags and ingredients each, "
+        "start the app under --server and drive each endpoint of "
+        "recipe.urls and users.urls in turn, or all at once with --mixed, "
+        "with --connections concurrent keep-alive clients for --duration "
+        "seconds. Reports throughput, p50/p95/p99 latency and queries per "
+        "request (from Server-Timing, without the queries of streamed "
+        "bodies) per endpoint, writes them as JSON to --output and "
+        "compares them with a --baseline file of an earlier run; runs "
+        "with 5xx responses fail instead. Uses the configured database, "
+        "SQLite file or local Postgres; on SQLite, which locks the whole "
+        "file for a write, endpoints that write get one connection. "
+        "Seeded users are reused by later runs of the same profile with "
+        "--keep, otherwise deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', choices=sorted(PROFILES), default='small'
+        )
+        for name in ('users', 'recipes', 'tags', 'ingredients'):
+            parser.add_argument(
+                f'--{name}', type=int, help="override the profile"
+            )
+        parser.add_argument(
+            '--server', choices=sorted(SERVERS), default='wsgi'
+        )
+        parser.add_argument('--connections', type=int, default=50)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help="seconds per endpoint, or in total with --mixed"
+        )
+        parser.add_argument(
+            '--mixed', action='store_true',
+            help="load all endpoints at once instead of one after another"
+        )
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help="threads per gunicorn worker"
+        )
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument(
+            '--endpoints', nargs='+', metavar='LABEL',
+            help="only these endpoints, e.g. 'GET recipe:recipe-list'"
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="write results as JSON here")
+        parser.add_argument('--baseline', help="JSON results to compare")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.1,
+            help="fraction a metric may worsen against the baseline"
+        )
+        parser.add_argument('--keep', action='store_true')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and \
+                connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError("The server cannot share an in-memory database")
+        if importlib.util.find_spec(SERVERS[options['server']]) is None:
+            raise CommandError(
+                f"Install {SERVERS[options['server']]} to run "
+                f"{options['server']}"
+            )
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        profile = dict(PROFILES[options['profile']], **{
+            name: options[name] for name in PROFILES['small']
+            if options[name] is not None
+        })
+        rng = random.Random(options['seed'])
+        try:
+            fixtures = self._fixtures(rng, profile)
+            requests = EndpointRequests(fixtures, rng)
+            labels = options['endpoints'] or list(requests.builders)
+            unknown = set(labels) - set(requests.builders)
+            if unknown:
+                raise CommandError(
+                    f"Unknown endpoints: {', '.join(sorted(unknown))}"
+                )
+            results = self._run(requests, labels, profile, options)
+        finally:
+            get_user_model().objects.filter(
+                email__startswith = f'{SIGNUP_PREFIX}-'
+            ).delete()
+            if not options['keep']:
+                get_user_model().objects.filter(
+                    email__startswith = f'{PREFIX}-'
+                ).delete()
+
+        self._report(results)
+        errors = server_errors(results)
+        if errors:
+            raise CommandError(
+                "Server errors, results not written or compared: " +
+                ', '.join(f'{label} {count}x' for label, count in
+                          errors.items())
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        if baseline is not None:
+            self._compare(baseline, results, options['tolerance'])
+
+    def _fixtures(self, rng, profile):
+        """ seed profile, or reuse the users a --keep run left, and return
+        a Fixture per user """
+        users = get_user_model().objects.filter(
+            email__startswith = f'{PREFIX}-'
+        ).order_by('id')
+        count = users.count()
+        if count and count != profile['users']:
+            raise CommandError(
+                f"{count} users of an earlier run with another profile "
+                f"exist, delete users with emails starting with {PREFIX}-"
+            )
+
+        if count:
+            self.stdout.write(f"Reusing {count} seeded users")
+        else:
+            self._seed(rng, profile)
+
+        tokens = {
+            token.user_id: token
+            for token in Token.objects.filter(user__in = users)
+        }
+        return [Fixture(user, tokens[user.pk]) for user in users]
+
+    def _seed(self, rng, profile):
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = seed_users(profile['users'], PREFIX, PASSWORD)
+            Token.objects.bulk_create([
+                Token(user = user, key = Token.generate_key())
+                for user in users
+            ])
+        for user in users:
+            with transaction.atomic():
+                seed_recipes(
+                    rng, user, profile['recipes'], profile['tags'],
+                    profile['ingredients']
+                )
+
+        self.stdout.write(
+            f"Seeded {profile['users']} users x {profile['recipes']} "
+            f"recipes in {time.perf_counter() - start:.1f}s"
+        )
+
+    def _run(self, requests, labels, profile, options):
+        """ serve the app, put it under load and return results """
+        if options['mixed']:
+            phases = [(labels, options['duration'])]
+        else:
+            phases = [([label], options['duration']) for label in labels]
+
+        endpoints = {}
+        completed = elapsed = 0
+        errors = Counter()
+        # query counts are read from the Server-Timing header
+        with serving(options['server'], options['port'], options,
+                     SERVER_TIMING='1'):
+            for phase_labels, duration in phases:
+                connections = self._connections(phase_labels, options)
+                result = run_load(
+                    HOST, options['port'], requests.cycle(phase_labels),
+                    connections, duration
+                )
+                completed += result.completed
+                elapsed += result.elapsed
+                errors.update(result.errors)
+                for label in phase_labels:
+                    endpoints[label] = self._endpoint(
+                        result, label, connections
+                    )
+
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'database': connection.vendor,
+            'server': options['server'],
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'connections': options['connections'],
+            'mixed': options['mixed'],
+            'duration': elapsed,
+            'profile': dict(profile, name=options['profile']),
+            'throughput': completed / elapsed if elapsed else 0.0,
+            'errors': dict(errors),
+            'endpoints': endpoints,
+        }
+
+    def _connections(self, labels, options):
+        """ return clients to load labels with; writes to SQLite, which
+        fail with "database is locked" while another one holds the file,
+        are sent one at a time """
+        if connection.vendor == 'sqlite' and any(
+                not label.startswith('GET ') for label in labels):
+            return 1
+        return options['connections']
+
+    def _endpoint(self, result, label, connections):
+        """ return results of label in a load run over connections """
+        samples = result.samples.get(label, [])
+        queries = result.queries.get(label)
+        return dict(
+            summarize(samples),
+            throughput=len(samples) / result.elapsed,
+            connections=connections,
+            queries_per_request=(
+                sum(queries) / len(queries) if queries else None
+            ),
+            statuses={
+                str(code): count
+                for code, count in sorted(result.statuses[label].items())
+            },
+        )
+
+    def _report(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{results['server']} on {results['database']}: "
+            f"{results['throughput']:.0f} req/s over "
+            f"{results['connections']} connections, "
+            f"errors: {results['errors'] or 0}"
+        ))
+        self.stdout.write(
+            f"{'endpoint':<36} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'queries':>8}  statuses"
+        )
+        for label, endpoint in results['endpoints'].items():
+            queries = endpoint['queries_per_request']
+            self.stdout.write(
+                f"{label:<36} {endpoint['throughput']:8.1f} "
+                f"{endpoint['p50_ms']:8.2f} {endpoint['p95_ms']:8.2f} "
+                f"{endpoint['p99_ms']:8.2f} "
+                f"{'-' if queries is None else f'{queries:.1f}':>8}  "
+                f"{endpoint['statuses']}"
+            )
+
+    def _compare(self, baseline, results, tolerance):
+        """ report changes against baseline, fail on regressions """
+        rows = compare_runs(baseline, results, tolerance)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Against baseline of {baseline.get('created', 'unknown')}"
+        ))
+        for label, metric, before, after, regressed in rows:
+            line = f"{label:<36} {metric:<20} {before:10.2f} -> {after:10.2f}"
+            self.stdout.write(
+                self.style.ERROR(line) if regressed else line
+            )
+
+        regressions = sum(1 for row in rows if row[4])
+        if regressions:
+            raise CommandError(
+                f"{regressions} metrics regressed by more than "
+                f"{tolerance:.0%}"
+            )
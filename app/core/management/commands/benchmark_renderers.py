@@ -0,0 +1,104 @@
+import random
+import tracemalloc
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmark import timed
+from core.renderers import FastJSONRenderer, json_array_chunks, orjson
+
+
+KB = 1024
+MB = 1024 * KB
+
+
+def sample_recipes(size, seed=0):
+    """ return recipe list representations rendering to about size bytes """
+    rng = random.Random(seed)
+    item_size = len(JSONRenderer().render([_recipe(rng, 0)]))
+    return [_recipe(rng, pk) for pk in range(max(1, size // item_size))]
+
+
+def _recipe(rng, pk):
+    return OrderedDict([
+        ('id', pk),
+        ('title', f'Recipe {pk} with crème fraîche'),
+        ('tags', sorted(rng.sample(range(1, 5000), 3))),
+        ('ingredients', sorted(rng.sample(range(1, 20000), 6))),
+        ('price', f'{rng.randint(100, 5000) / 100:.2f}'),
+        ('link', ''),
+        ('time_minutes', rng.randint(5, 120)),
+    ])
+
+
+def _stream(renderer, items, chunk_size):
+    """ render items through json_array_chunks, return total size """
+    chunks = (
+        items[start:start + chunk_size]
+        for start in range(0, len(items), chunk_size)
+    )
+    return sum(len(chunk) for chunk in json_array_chunks(renderer, chunks))
+
+
+class Command(BaseCommand):
+    """ Django command to compare JSON renderers over response sizes """
+
+    help = (
+        "Render synthetic recipe lists of --sizes KB with DRF's "
+        "JSONRenderer and core.renderers.FastJSONRenderer, whole and "
+        "streamed in --chunk-size item chunks. Reports throughput and "
+        "peak memory of each and checks all outputs are identical."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+',
+            default=[1, 100, KB, 10 * KB, 50 * KB], help="in KB"
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson is not installed, FastJSONRenderer "
+                              "measures the stock encoder")
+
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        for size_kb in options['sizes']:
+            items = sample_recipes(size_kb * KB)
+            expected = stock.render(items)
+            if fast.render(items) != expected or \
+                    b''.join(json_array_chunks(fast, [items])) != expected:
+                raise CommandError("Renderer outputs differ")
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{len(expected) / KB:.0f} KB, {len(items)} recipes"
+            ))
+            runs = (
+                ('JSONRenderer', stock.render, items),
+                ('FastJSONRenderer', fast.render, items),
+                ('FastJSONRenderer streamed', _stream, fast, items,
+                 options['chunk_size']),
+            )
+            for label, func, *func_args in runs:
+                elapsed = min(
+                    timed(func, *func_args)[0]
+                    for _ in range(options['repeat'])
+                )
+                peak = self._peak_memory(func, *func_args)
+                self.stdout.write(
+                    f"  {label:<26} {elapsed * 1000:9.2f}ms "
+                    f"{len(expected) / MB / elapsed:8.1f} MB/s "
+                    f"peak {peak / MB:8.2f} MB"
+                )
+
+    def _peak_memory(self, func, *args):
+        """ return peak bytes allocated while calling func """
+        tracemalloc.start()
+        try:
+            func(*args)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,101 @@
+import importlib.util
+import itertools
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.benchmark import format_summary, summarize
+from core.loadtest import HOST, SERVERS, run_load, serving
+from core.models import Recipe
+from core.seed import seed_recipes, seed_users
+
+
+class Command(BaseCommand):
+    """ Django command to compare WSGI and ASGI serving under load """
+
+    help = (
+        "Start the app under gunicorn (WSGI, threaded workers) and uvicorn "
+        "(ASGI, async read views) in turn and drive the recipe list, "
+        "recipe detail and tag list endpoints with --connections "
+        "concurrent keep-alive clients for --duration seconds each. "
+        "Prints throughput and latency percentiles per server. Uses the "
+        "configured database, which must not be in-memory; the benchmark "
+        "user is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--servers', nargs='+', choices=sorted(SERVERS),
+            default=['wsgi', 'asgi']
+        )
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=20)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help="threads per gunicorn worker"
+        )
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and \
+                connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError("Servers cannot share an in-memory database")
+        for server in options['servers']:
+            if importlib.util.find_spec(SERVERS[server]) is None:
+                raise CommandError(
+                    f"Install {SERVERS[server]} to run {server}"
+                )
+
+        with transaction.atomic():
+            user = seed_users(1, 'benchmark-servers')[0]
+            seed_recipes(random.Random(0), user, options['recipes'], 20, 50)
+            token = Token.objects.create(user = user)
+        try:
+            requests = self._requests(user, token)
+            for server in options['servers']:
+                self._run(server, requests, options)
+        finally:
+            user.delete()
+
+    def _requests(self, user, token):
+        """ return cycle of (label, request) spread over the read endpoints """
+        headers = {'Authorization': f'Token {token.key}'}
+        recipe_ids = list(Recipe.objects.filter(
+            user = user
+        ).values_list('id', flat=True))
+        paths = [
+            ('recipe-list', reverse('recipe:recipe-list')),
+            ('tag-list', reverse('recipe:tag-list')),
+        ] + [
+            ('recipe-detail', reverse('recipe:recipe-detail', args=[pk]))
+            for pk in recipe_ids[:10]
+        ]
+
+        return itertools.cycle([
+            (label, ('GET', path, headers, None)) for label, path in paths
+        ])
+
+    def _run(self, server, requests, options):
+        """ start server, put it under load and report the results """
+        with serving(server, options['port'], options):
+            result = run_load(
+                HOST, options['port'], requests.__next__,
+                options['connections'], options['duration']
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{server}: {result.throughput:.0f} req/s over "
+            f"{options['connections']} connections, "
+            f"errors: {dict(result.errors) or 0}"
+        ))
+        for label, samples in sorted(result.samples.items()):
+            self.stdout.write(format_summary(label, summarize(samples)))
+            statuses = dict(result.statuses[label])
+            if set(statuses) != {200}:
+                self.stdout.write(f"  statuses: {statuses}")
@@ -0,0 +1,90 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from core.models import MediaBlob, Recipe
+
+
+class Command(BaseCommand):
+    """ Django command to delete media blobs no longer referenced """
+
+    help = (
+        "Delete media blobs whose reference count dropped to zero more "
+        "than --grace seconds ago, together with files derived from them "
+        "such as thumbnails. --recount first rebuilds reference counts "
+        "from recipe images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=3600)
+        parser.add_argument('--recount', action='store_true')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self._recount()
+
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        orphans = MediaBlob.objects.filter(
+            ref_count__lte = 0, updated_at__lt = cutoff
+        ).values_list('name', flat=True)
+
+        deleted = 0
+        for name in orphans.iterator():
+            if self._recently_used(name, options['grace']):
+                continue
+            if options['dry_run']:
+                self.stdout.write(name)
+                deleted += 1
+                continue
+            # the reference count is checked again in the DELETE, so a
+            # blob referenced again meanwhile is kept
+            if MediaBlob.objects.filter(name = name, ref_count__lte = 0) \
+                    .delete()[0]:
+                self._delete_files(name)
+                deleted += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} blobs"))
+
+    def _recount(self):
+        """ set reference counts to the number of recipes using each blob """
+        counts = dict(
+            Recipe.objects.exclude(image = '').exclude(image__isnull = True)
+            .values_list('image').annotate(count = Count('id'))
+        )
+        for blob in MediaBlob.objects.all():
+            count = counts.pop(blob.name, 0)
+            if blob.ref_count != count:
+                MediaBlob.objects.filter(pk = blob.pk).update(
+                    ref_count = count, updated_at = timezone.now()
+                )
+        MediaBlob.objects.bulk_create([
+            MediaBlob(name = name, ref_count = count)
+            for name, count in counts.items()
+        ])
+
+    def _recently_used(self, name, grace):
+        """ return whether the blob was re-uploaded within grace seconds """
+        try:
+            mtime = os.stat(default_storage.path(name)).st_mtime
+        except FileNotFoundError:
+            return False
+
+        return mtime > time.time() - grace
+
+    def _delete_files(self, name):
+        """ delete blob name and files derived from it """
+        directory, filename = os.path.split(name)
+        root = os.path.splitext(filename)[0]
+        try:
+            files = default_storage.listdir(directory)[1]
+        except FileNotFoundError:
+            return
+        for other in files:
+            if other == filename or other.startswith(f'{root}_'):
+                default_storage.delete(os.path.join(directory, other))
@@ -0,0 +1,243 @@
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.bulk import bulk_insert, bulk_link, copy_rows, reserve_ids
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.cache import bump_data_version
+from recipe.export import split_names
+from recipe.search import update_search_vectors
+
+
+RECIPE_FIELDS = ('title', 'time_minutes', 'price', 'link')
+RELATIONS = (('tags', Tag), ('ingredients', Ingredient))
+
+# errors printed in full, the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+def read_ndjson(lines):
+    """ yield (line number, dict) of non-blank NDJSON lines """
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+
+
+def read_csv(lines):
+    """ yield (line number, dict) of CSV rows, splitting name lists """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        for field, _ in RELATIONS:
+            row[field] = split_names(row.get(field) or '')
+        yield reader.line_num, row
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+@lru_cache(maxsize=65536)
+def _clean_name(model, name):
+    """ return validated name; dumps repeat few names many times """
+    return model._meta.get_field('name').clean(name.strip(), None)
+
+
+def _clean_names(names, model):
+    """ return stripped unique names, raising ValidationError if invalid """
+    # checked before the cached calls, which cannot hash lists or dicts
+    if not isinstance(names, list) or \
+            not all(isinstance(name, str) for name in names):
+        raise ValidationError('Expected a list of names.')
+    return list(dict.fromkeys(_clean_name(model, name) for name in names))
+
+
+def clean_row(row):
+    """ return validated recipe values and relation names of a dump row """
+    if not isinstance(row, dict):
+        raise ValidationError('Expected an object.')
+    values = {}
+    for name in RECIPE_FIELDS:
+        field = Recipe._meta.get_field(name)
+        value = row.get(name, '' if name == 'link' else None)
+        values[name] = field.clean(value, None)
+    names = {
+        field: _clean_names(row.get(field) or [], model)
+        for field, model in RELATIONS
+    }
+
+    return values, names
+
+
+class RecipeImporter:
+    """ writes batches of cleaned rows of one user's dump """
+
+    def __init__(self, user, batch_size):
+        self.user = user
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql'
+        # name -> id of the user's tags and ingredients, filled up front
+        # and extended with every name the import creates
+        self.ids = {
+            field: dict(model.objects.filter(
+                user = user
+            ).values_list('name', 'id'))
+            for field, model in RELATIONS
+        }
+
+    def write(self, rows):
+        """ write one batch of (values, names) rows in a transaction """
+        with transaction.atomic():
+            for field, model in RELATIONS:
+                self._create_missing(field, model, rows)
+            recipe_ids = self._insert_recipes([values for values, _ in rows])
+            for field, model in RELATIONS:
+                links = [
+                    (recipe_id, self.ids[field][name])
+                    for recipe_id, (_, names) in zip(recipe_ids, rows)
+                    for name in names[field]
+                ]
+                self._insert_links(getattr(Recipe, field), links)
+                model.objects.adjust_recipe_counts(
+                    Counter(pk for _, pk in links)
+                )
+            update_search_vectors(recipe_ids)
+
+    def _create_missing(self, field, model, rows):
+        """ insert names of rows not known yet as new objects of model """
+        known = self.ids[field]
+        missing = list(dict.fromkeys(
+            name for _, names in rows for name in names[field]
+            if name not in known
+        ))
+        created = bulk_insert(model, [
+            model(user = self.user, name = name) for name in missing
+        ], self.batch_size)
+        known.update((obj.name, obj.pk) for obj in created)
+
+    def _insert_recipes(self, values):
+        """ insert recipes and return their ids in order """
+        if not self.use_copy:
+            recipes = bulk_insert(Recipe, [
+                Recipe(user = self.user, **fields) for fields in values
+            ], self.batch_size)
+            return [recipe.pk for recipe in recipes]
+
+        # ids are reserved first, as COPY cannot return generated keys
+        ids = reserve_ids(Recipe, len(values))
+        copy_rows(
+            Recipe._meta.db_table,
+            ('id', 'user_id') + RECIPE_FIELDS,
+            (
+                (pk, self.user.pk) + tuple(fields[name] for name in
+                                           RECIPE_FIELDS)
+                for pk, fields in zip(ids, values)
+            )
+        )
+        return ids
+
+    def _insert_links(self, relation, links):
+        """ insert (recipe id, target id) rows of a M2M relation """
+        if not self.use_copy:
+            bulk_link(relation, links, self.batch_size)
+            return
+
+        copy_rows(relation.through._meta.db_table, (
+            f'{relation.field.m2m_field_name()}_id',
+            f'{relation.field.m2m_reverse_field_name()}_id',
+        ), links)
+
+
+class Command(BaseCommand):
+    """ Django command to load a recipe dump into a user's account """
+
+    help = (
+        "Import recipes with tag and ingredient names from an NDJSON or "
+        "CSV dump, as written by export_recipes, into --user's account. "
+        "Names are matched to existing tags and ingredients or created. "
+        "Rows are written --batch-size at a time, each batch in its own "
+        "transaction, with COPY on PostgreSQL. Invalid rows are skipped "
+        "and reported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="dump file, or - for stdin")
+        parser.add_argument('--user', required=True, help="email of user")
+        parser.add_argument(
+            '--format', dest='dump_format', choices=sorted(READERS),
+            help="defaults to the file extension"
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        path = options['path']
+        dump_format = options['dump_format'] or path.rsplit('.', 1)[-1]
+        if dump_format not in READERS:
+            raise CommandError("Pass --format, the extension is not known")
+
+        if path == '-':
+            self._import(user, sys.stdin, dump_format, options)
+        else:
+            with open(path, newline='') as dump:
+                self._import(user, dump, dump_format, options)
+
+    def _import(self, user, dump, dump_format, options):
+        importer = RecipeImporter(user, options['batch_size'])
+        start = time.perf_counter()
+        imported = errors = 0
+        batch = []
+
+        def flush():
+            nonlocal imported
+            importer.write(batch)
+            imported += len(batch)
+            batch.clear()
+            elapsed = time.perf_counter() - start
+            self.stderr.write(
+                f"\r{imported} recipes, {imported / elapsed:.0f} rows/s",
+                ending=''
+            )
+
+        try:
+            for number, row in READERS[dump_format](dump):
+                try:
+                    if isinstance(row, Exception):
+                        raise ValidationError(str(row))
+                    batch.append(clean_row(row))
+                except ValidationError as exc:
+                    errors += 1
+                    if errors <= MAX_REPORTED_ERRORS:
+                        self.stderr.write(
+                            f"line {number}: {'; '.join(exc.messages)}"
+                        )
+                    continue
+                if len(batch) == options['batch_size']:
+                    flush()
+            if batch:
+                flush()
+        finally:
+            if imported:
+                self.stderr.write('')
+                bump_data_version(user.pk)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} recipes in {elapsed:.1f}s "
+            f"({imported / elapsed if elapsed else 0:.0f} rows/s), "
+            f"skipped {errors} invalid rows"
+        ))
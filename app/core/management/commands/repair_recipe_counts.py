@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """ Django command to recompute stored recipe counts """
+
+    help = (
+        "Recompute recipe_count of tags and ingredients from the recipe "
+        "M2M tables, --batch-size rows per transaction, and report how "
+        "many were wrong."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="email of user to repair")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        filters = {}
+        if options['user']:
+            try:
+                filters['user'] = get_user_model().objects.get(
+                    email = options['user']
+                )
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        for model in (Tag, Ingredient):
+            fixed = self._repair(
+                model.objects.filter(**filters), options['batch_size']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{model._meta.verbose_name_plural}: fixed {fixed}"
+            ))
+
+    def _repair(self, queryset, batch_size):
+        """ recount queryset in primary key ranges, return rows fixed """
+        fixed, last_pk = 0, 0
+        while True:
+            pks = list(queryset.filter(pk__gt = last_pk).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return fixed
+            with transaction.atomic():
+                fixed += queryset.filter(
+                    pk__gte = pks[0], pk__lte = pks[-1]
+                ).recount()
+            last_pk = pks[-1]
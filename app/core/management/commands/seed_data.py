@@ -0,0 +1,286 @@
+import io
+import random
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.bulk import bulk_link, copy_rows, insert_rows
+from core.models import Tag, Ingredient, Recipe, recipe_image_file_path
+from core.seed import INGREDIENT_WORDS, TAG_WORDS, TITLE_ADJECTIVES, \
+                      TITLE_DISHES, lognormal, names, recipe_minutes, \
+                      recipe_price, seed_users, zipf_cum_weights, zipf_sample
+from core.signals import add_references
+
+from recipe.search import update_search_vectors
+from recipe.thumbnails import generate_thumbnails
+
+
+RECIPE_COLUMNS = (
+    'user_id', 'title', 'time_minutes', 'price', 'link', 'image'
+)
+
+# catalog attribute, model and recipe relation of tags and ingredients
+RELATIONS = (
+    ('tags', Tag, Recipe.tags),
+    ('ingredients', Ingredient, Recipe.ingredients),
+)
+
+
+# (min, max) tags and ingredients per recipe
+PER_RECIPE = {'tags': (1, 5), 'ingredients': (3, 12)}
+
+PLACEHOLDER_COLORS = (
+    (231, 111, 81), (244, 162, 97), (233, 196, 106), (42, 157, 143),
+    (38, 70, 83), (131, 56, 236), (255, 0, 110), (58, 134, 255),
+)
+
+
+def placeholder_images():
+    """ store a solid color JPEG per PLACEHOLDER_COLORS with thumbnails,
+    return their storage names """
+    from PIL import Image
+
+    stored = []
+    for color in PLACEHOLDER_COLORS:
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), color).save(buffer, format='JPEG')
+        name = default_storage.save(
+            recipe_image_file_path(None, 'placeholder.jpg'),
+            ContentFile(buffer.getvalue())
+        )
+        generate_thumbnails(
+            default_storage.path(name), settings.THUMBNAIL_SIZES
+        )
+        stored.append(name)
+
+    return stored
+
+
+class UserCatalog:
+    """ generated tags, ingredients and recipes of one user
+
+    Everything comes from a generator seeded by seed and user index, so
+    a user's data does not depend on the batches it is written in.
+    Recipes are (title, minutes, price, image, {relation: indexes}).
+    """
+
+    def __init__(self, user, index, options, images):
+        rng = random.Random(f"{options['seed']}:{index}")
+        self.user = user
+        self.tags = names(rng, TAG_WORDS, options['tags'])
+        self.ingredients = names(
+            rng, INGREDIENT_WORDS, options['ingredients']
+        )
+        weights = {
+            relation: zipf_cum_weights(
+                len(getattr(self, relation)), options['zipf']
+            )
+            for relation, _, _ in RELATIONS
+        }
+
+        count = round(lognormal(
+            rng, options['recipes'], options['recipes_sigma'], 0,
+            options['recipes'] * 50
+        ))
+        self.recipes = []
+        for _ in range(count):
+            links = {
+                relation: zipf_sample(rng, weights[relation], rng.randint(
+                    *PER_RECIPE[relation]
+                ))
+                for relation, _, _ in RELATIONS
+            }
+            title = rng.choice(TITLE_DISHES)
+            if links['ingredients']:
+                main = self.ingredients[links['ingredients'][0]]
+                title = f'{rng.choice(TITLE_ADJECTIVES)} {main} {title}'
+            image = None
+            if images and rng.random() < options['images']:
+                image = rng.choice(images)
+            self.recipes.append((
+                title, recipe_minutes(rng),
+                Decimal(recipe_price(rng)).scaleb(-2), image, links
+            ))
+
+
+class CatalogWriter:
+    """ writes the catalogs of a batch of users in one transaction """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql'
+        self.rows = Counter()
+
+    def write(self, catalogs):
+        with transaction.atomic():
+            target_ids = {
+                relation: self._insert_targets(relation, model, catalogs)
+                for relation, model, _ in RELATIONS
+            }
+            recipe_ids = self._insert_recipes(catalogs)
+            next_id = iter(recipe_ids)
+            links = {relation: [] for relation, _, _ in RELATIONS}
+            for catalog_index, catalog in enumerate(catalogs):
+                for recipe in catalog.recipes:
+                    pk = next(next_id)
+                    for relation, indexes in recipe[4].items():
+                        ids = target_ids[relation][catalog_index]
+                        links[relation] += [
+                            (pk, ids[index]) for index in indexes
+                        ]
+            for relation, _, descriptor in RELATIONS:
+                self._insert_links(descriptor, links[relation])
+                self.rows['links'] += len(links[relation])
+
+            images = Counter(
+                recipe[3] for catalog in catalogs
+                for recipe in catalog.recipes if recipe[3]
+            )
+            for name, count in images.items():
+                add_references(name, count)
+            update_search_vectors(recipe_ids)
+
+    def _insert_targets(self, relation, model, catalogs):
+        """ insert tags or ingredients with their final recipe counts,
+        return their ids per catalog """
+        rows = []
+        for catalog in catalogs:
+            counts = Counter(
+                index for recipe in catalog.recipes
+                for index in recipe[4][relation]
+            )
+            rows += [
+                (catalog.user.pk, name, counts[index])
+                for index, name in enumerate(getattr(catalog, relation))
+            ]
+        ids = iter(insert_rows(
+            model, ('user_id', 'name', 'recipe_count'), rows,
+            self.batch_size
+        ))
+        self.rows[relation] += len(rows)
+
+        return [
+            [next(ids) for _ in getattr(catalog, relation)]
+            for catalog in catalogs
+        ]
+
+    def _insert_recipes(self, catalogs):
+        """ insert recipes of catalogs, return their ids in order """
+        rows = [
+            (catalog.user.pk, title, minutes, price, '', image)
+            for catalog in catalogs
+            for title, minutes, price, image, _ in catalog.recipes
+        ]
+        self.rows['recipes'] += len(rows)
+
+        return insert_rows(Recipe, RECIPE_COLUMNS, rows, self.batch_size)
+
+    def _insert_links(self, relation, links):
+        if not self.use_copy:
+            bulk_link(relation, links, self.batch_size)
+            return
+
+        copy_rows(relation.through._meta.db_table, (
+            f'{relation.field.m2m_field_name()}_id',
+            f'{relation.field.m2m_reverse_field_name()}_id',
+        ), links)
+
+
+class Command(BaseCommand):
+    """ Django command to generate a deterministic synthetic data set """
+
+    help = (
+        "Create --users users (times --scale) named <prefix>-<n>, each "
+        "with --tags tags, --ingredients ingredients and about --recipes "
+        "recipes, log-normally spread over users. Tags and ingredients "
+        "are used by recipes with Zipf distributed popularity; prices and "
+        "preparation times are log-normal. With --images, that fraction "
+        "of recipes shares a few placeholder images. Rows are written "
+        "with multi-row INSERTs, COPY on PostgreSQL, in transactions of "
+        "about --batch-size recipes. The same --seed gives the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--recipes', type=int, default=100,
+            help="median recipes per user"
+        )
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help="multiply the number of users"
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help="exponent of tag and ingredient popularity"
+        )
+        parser.add_argument(
+            '--recipes-sigma', type=float, default=0.8,
+            help="spread of recipes per user, 0 for all the same"
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help="fraction of recipes with a placeholder image"
+        )
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument(
+            '--password', help="password of every user, unusable if unset"
+        )
+        parser.add_argument('--batch-size', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        users = round(options['users'] * options['scale'])
+        prefix = options['prefix']
+        if get_user_model().objects.filter(
+                email__startswith = f'{prefix}-').exists():
+            raise CommandError(
+                f"Users named {prefix}-<n> exist, pass another --prefix"
+            )
+
+        start = time.perf_counter()
+        images = placeholder_images() if options['images'] else []
+        with transaction.atomic():
+            user_objs = seed_users(users, prefix, options['password'])
+
+        writer = CatalogWriter(options['batch_size'])
+        batch = []
+        pending = 0
+        for index, user in enumerate(user_objs):
+            catalog = UserCatalog(user, index, options, images)
+            batch.append(catalog)
+            pending += len(catalog.recipes)
+            if pending >= options['batch_size']:
+                self._flush(writer, batch, start)
+                batch, pending = [], 0
+        if batch:
+            self._flush(writer, batch, start)
+        if writer.rows['recipes']:
+            self.stderr.write('')
+
+        elapsed = time.perf_counter() - start
+        total = users + sum(writer.rows.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {users} users, {writer.rows['tags']} tags, "
+            f"{writer.rows['ingredients']} ingredients, "
+            f"{writer.rows['recipes']} recipes and {writer.rows['links']} "
+            f"links in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)"
+        ))
+
+    def _flush(self, writer, batch, start):
+        writer.write(batch)
+        elapsed = time.perf_counter() - start
+        self.stderr.write(
+            f"\r{writer.rows['recipes']} recipes, "
+            f"{sum(writer.rows.values()) / elapsed:.0f} rows/s",
+            ending=''
+        )
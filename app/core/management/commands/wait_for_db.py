@@ -1,24 +1,43 @@
 import time
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
 
 class Command(BaseCommand):
-    """ Djangon command to pause execution until database availabe"""
+    """ Django command to pause execution until database available """
+
+    help = (
+        "Connect to the database, retrying with exponential backoff capped "
+        "at --max-delay seconds, until it accepts connections. Fails after "
+        "--timeout seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--timeout', type=float, default=60)
+        parser.add_argument('--initial-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=5)
 
     def handle(self, *args, **options):
         self.stdout.write("Waiting for database...")
 
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + options['timeout']
+        delay = options['initial_delay']
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write("Database unavialabe, waiting 1 second....")
-                time.sleep(1)
-        
-        self.stdout.write(self.style.SUCCESS("Database avialabe!"))
-
-
+                # connections[...] alone is only the wrapper object, this
+                # actually opens a connection
+                connections[options['database']].ensure_connection()
+                break
+            except OperationalError as exc:
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(f"Database unavailable: {exc}")
+                self.stdout.write(
+                    f"Database unavailable, waiting {delay:g} seconds..."
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
 
+        self.stdout.write(self.style.SUCCESS("Database available!"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.warmup import warm_up
+
+
+class Command(BaseCommand):
+    """ Django command to run the startup warm-up and report its steps """
+
+    help = (
+        "Run the warm-up app.wsgi and app.asgi perform when a worker "
+        "loads: open database connections, resolve the recipe and users "
+        "urls, build every serializer and prime process caches. Prints "
+        "the time each step took."
+    )
+
+    def handle(self, *args, **options):
+        for step, elapsed in warm_up():
+            self.stdout.write(f"{step}: {elapsed * 1000:.1f}ms")
+        self.stdout.write(self.style.SUCCESS("Warm-up complete"))
@@ -0,0 +1,289 @@
+import asyncio
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+from core.db import connection_stats
+
+
+# phases of a request timed apart from each other, see timer()
+PHASES = ('sql', 'serialize', 'auth')
+
+SECONDS_BUCKETS = (
+    .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar('request_timings', default=None)
+_noop = nullcontext()
+
+
+class RequestTimings:
+    """ time spent by one request in each phase and its query count
+
+    Phases are disjoint: time of queries run while serializing or
+    authenticating counts as sql only.
+    """
+
+    __slots__ = ('queries', 'durations', 'open')
+
+    def __init__(self):
+        self.queries = 0
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.open = set()
+
+    def header(self, total):
+        """ return Server-Timing header value, durations in ms """
+        durations = self.durations
+        return (
+            f'sql;dur={durations["sql"] * 1000:.2f};'
+            f'desc="{self.queries} queries", '
+            f'serialize;dur={durations["serialize"] * 1000:.2f}, '
+            f'auth;dur={durations["auth"] * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+
+
+class _Span:
+    """ adds its duration, minus queries run meanwhile, to a phase """
+
+    __slots__ = ('timings', 'phase', 'start', 'sql')
+
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.timings.open.add(self.phase)
+        self.sql = self.timings.durations['sql']
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        timings = self.timings
+        durations = timings.durations
+        durations[self.phase] += perf_counter() - self.start - (
+            durations['sql'] - self.sql
+        )
+        timings.open.discard(self.phase)
+
+
+def timer(phase):
+    """ return context manager timing a phase of the current request
+
+    Outside of a request, and nested in a span of the same phase, this is
+    a no-op, so serializers nested in serializers are counted once.
+    """
+    timings = _current.get()
+    if timings is None or phase in timings.open:
+        return _noop
+
+    return _Span(timings, phase)
+
+
+def time_query(execute, sql, params, many, context):
+    """ database execute wrapper counting queries of the current request """
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.durations['sql'] += perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    """ time queries of every connection, in whichever thread it is used """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedRepresentationMixin:
+    """ serializer mixin timing representations as the serialize phase """
+
+    def to_representation(self, instance):
+        with timer('serialize'):
+            return super().to_representation(instance)
+
+
+class Histogram:
+    """ Prometheus histogram with one series per view """
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, view, value):
+        """ record value, caller holds the registry lock """
+        series = self._series.get(view)
+        if series is None:
+            series = self._series[view] = [[0] * len(self.buckets), 0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def lines(self):
+        """ yield exposition lines, caller holds the registry lock """
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for view, (counts, total, count) in sorted(self._series.items()):
+            label = f'view="{_escape(view)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{{{label},le="{bound}"}} ' \
+                      f'{cumulative}'
+            yield f'{self.name}_bucket{{{label},le="+Inf"}} {count}'
+            yield f'{self.name}_sum{{{label}}} {total!r}'
+            yield f'{self.name}_count{{{label}}} {count}'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """ per-process histograms of request timings by resolved view name
+
+    Every worker process aggregates its own requests; the scraper sums
+    the series of all workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.total = Histogram(
+                'app_request_duration_seconds',
+                'Time spent handling requests.', SECONDS_BUCKETS
+            )
+            self.phases = {
+                phase: Histogram(
+                    f'app_request_{phase}_duration_seconds',
+                    f'Time requests spent in {phase}.', SECONDS_BUCKETS
+                )
+                for phase in PHASES
+            }
+            self.queries = Histogram(
+                'app_request_sql_queries', 'Queries run per request.',
+                QUERY_BUCKETS
+            )
+
+    def observe(self, view, timings, total):
+        with self._lock:
+            self.total.observe(view, total)
+            self.queries.observe(view, timings.queries)
+            for phase, duration in timings.durations.items():
+                self.phases[phase].observe(view, duration)
+
+    def lines(self):
+        with self._lock:
+            histograms = [self.total, self.queries] + [
+                self.phases[phase] for phase in PHASES
+            ]
+            for histogram in histograms:
+                yield from histogram.lines()
+
+
+request_metrics = RequestMetrics()
+
+# functions returning [(name, type, help, {labels or None: value})]
+# rendered after the request histograms, see register_collector()
+_collectors = []
+
+
+def register_collector(collect):
+    """ add a source of counters and gauges to the metrics endpoint """
+    if collect not in _collectors:
+        _collectors.append(collect)
+
+
+def collect_connections():
+    counts = connection_stats.snapshot()
+    return [(
+        'app_db_connection_events_total', 'counter',
+        'Database connection lifecycle events.',
+        {('event', event): counts[event] for event in counts}
+    )]
+
+
+register_collector(collect_connections)
+
+
+def render_metrics():
+    """ return metrics in the Prometheus text exposition format """
+    lines = list(request_metrics.lines())
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for label, value in samples.items():
+                labels = '' if label is None else \
+                    f'{{{label[0]}="{_escape(label[1])}"}}'
+                lines.append(f'{name}{labels} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+def _finish(request, response, timings, start):
+    total = perf_counter() - start
+    request_metrics.observe(_view_name(request), timings, total)
+    if settings.SERVER_TIMING:
+        response['Server-Timing'] = timings.header(total)
+
+
+@sync_and_async_middleware
+def RequestMetricsMiddleware(get_response):
+    """ time requests by phase, report them in a Server-Timing header and
+    aggregate them by view for the metrics endpoint
+
+    Placed first, total covers the other middleware too. Bodies of
+    streaming responses are produced after the response leaves here and
+    are not counted.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings = RequestTimings()
+            token = _current.set(timings)
+            start = perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            _finish(request, response, timings, start)
+            return response
+    else:
+        def middleware(request):
+            timings = RequestTimings()
+            token = _current.set(timings)
+            start = perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            _finish(request, response, timings, start)
+            return response
+
+    return middleware
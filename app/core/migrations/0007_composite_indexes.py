@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Django indexes each column of a M2M table and has a unique
+# (recipe_id, <target>_id) index; lookups from a tag or ingredient to its
+# recipes (assigned_only, facet and search index builds) are served by
+# these reversed pairs without visiting the table.
+THROUGH_INDEXES = (
+    ('core_recipe_tags', 'tag_id'),
+    ('core_recipe_ingredients', 'ingredient_id'),
+)
+
+
+def _through_index_operations():
+    for table, column in THROUGH_INDEXES:
+        name = f'{table}_{column}_recipe_idx'
+        yield migrations.RunSQL(
+            f'CREATE INDEX {name} ON {table} ({column}, recipe_id)',
+            f'DROP INDEX {name}',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(
+                fields=['user', 'name', 'id'], name='core_tag_user_name_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                fields=['user', 'name', 'id'], name='core_ingr_user_name_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', 'id'], name='core_recipe_user_id_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', 'price', 'id'],
+                name='core_recipe_user_price_idx'
+            ),
+        ),
+        # the composite indexes above lead with user, so the plain
+        # foreign key indexes are dropped once they exist
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='user',
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        *_through_index_operations(),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_recipe_counts(apps, schema_editor):
+    """ set recipe counts of existing tags and ingredients """
+    alias = schema_editor.connection.alias
+    Recipe = apps.get_model('core', 'Recipe')
+    for field, model_name in (('tags', 'Tag'), ('ingredients', 'Ingredient')):
+        through = Recipe._meta.get_field(field).remote_field.through
+        target = Recipe._meta.get_field(field).m2m_reverse_field_name()
+        counts = through.objects.using(alias).filter(
+            **{target: OuterRef('pk')}
+        ).order_by().values(target).annotate(
+            count=Count('*')
+        ).values('count')
+        apps.get_model('core', model_name).objects.using(alias).update(
+            recipe_count=Coalesce(
+                Subquery(counts, output_field=IntegerField()), 0
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count', 'id'], name='core_ingr_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count', 'id'], name='core_tag_user_count_idx'),
+        ),
+        migrations.RunPython(
+            backfill_recipe_counts, migrations.RunPython.noop
+        ),
+    ]
@@ -2,6 +2,10 @@ import os
 import uuid
 
 from django.db import models
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, \
+                             Subquery
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 
@@ -49,13 +53,93 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class RecipeAttrQuerySet(models.QuerySet):
+    """ queryset of tags or ingredients, which recipes link to """
+
+    def _links(self):
+        """ return rows of the recipe M2M table linking to outer object """
+        relation = self.model._meta.get_field('recipe')
+        target = relation.field.m2m_reverse_field_name()
+
+        return relation.through.objects.filter(
+            **{target: OuterRef('pk')}
+        ).order_by()
+
+    def assigned(self):
+        """ keep objects used by at least one recipe, as a semi-join """
+        return self.annotate(
+            is_assigned=Exists(self._links())
+        ).filter(is_assigned=True)
+
+    def _live_count(self):
+        """ return expression counting recipes linking to outer object """
+        target = self.model._meta.get_field('recipe').field \
+            .m2m_reverse_field_name()
+        counts = self._links().values(target).annotate(
+            count=Count('*')
+        ).values('count')
+
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    def with_usage_count(self):
+        """ annotate number of recipes using each object as usage_count """
+        return self.annotate(usage_count=self._live_count())
+
+    def adjust_recipe_counts(self, deltas):
+        """ add {pk: delta} to stored recipe counts, one UPDATE per delta
+
+        Increments are computed by the database, so concurrent writers
+        never lose each other's changes.
+        """
+        by_delta = {}
+        for pk, delta in deltas.items():
+            if delta:
+                by_delta.setdefault(delta, []).append(pk)
+        for delta, pks in by_delta.items():
+            self.filter(pk__in=sorted(pks)).update(
+                recipe_count=F('recipe_count') + delta
+            )
+
+    def recount(self):
+        """ set stored recipe counts to the live count, return rows fixed """
+        stale = list(self.with_usage_count().exclude(
+            recipe_count=F('usage_count')
+        ).values_list('pk', flat=True))
+        if not stale:
+            return 0
+
+        return self.model.objects.filter(pk__in=stale).update(
+            recipe_count=self._live_count()
+        )
+
+
 class Tag(models.Model):
     """ tag to be used by recipe """
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, 
-        on_delete=models.CASCADE
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False
     )
+    # number of recipes using it, maintained by core.signals
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        # lists are per user ordered by (-name, -id) or by
+        # (-recipe_count, -id), read backwards from these indexes, which
+        # replace the plain user index
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_tag_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', 'recipe_count', 'id'],
+                name='core_tag_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -65,9 +149,29 @@ class Ingredient(models.Model):
     """ ingredient to be used by recipe """
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, 
-        on_delete=models.CASCADE
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False
     )
+    # number of recipes using it, maintained by core.signals
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        # lists are per user ordered by (-name, -id) or by
+        # (-recipe_count, -id), read backwards from these indexes, which
+        # replace the plain user index
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_ingr_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', 'recipe_count', 'id'],
+                name='core_ingr_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -77,7 +181,8 @@ class Recipe(models.Model):
     """ recipe object"""
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     title = models.CharField(max_length=255)
     time_minutes = models.IntegerField()
@@ -86,6 +191,31 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null = True, upload_to=recipe_image_file_path)
+    # maintained by recipe.search on PostgreSQL, unused elsewhere
+    search_vector = SearchVectorField(null = True, editable = False)
+
+    class Meta:
+        # per user lists ordered by -id or by (price, id), see
+        # RecipeViewSet.orderings; these replace the plain user index
+        indexes = [
+            models.Index(
+                fields=['user', 'id'], name='core_recipe_user_id_idx'
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='core_recipe_user_price_idx'
+            ),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+
+class MediaBlob(models.Model):
+    """ content-addressed media file and the number of references to it """
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
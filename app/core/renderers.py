@@ -0,0 +1,73 @@
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """ JSON renderer encoding with orjson when it is installed
+
+    Output is the compact form of the stock renderer: same key order,
+    unescaped unicode, and \\u2028 and \\u2029 escaped. Values orjson does
+    not encode natively, like Decimal (as a number, as DRF does), lazy
+    translations and datetimes (in DRF's format), go through DRF's
+    encoder. Indented output, non-default JSON settings, and data orjson
+    rejects fall back to the stock renderer.
+    """
+
+    def __init__(self):
+        self._default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self.use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        try:
+            ret = orjson.dumps(data, default=self._default, option=(
+                orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            ))
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # as the stock renderer, keep the output a strict javascript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+                .replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+    def use_orjson(self, accepted_media_type=None, renderer_context=None):
+        """ return whether this render can be done by orjson """
+        return orjson is not None and self.compact and \
+            not self.ensure_ascii and self.get_indent(
+                accepted_media_type, renderer_context or {}
+            ) is None
+
+
+def streams_json_arrays(renderer, accepted_media_type):
+    """ return whether renderer output can be streamed by
+    json_array_chunks, that is it renders compact JSON """
+    return isinstance(renderer, renderers.JSONRenderer) and \
+        renderer.compact and \
+        renderer.get_indent(accepted_media_type, {}) is None
+
+
+def json_array_chunks(renderer, chunks, renderer_context=None):
+    """ stream lists of items as one JSON array
+
+    Yields an opening bracket, each non-empty chunk separated by commas,
+    then the closing bracket, so only one chunk is encoded at a time. The
+    joined chunks are the bytes renderer gives for the whole list.
+    """
+    yield b'['
+    first = True
+    for items in chunks:
+        if not items:
+            continue
+        encoded = renderer.render(list(items), None, renderer_context)[1:-1]
+        yield encoded if first else b',' + encoded
+        first = False
+    yield b']'
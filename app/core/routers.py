@@ -0,0 +1,191 @@
+import itertools
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+# viewset actions read from a replica; views without actions count GET
+# requests as retrieve
+REPLICA_ACTIONS = ('list', 'retrieve')
+
+PIN_KEY = 'db:primary-pin:{}'
+
+# seconds the replica's last replayed transaction is behind, 0 when it
+# has replayed everything it received or is not a replica at all
+LAG_QUERIES = {
+    'postgresql': """
+        SELECT COALESCE(CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END, 0)
+    """,
+}
+
+# alias of the database reads of the current request go to, None for the
+# primary
+_replica = ContextVar('replica', default=None)
+
+# alias: (monotonic time checked, lag in seconds or None if unreachable)
+_lags = {}
+
+_turns = itertools.count()
+
+
+def reading_replica():
+    """ return alias of the replica the current request reads from, None
+    for the primary """
+    return _replica.get()
+
+
+def _pin_cache():
+    return caches[settings.DB_PIN_CACHE_ALIAS]
+
+
+def pin_to_primary(user_id):
+    """ read user's requests from the primary for DB_PRIMARY_PIN_SECONDS """
+    _pin_cache().set(
+        PIN_KEY.format(user_id), True, settings.DB_PRIMARY_PIN_SECONDS
+    )
+
+
+def is_pinned(user_id):
+    return _pin_cache().get(PIN_KEY.format(user_id), False)
+
+
+def _query_lag(alias):
+    connection = connections[alias]
+    query = LAG_QUERIES.get(connection.vendor)
+    if query is None:
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+        return float(cursor.fetchone()[0])
+
+
+def replica_lag(alias):
+    """ return seconds replica alias is behind, None if unreachable
+
+    Checked at most every DB_REPLICA_LAG_CHECK_INTERVAL seconds per
+    process; a failed check closes the connection so the next one
+    reconnects.
+    """
+    now = time.monotonic()
+    checked = _lags.get(alias)
+    if checked is not None and \
+            now - checked[0] < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+
+    try:
+        lag = _query_lag(alias)
+    except DatabaseError:
+        connections[alias].close()
+        lag = None
+    _lags[alias] = (now, lag)
+
+    return lag
+
+
+def _pick_random(aliases, lags):
+    return random.choice(aliases)
+
+
+def _pick_round_robin(aliases, lags):
+    return aliases[next(_turns) % len(aliases)]
+
+
+def _pick_first(aliases, lags):
+    return aliases[0]
+
+
+def _pick_least_lag(aliases, lags):
+    return min(aliases, key=lags.get)
+
+
+# DB_REPLICA_SELECTION choices
+SELECTORS = {
+    'random': _pick_random,
+    'round_robin': _pick_round_robin,
+    'first': _pick_first,
+    'least_lag': _pick_least_lag,
+}
+
+
+def choose_replica():
+    """ return alias of the replica to read from, None for the primary
+
+    Replicas within DB_REPLICA_MAX_LAG are picked from by
+    DB_REPLICA_SELECTION. When none is, DB_REPLICA_LAG_FALLBACK decides:
+    'primary' reads from the primary, 'replica' from the least lagging
+    replica that is reachable.
+    """
+    lags = {alias: replica_lag(alias) for alias in settings.DB_REPLICAS}
+    reachable = [alias for alias, lag in lags.items() if lag is not None]
+    fresh = [
+        alias for alias in reachable
+        if lags[alias] <= settings.DB_REPLICA_MAX_LAG
+    ]
+    if fresh:
+        return SELECTORS[settings.DB_REPLICA_SELECTION](fresh, lags)
+    if reachable and settings.DB_REPLICA_LAG_FALLBACK == 'replica':
+        return _pick_least_lag(reachable, lags)
+
+    return None
+
+
+class ReplicaRouter:
+    """ route reads of replica requests to their replica, see
+    ReplicaReadMixin, and everything else to the primary """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        """ objects read from a replica are written to the primary """
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in settings.DB_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """ replicas hold the same rows as the primary """
+        aliases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """ view mixin reading list and retrieve requests from a replica
+
+    The replica is chosen once authentication passed, so tokens are
+    always looked up on the primary. A successful write pins its user to
+    the primary for DB_PRIMARY_PIN_SECONDS, so users read their own
+    writes while replicas catch up.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _replica.set(None)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+
+        if self.request.method not in SAFE_METHODS and \
+                response.status_code < 400 and \
+                self.request.user.is_authenticated:
+            pin_to_primary(self.request.user.pk)
+
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if settings.DB_REPLICAS and request.method in ('GET', 'HEAD') and \
+                getattr(self, 'action', 'retrieve') in REPLICA_ACTIONS and \
+                not is_pinned(request.user.pk):
+            _replica.set(choose_replica())
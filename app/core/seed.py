@@ -0,0 +1,133 @@
+import itertools
+import math
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from core.bulk import bulk_insert, bulk_link
+from core.models import Tag, Ingredient, Recipe
+
+
+BATCH_SIZE = 1000
+
+
+def seed_users(count, prefix, password=None):
+    """ insert count users sharing password, unusable by default, and
+    return them; the password is hashed once for all of them """
+    User = get_user_model()
+    hashed = make_password(password)
+    return bulk_insert(User, [
+        User(email = f'{prefix}-{i}@example.com', password = hashed)
+        for i in range(count)
+    ], BATCH_SIZE)
+
+
+def seed_recipes(rng, user, recipes, tags, ingredients,
+                 tags_per_recipe=3, ingredients_per_recipe=6):
+    """ insert synthetic tags, ingredients and linked recipes of user
+
+    Must run inside a transaction, see core.bulk.bulk_insert.
+    """
+    tag_objs = bulk_insert(Tag, [
+        Tag(user = user, name = f'tag{rng.randrange(10 ** 6)}')
+        for _ in range(tags)
+    ], BATCH_SIZE)
+    ingredient_objs = bulk_insert(Ingredient, [
+        Ingredient(user = user, name = f'ing{rng.randrange(10 ** 6)}')
+        for _ in range(ingredients)
+    ], BATCH_SIZE)
+    recipe_objs = bulk_insert(Recipe, [
+        Recipe(
+            user = user,
+            title = f'Recipe {i}',
+            time_minutes = rng.randint(5, 120),
+            price = rng.randint(100, 5000) / 100
+        )
+        for i in range(recipes)
+    ], BATCH_SIZE)
+
+    for relation, model, targets, per_recipe in (
+            (Recipe.tags, Tag, tag_objs, tags_per_recipe),
+            (Recipe.ingredients, Ingredient, ingredient_objs,
+             ingredients_per_recipe)):
+        links = [
+            (recipe.pk, target.pk)
+            for recipe in recipe_objs
+            for target in rng.sample(targets, min(per_recipe, len(targets)))
+        ]
+        bulk_link(relation, links, BATCH_SIZE)
+        model.objects.adjust_recipe_counts(Counter(pk for _, pk in links))
+
+    return recipe_objs
+
+
+TAG_WORDS = (
+    'Vegan', 'Vegetarian', 'Quick', 'Dinner', 'Lunch', 'Breakfast',
+    'Dessert', 'Italian', 'Mexican', 'Indian', 'Thai', 'Japanese',
+    'Gluten Free', 'Low Carb', 'Spicy', 'Comfort', 'Healthy', 'Budget',
+    'Baking', 'Grill', 'Soup', 'Salad', 'Party', 'Kids', 'One Pot',
+    'Slow Cooker', 'Seafood', 'Summer', 'Winter', 'Brunch',
+)
+INGREDIENT_WORDS = (
+    'Salt', 'Pepper', 'Olive Oil', 'Garlic', 'Onion', 'Butter', 'Flour',
+    'Sugar', 'Egg', 'Milk', 'Tomato', 'Lemon', 'Rice', 'Pasta', 'Chicken',
+    'Beef', 'Potato', 'Carrot', 'Basil', 'Parsley', 'Cheese', 'Cream',
+    'Ginger', 'Chili', 'Cumin', 'Paprika', 'Honey', 'Soy Sauce', 'Lime',
+    'Spinach', 'Mushroom', 'Bell Pepper', 'Coconut Milk', 'Chickpeas',
+    'Lentils', 'Salmon', 'Shrimp', 'Tofu', 'Yogurt', 'Vinegar',
+)
+TITLE_ADJECTIVES = (
+    'Easy', 'Classic', 'Crispy', 'Creamy', 'Roasted', 'Grilled', 'Spiced',
+    'Smoky', 'Fresh', 'Hearty', "Grandma's", 'Weeknight',
+)
+TITLE_DISHES = (
+    'Stew', 'Curry', 'Salad', 'Bowl', 'Pie', 'Soup', 'Tacos', 'Pasta',
+    'Bake', 'Stir Fry', 'Risotto', 'Skewers', 'Sandwich', 'Tart',
+)
+
+
+def names(rng, words, count):
+    """ return count distinct names from words, numbered once used up,
+    in random order """
+    result = list(itertools.islice((
+        word if round_ == 0 else f'{word} {round_ + 1}'
+        for round_ in itertools.count() for word in words
+    ), count))
+    rng.shuffle(result)
+    return result
+
+
+def zipf_cum_weights(count, exponent):
+    """ return cumulative Zipf weights of ranks 1..count for choices() """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def zipf_sample(rng, cum_weights, k):
+    """ return up to k distinct indexes drawn with Zipf cum_weights """
+    population = range(len(cum_weights))
+    k = min(k, len(cum_weights))
+    picked = dict.fromkeys(rng.choices(population, cum_weights=cum_weights,
+                                       k=k))
+    while len(picked) < k:
+        picked.setdefault(
+            rng.choices(population, cum_weights=cum_weights)[0]
+        )
+    return list(picked)
+
+
+def lognormal(rng, median, sigma, low, high):
+    """ return log-normal value with median, clamped to [low, high] """
+    return min(high, max(low, rng.lognormvariate(math.log(median), sigma)))
+
+
+def recipe_price(rng):
+    """ return price in cents, median 8.00, long tail to 999.99 """
+    return round(lognormal(rng, 800, 0.8, 50, 99999))
+
+
+def recipe_minutes(rng):
+    """ return preparation time, median 30 minutes, in 5 minute steps """
+    return 5 * round(lognormal(rng, 30, 0.7, 5, 600) / 5)
@@ -0,0 +1,144 @@
+from collections import Counter
+
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_init, \
+                                    post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, MediaBlob, Recipe
+
+
+# models storing a recipe_count and the M2M table of their recipe links
+COUNTED_RELATIONS = (
+    (Tag, Recipe.tags.through),
+    (Ingredient, Recipe.ingredients.through),
+)
+
+
+def add_references(name, delta):
+    """ change reference count of media blob name by delta """
+    if not name:
+        return
+
+    blob, created = MediaBlob.objects.get_or_create(
+        name = name, defaults = {'ref_count': delta}
+    )
+    if not created:
+        MediaBlob.objects.filter(pk = blob.pk).update(
+            ref_count = F('ref_count') + delta, updated_at = timezone.now()
+        )
+
+
+def _loaded_image_name(instance):
+    """ return image name of instance, or None if the field is deferred """
+    if 'image' not in instance.__dict__:
+        return None
+
+    return instance.image.name or ''
+
+
+@receiver(post_init, sender=Recipe)
+def remember_image(sender, instance, **kwargs):
+    """ remember the stored image name to detect replacement on save """
+    if instance.pk is None:
+        # not stored yet, an image passed in is a new upload
+        instance._stored_image = ''
+        return
+    name = _loaded_image_name(instance)
+    if name is not None:
+        instance._stored_image = name
+
+
+@receiver(pre_save, sender=Recipe)
+def load_stored_image(sender, instance, update_fields=None, **kwargs):
+    """ fetch stored image name of a recipe loaded with image deferred """
+    if hasattr(instance, '_stored_image') or instance.pk is None:
+        return
+    if _loaded_image_name(instance) is None:
+        return
+
+    instance._stored_image = Recipe.objects.filter(
+        pk = instance.pk
+    ).values_list('image', flat=True).first() or ''
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_references(sender, instance, update_fields=None, **kwargs):
+    """ move a reference from the replaced image to the new one """
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    name = _loaded_image_name(instance)
+    if name is None:
+        return
+
+    stored = getattr(instance, '_stored_image', '')
+    if name != stored:
+        add_references(name, 1)
+        add_references(stored, -1)
+    instance._stored_image = name
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image(sender, instance, **kwargs):
+    """ drop the reference of a deleted recipe to its image """
+    add_references(getattr(instance, '_stored_image', ''), -1)
+
+
+def _linked_counts(through, target, **filters):
+    """ return Counter of target ids over M2M rows matching filters """
+    return Counter(through.objects.filter(**filters).values_list(
+        f'{target}_id', flat=True
+    ))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_relation_change(sender, instance, action, reverse, model, pk_set,
+                          **kwargs):
+    """ keep recipe_count of tags and ingredients in line with links """
+    counted = type(instance) if reverse else model
+    target = counted._meta.model_name
+    own, other = (target, 'recipe') if reverse else ('recipe', target)
+
+    if action == 'post_add':
+        # pk_set only holds ids that were not linked yet
+        if reverse:
+            deltas = {instance.pk: len(pk_set)}
+        else:
+            deltas = dict.fromkeys(pk_set, 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        # remove() accepts ids that are not linked and clear() gives none,
+        # so the rows about to be deleted are counted first
+        filters = {own: instance}
+        if action == 'pre_remove':
+            filters[f'{other}__in'] = pk_set
+        instance._removed_links = _linked_counts(sender, target, **filters)
+        return
+    elif action in ('post_remove', 'post_clear'):
+        removed = getattr(instance, '_removed_links', {})
+        deltas = {pk: -count for pk, count in removed.items()}
+    else:
+        return
+
+    counted.objects.adjust_recipe_counts(deltas)
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_counted_links(sender, instance, **kwargs):
+    """ remember tags and ingredients of a recipe about to be deleted """
+    instance._deleted_links = [
+        (counted, _linked_counts(
+            through, counted._meta.model_name, recipe = instance
+        ))
+        for counted, through in COUNTED_RELATIONS
+    ]
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_links(sender, instance, **kwargs):
+    """ release the recipe counts of a deleted recipe's links """
+    for counted, links in getattr(instance, '_deleted_links', ()):
+        counted.objects.adjust_recipe_counts({
+            pk: -count for pk, count in links.items()
+        })
@@ -0,0 +1,65 @@
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+
+HASH_NAME_RE = re.compile(r'^[0-9a-f]{64}(?:_\w+)?$')
+
+
+def file_digest(content, chunk_size=64 * 1024):
+    """ return sha256 hex digest of a django File, read in chunks """
+    sha = hashlib.sha256()
+    for chunk in content.chunks(chunk_size):
+        sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+def content_tag(name):
+    """ return the content-derived identity of a stored name, or None
+
+    Blobs are named `<sha256>.<ext>` and files derived from them, like
+    thumbnails, `<sha256>_<variant>.<ext>`, so the name alone identifies
+    the bytes and never has to be re-hashed.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if not HASH_NAME_RE.match(stem):
+        return None
+
+    return stem
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """ file system storage naming files by the sha256 of their content
+
+    The directory chosen by `upload_to` is kept and the file name is
+    replaced with `<aa>/<sha256>.<ext>`, so identical uploads resolve to
+    the same name and are written once. References to each blob are
+    counted by core.models.MediaBlob.
+    """
+
+    def hashed_name(self, name, digest):
+        """ return content-addressed name of content with digest """
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+
+        return os.path.join(directory, digest[:2], f'{digest}{ext}')
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, file_digest(content))
+        path = self.path(name)
+        if self.exists(name):
+            # refresh mtime so cleanup_media sees the blob as in use
+            os.utime(path)
+            return name
+
+        # write under a private name and rename into place: a blob that
+        # exists is always complete, and concurrent uploads of the same
+        # content simply replace it with identical bytes
+        tmp_name = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(tmp_name), path)
+
+        return name
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+
+
+# database standing in for a read replica in tests using it, see
+# core.routers; nothing is replicated to it, so tests see where each
+# read went
+REPLICA_STANDIN = 'replica'
+
+
+class TestRunner(DiscoverRunner):
+    """ test runner counting request budgets in a store of its own, so
+    runs do not share counters with each other or a running server, and
+    adding the replica stand-in database """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._throttle_dir = tempfile.mkdtemp()
+        settings.THROTTLE_STORE_PATH = os.path.join(
+            self._throttle_dir, 'throttle'
+        )
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        shutil.rmtree(self._throttle_dir, ignore_errors=True)
+
+    def setup_databases(self, **kwargs):
+        primary = connections.databases[DEFAULT_DB_ALIAS]
+        # a second database on the primary's server, in memory on SQLite
+        connections.databases.setdefault(REPLICA_STANDIN, dict(
+            primary, TEST=dict(primary['TEST'], MIRROR=None, NAME=(
+                None if primary['ENGINE'].endswith('sqlite3')
+                else f"test_{primary['NAME']}_replica"
+            )),
+        ))
+        return super().setup_databases(**kwargs)
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from rest_framework import viewsets
+from rest_framework.response import Response
+
+from core.async_views import AsyncReadMixin, StreamingASGIHandler, \
+                             async_reads
+
+
+class ThreadNameViewSet(viewsets.ViewSet):
+    """ responds with the name of the thread serving the request """
+
+    def list(self, request):
+        return Response({'thread': threading.current_thread().name})
+
+    def create(self, request):
+        return Response({'thread': threading.current_thread().name})
+
+
+class AsyncReadsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = async_reads(ThreadNameViewSet.as_view({
+            'get': 'list', 'post': 'create'
+        }))
+
+    def test_read_actions_run_in_database_threads(self):
+        """ Test list runs off the event loop and is rendered there """
+        res = async_to_sync(self.view)(self.factory.get('/'))
+
+        self.assertTrue(res.is_rendered)
+        self.assertTrue(res.data['thread'].startswith('db'))
+
+    def test_write_actions_run_in_sync_thread(self):
+        """ Test writes keep running where Django runs sync views """
+        res = async_to_sync(self.view)(self.factory.post('/'))
+
+        self.assertFalse(res.data['thread'].startswith('db'))
+
+    def test_mixin_only_async_with_async_reads(self):
+        """ Test viewsets return async views only when enabled """
+        class ViewSet(AsyncReadMixin, ThreadNameViewSet):
+            pass
+
+        with override_settings(ASYNC_READS=False):
+            view = ViewSet.as_view({'get': 'list'})
+            self.assertFalse(asyncio.iscoroutinefunction(view))
+        with override_settings(ASYNC_READS=True):
+            view = ViewSet.as_view({'get': 'list'})
+            self.assertTrue(asyncio.iscoroutinefunction(view))
+            self.assertTrue(view.csrf_exempt)
+
+
+class StreamingASGIHandlerTests(SimpleTestCase):
+
+    def send_response(self, response):
+        """ return messages sent for response """
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(StreamingASGIHandler().send_response(response, send))
+        return messages
+
+    def test_streaming_content_read_off_event_loop(self):
+        """ Test streams are read outside the event loop thread """
+        loop_thread = threading.get_ident()
+
+        def parts():
+            yield b'on loop: '
+            yield str(threading.get_ident() == loop_thread).encode()
+
+        messages = self.send_response(StreamingHttpResponse(parts()))
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(
+            b''.join(message.get('body', b'') for message in messages[1:]),
+            b'on loop: False'
+        )
+        self.assertFalse(messages[-1].get('more_body', False))
+
+    def test_plain_responses_sent_unchanged(self):
+        """ Test non streaming responses use Django's handling """
+        messages = self.send_response(HttpResponse(b'body', status=201))
+
+        self.assertEqual(messages[0]['status'], 201)
+        self.assertEqual(messages[1]['body'], b'body')
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from core.benchmark import compare_runs, percentile, server_errors
+from core.management.commands.benchmark_endpoints import Command
+
+
+def run(**endpoints):
+    return {'endpoints': endpoints}
+
+
+class BenchmarkTests(SimpleTestCase):
+
+    def test_percentile(self):
+        """ Test nearest rank percentiles of sorted samples """
+        samples = list(range(1, 101))
+
+        self.assertEqual(percentile(samples, 0.5), 50)
+        self.assertEqual(percentile(samples, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_compare_runs(self):
+        """ Test metrics worse than the tolerance are regressions """
+        baseline = run(
+            a={'throughput': 100, 'p95_ms': 10, 'queries_per_request': 2},
+            gone={'throughput': 1},
+        )
+        current = run(
+            a={'throughput': 85, 'p95_ms': 10.5, 'queries_per_request': 3},
+            new={'throughput': 1},
+        )
+
+        self.assertEqual(compare_runs(baseline, current, 0.1), [
+            ('a', 'throughput', 100, 85, True),
+            ('a', 'p95_ms', 10, 10.5, False),
+            ('a', 'queries_per_request', 2, 3, True),
+        ])
+
+    def test_small_query_changes_ignored(self):
+        """ Test query means of mostly cached endpoints may drift """
+        rows = compare_runs(
+            run(a={'queries_per_request': 0.02}),
+            run(a={'queries_per_request': 0.4}), 0.1
+        )
+
+        self.assertFalse(rows[0][4])
+
+    def test_server_errors(self):
+        """ Test 5xx responses are counted per endpoint """
+        results = run(
+            a={'statuses': {'200': 10, '500': 2, '503': 1}},
+            b={'statuses': {'201': 5, '404': 1}},
+        )
+
+        self.assertEqual(server_errors(results), {'a': 3})
+
+    def test_sqlite_writes_serialized(self):
+        """ Test writes to SQLite are sent over one connection """
+        labels = ['GET recipe:tag-list', 'POST recipe:tag-list']
+        options = {'connections': 50}
+
+        with patch.object(connection, 'vendor', 'sqlite'):
+            self.assertEqual(Command()._connections(labels, options), 1)
+            self.assertEqual(
+                Command()._connections(labels[:1], options), 50
+            )
+        with patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(Command()._connections(labels, options), 50)
@@ -1,23 +1,39 @@
-from unittest.mock import patch
+from unittest.mock import call, patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+
+ENSURE_CONNECTION = \
+    "django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection"
+
+
 class CommandTests(TestCase):
-    
+
     def test_wait_for_db_ready(self):
         """ Test waiting for db when db ready """
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.return_value = True
+        with patch(ENSURE_CONNECTION) as ec:
             call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 1)
-    
+            self.assertEqual(ec.call_count, 1)
+
     @patch("time.sleep", return_value=True)
     def test_wait_for_db(self, ts):
-        """ Test waiting for db """
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 6)
-    
\ No newline at end of file
+        """ Test waiting for db retries with capped exponential backoff """
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]
+            call_command("wait_for_db", initial_delay=1, max_delay=4)
+            self.assertEqual(ec.call_count, 6)
+            self.assertEqual(
+                ts.call_args_list,
+                [call(1), call(2), call(4), call(4), call(4)]
+            )
+
+    @patch("time.sleep", return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """ Test waiting for db gives up after the timeout """
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command("wait_for_db", timeout=0)
@@ -0,0 +1,105 @@
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import check_connections, connection_stats, count_opened
+
+
+DB_STATS_URL = reverse('database-stats')
+
+
+def fake_connection(usable=True, open=True):
+    """ return a stand in for a database wrapper """
+    connection = MagicMock(in_atomic_block=False, _stats_open=open)
+    connection.connection = object() if open else None
+    connection.is_usable.return_value = usable
+    return connection
+
+
+class ConnectionHealthCheckTests(TestCase):
+
+    def setUp(self):
+        connection_stats.reset()
+
+    def check(self, *wrappers):
+        with patch('core.db.connections.all', return_value=list(wrappers)):
+            check_connections()
+
+    def test_usable_connection_reused(self):
+        """ Test an open working connection is kept and counted as reused """
+        wrapper = fake_connection()
+        self.check(wrapper)
+
+        wrapper.close.assert_not_called()
+        self.assertEqual(connection_stats.snapshot()['reused'], 1)
+
+    def test_broken_connection_recycled(self):
+        """ Test a broken connection is closed before the request uses it """
+        wrapper = fake_connection(usable=False)
+        self.check(wrapper)
+
+        wrapper.close.assert_called_once_with()
+        self.assertEqual(connection_stats.snapshot()['recycled'], 1)
+        self.assertEqual(connection_stats.snapshot()['reused'], 0)
+
+    @override_settings(DB_HEALTH_CHECKS=False)
+    def test_health_checks_disabled(self):
+        """ Test connections are not pinged with health checks off """
+        wrapper = fake_connection(usable=False)
+        self.check(wrapper)
+
+        wrapper.is_usable.assert_not_called()
+        wrapper.close.assert_not_called()
+
+    def test_connection_in_transaction_not_pinged(self):
+        """ Test a connection inside atomic() is never closed """
+        wrapper = fake_connection(usable=False)
+        wrapper.in_atomic_block = True
+        self.check(wrapper)
+
+        wrapper.close.assert_not_called()
+
+    def test_opened_and_closed_counted(self):
+        """ Test opening and Django closing a connection are counted """
+        wrapper = fake_connection(open=False)
+        count_opened(sender=None, connection=wrapper)
+        wrapper.connection = None
+        self.check(wrapper)
+        self.check(wrapper)
+
+        stats = connection_stats.snapshot()
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['closed'], 1)
+        self.assertEqual(stats['reused'], 0)
+
+
+class DatabaseStatsViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_stats_require_staff(self):
+        """ Test connection stats are not shown to regular users """
+        user = get_user_model().objects.create_user('test@example.com', 'pw')
+        self.client.force_authenticate(user)
+        res = self.client.get(DB_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_for_staff(self):
+        """ Test staff users see the worker's connection counters """
+        user = get_user_model().objects.create_superuser(
+            'admin@example.com', 'pw'
+        )
+        self.client.force_authenticate(user)
+        res = self.client.get(DB_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(res.data['connections']), set(connection_stats.EVENTS)
+        )
@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from core.models import Tag, Ingredient, Recipe
+
+
+class ImportRecipesCommandTests(TestCase):
+    """ test the import_recipes command """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.vegan = Tag.objects.create(user = self.user, name = 'Vegan')
+
+    def run_import(self, content, suffix, **options):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix=suffix, delete=False) as dump:
+            dump.write(content)
+        self.addCleanup(os.remove, dump.name)
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_recipes', dump.name, user = 'test@test.com',
+            stdout = out, stderr = err, **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_import_ndjson(self):
+        """ test importing recipes and resolving names in batches"""
+        rows = [
+            {'title': f'Recipe {i}', 'time_minutes': 10, 'price': '4.50',
+             'tags': ['Vegan', 'Quick'], 'ingredients': ['Salt']}
+            for i in range(5)
+        ]
+        content = ''.join(json.dumps(row) + '\n' for row in rows)
+
+        out, _ = self.run_import(content, '.ndjson', batch_size = 2)
+
+        self.assertIn('Imported 5 recipes', out)
+        recipes = Recipe.objects.filter(user = self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(
+            set(Tag.objects.filter(user = self.user).values_list(
+                'name', 'recipe_count'
+            )),
+            {('Vegan', 5), ('Quick', 5)}
+        )
+        self.assertEqual(Ingredient.objects.get(name = 'Salt').recipe_count, 5)
+        recipe = recipes.get(title = 'Recipe 3')
+        self.assertIn(self.vegan, recipe.tags.all())
+
+    def test_import_csv(self):
+        """ test importing a CSV dump with joined names"""
+        content = (
+            'id,title,time_minutes,price,link,tags,ingredients\n'
+            '7,Soup,30,5.00,,Vegan|Dinner,Salt|Water\n'
+        )
+
+        self.run_import(content, '.csv')
+
+        recipe = Recipe.objects.get(user = self.user)
+        self.assertEqual(
+            sorted(recipe.ingredients.values_list('name', flat=True)),
+            ['Salt', 'Water']
+        )
+
+    def test_invalid_rows_are_skipped(self):
+        """ test that bad rows are reported without stopping the import"""
+        content = (
+            json.dumps({'title': 'Good', 'time_minutes': 5, 'price': '1'})
+            + '\nnot json\n'
+            + json.dumps({'title': 'Bad', 'time_minutes': 'soon',
+                          'price': '1'}) + '\n'
+        )
+
+        out, err = self.run_import(content, '.ndjson')
+
+        self.assertIn('skipped 2 invalid rows', out)
+        self.assertIn('line 2', err)
+        self.assertIn('line 3', err)
+        self.assertEqual(Recipe.objects.filter(user = self.user).count(), 1)
+
+    def test_names_that_are_not_strings_are_skipped(self):
+        """ test rows with objects in name lists do not stop the import"""
+        rows = [
+            {'title': 'Bad', 'time_minutes': 5, 'price': '1',
+             'tags': [{'name': 'Vegan'}]},
+            {'title': 'Worse', 'time_minutes': 5, 'price': '1',
+             'ingredients': [['Salt']]},
+            {'title': 'Good', 'time_minutes': 5, 'price': '1',
+             'tags': ['Vegan']},
+        ]
+        content = ''.join(json.dumps(row) + '\n' for row in rows)
+
+        out, err = self.run_import(content, '.ndjson')
+
+        self.assertIn('skipped 2 invalid rows', out)
+        self.assertIn('Expected a list of names.', err)
+        recipe = Recipe.objects.get(user = self.user)
+        self.assertEqual(recipe.title, 'Good')
+
+    def test_export_round_trip(self):
+        """ test that an export imports back into another account"""
+        recipe = Recipe.objects.create(
+            user = self.user, title = 'Soup', time_minutes = 5, price = 5
+        )
+        recipe.tags.add(self.vegan)
+        dump = StringIO()
+        call_command('export_recipes', user = 'test@test.com', stdout = dump)
+        get_user_model().objects.create_user('new@test.com', 'Pass123')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as f:
+            f.write(dump.getvalue())
+            f.flush()
+            call_command(
+                'import_recipes', f.name, user = 'new@test.com',
+                stdout = StringIO(), stderr = StringIO()
+            )
+
+        imported = Recipe.objects.get(user__email = 'new@test.com')
+        self.assertEqual(imported.title, 'Soup')
+        self.assertEqual(
+            list(imported.tags.values_list('name', flat=True)), ['Vegan']
+        )
+
+    def test_csv_export_round_trip_keeps_separators(self):
+        """ test names holding the list separator survive a CSV dump"""
+        recipe = Recipe.objects.create(
+            user = self.user, title = 'Soup', time_minutes = 5, price = 5
+        )
+        recipe.tags.add(
+            self.vegan,
+            Tag.objects.create(user = self.user, name = 'Salt|Pepper'),
+            Tag.objects.create(user = self.user, name = 'Back\\slash|'),
+        )
+        dump = StringIO()
+        call_command('export_recipes', user = 'test@test.com',
+                     format = 'csv', stdout = dump)
+        get_user_model().objects.create_user('new@test.com', 'Pass123')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write(dump.getvalue())
+            f.flush()
+            call_command(
+                'import_recipes', f.name, user = 'new@test.com',
+                stdout = StringIO(), stderr = StringIO()
+            )
+
+        imported = Recipe.objects.get(user__email = 'new@test.com')
+        self.assertEqual(
+            sorted(imported.tags.values_list('name', flat=True)),
+            ['Back\\slash|', 'Salt|Pepper', 'Vegan']
+        )
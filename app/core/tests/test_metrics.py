@@ -0,0 +1,151 @@
+import re
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+                        override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.metrics import Histogram, RequestMetricsMiddleware, \
+                         RequestTimings, request_metrics, timer, _current
+from core.models import Tag
+
+
+METRICS_URL = reverse('metrics')
+TAGS_URL = reverse('recipe:tag-list')
+
+SERVER_TIMING_RE = re.compile(
+    r'^sql;dur=[\d.]+;desc="(\d+) queries", serialize;dur=([\d.]+), '
+    r'auth;dur=([\d.]+), total;dur=([\d.]+)$'
+)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT = 0)
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        request_metrics.reset()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'Pass123'
+        )
+        Tag.objects.create(user = self.user, name = 'Vegan')
+        token = Token.objects.create(user = self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION = f'Token {token.key}')
+
+    def test_server_timing_header(self):
+        """ Test responses report queries and time of each phase """
+        res = self.client.get(TAGS_URL)
+
+        match = SERVER_TIMING_RE.match(res['Server-Timing'])
+        self.assertIsNotNone(match, res['Server-Timing'])
+        queries, serialize, auth, total = match.groups()
+        self.assertGreaterEqual(int(queries), 2)
+        self.assertGreater(float(auth), 0)
+        self.assertGreater(float(serialize), 0)
+        self.assertGreaterEqual(float(total), float(auth))
+
+    @override_settings(SERVER_TIMING = False)
+    def test_server_timing_disabled(self):
+        """ Test the header can be turned off """
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_metrics_by_view(self):
+        """ Test requests are aggregated by resolved view name """
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+        self.client.get('/no/such/path/')
+        res = self.client.get(METRICS_URL)
+        text = res.content.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            'app_request_duration_seconds_count{view="recipe:tag-list"} 2',
+            text
+        )
+        self.assertIn(
+            'app_request_auth_duration_seconds_bucket'
+            '{view="recipe:tag-list",le="+Inf"} 2', text
+        )
+        self.assertIn(
+            'app_request_sql_queries_count{view="unresolved"} 1', text
+        )
+        self.assertIn('app_token_cache_hits_total ', text)
+        self.assertIn(
+            'app_db_connection_events_total{event="opened"} ', text
+        )
+
+    @override_settings(METRICS_TOKEN = 'secret')
+    def test_metrics_token(self):
+        """ Test a configured token is required to read metrics """
+        client = APIClient()
+        denied = client.get(METRICS_URL)
+        client.credentials(HTTP_AUTHORIZATION = 'Bearer secret')
+        allowed = client.get(METRICS_URL)
+
+        self.assertEqual(denied.status_code, 403)
+        self.assertEqual(allowed.status_code, 200)
+
+
+class TimerTests(TestCase):
+
+    def test_phases_exclude_queries(self):
+        """ Test queries run in a span count as sql, once each """
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            with timer('serialize'):
+                with timer('serialize'):
+                    list(Tag.objects.all())
+        finally:
+            _current.reset(token)
+
+        self.assertEqual(timings.queries, 1)
+        self.assertGreater(timings.durations['sql'], 0)
+        self.assertLess(timings.durations['serialize'], 0.01)
+
+    def test_no_request(self):
+        """ Test timers and queries outside of a request record nothing """
+        with timer('auth'):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+        self.assertIsNone(_current.get())
+
+    def test_async_middleware(self):
+        """ Test timings reach sync code run from an async request """
+        def view(request):
+            list(Tag.objects.all())
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(sync_to_async(view))
+        res = async_to_sync(middleware)(RequestFactory().get('/'))
+
+        self.assertIn('desc="1 queries"', res['Server-Timing'])
+
+
+class HistogramTests(SimpleTestCase):
+
+    def test_cumulative_buckets(self):
+        """ Test buckets are cumulative and labels escaped """
+        histogram = Histogram('h', 'help', (1, 5))
+        for value in (0.5, 1, 3, 7):
+            histogram.observe('a"b', value)
+
+        self.assertEqual(list(histogram.lines()), [
+            '# HELP h help',
+            '# TYPE h histogram',
+            'h_bucket{view="a\\"b",le="1"} 2',
+            'h_bucket{view="a\\"b",le="5"} 3',
+            'h_bucket{view="a\\"b",le="+Inf"} 4',
+            'h_sum{view="a\\"b"} 11.5',
+            'h_count{view="a\\"b"} 4',
+        ])
@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from core.models import Tag, Ingredient, Recipe
+
+
+class RecipeCountTests(TestCase):
+    """ test stored recipe counts of tags and ingredients """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.tag1 = Tag.objects.create(user = self.user, name = 'Tag1')
+        self.tag2 = Tag.objects.create(user = self.user, name = 'Tag2')
+        self.ingredient = Ingredient.objects.create(
+            user = self.user, name = 'Ingredient1'
+        )
+
+    def sample_recipe(self):
+        return Recipe.objects.create(
+            user = self.user, title = 'Recipe', time_minutes = 5, price = 5
+        )
+
+    def counts(self):
+        return {
+            tag.name: tag.recipe_count
+            for tag in Tag.objects.filter(user = self.user)
+        }
+
+    def test_counts_follow_forward_changes(self):
+        """ test counts after add, set, remove and clear from recipes"""
+        recipe1, recipe2 = self.sample_recipe(), self.sample_recipe()
+        recipe1.tags.add(self.tag1, self.tag2)
+        recipe2.tags.add(self.tag1)
+        recipe2.tags.add(self.tag1)
+        self.assertEqual(self.counts(), {'Tag1': 2, 'Tag2': 1})
+
+        recipe1.tags.set([self.tag2])
+        self.assertEqual(self.counts(), {'Tag1': 1, 'Tag2': 1})
+
+        recipe2.tags.remove(self.tag1, self.tag2)
+        self.assertEqual(self.counts(), {'Tag1': 0, 'Tag2': 1})
+
+        recipe1.tags.clear()
+        self.assertEqual(self.counts(), {'Tag1': 0, 'Tag2': 0})
+
+    def test_counts_follow_reverse_changes(self):
+        """ test counts after changing recipes of a tag"""
+        recipe1, recipe2 = self.sample_recipe(), self.sample_recipe()
+        self.tag1.recipe_set.add(recipe1, recipe2)
+        self.assertEqual(self.counts()['Tag1'], 2)
+
+        self.tag1.recipe_set.remove(recipe1)
+        self.assertEqual(self.counts()['Tag1'], 1)
+
+        self.tag1.recipe_set.clear()
+        self.assertEqual(self.counts()['Tag1'], 0)
+
+    def test_recipe_delete_releases_counts(self):
+        """ test that deleting recipes decrements their tags"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag1)
+        recipe.ingredients.add(self.ingredient)
+
+        Recipe.objects.filter(id = recipe.id).delete()
+
+        self.assertEqual(self.counts()['Tag1'], 0)
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.ingredient.recipe_count, 0)
+
+    def test_repair_command(self):
+        """ test that repair recomputes drifted counts"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag1)
+        Tag.objects.update(recipe_count = 7)
+        out = StringIO()
+
+        call_command('repair_recipe_counts', stdout = out)
+
+        self.assertEqual(self.counts(), {'Tag1': 1, 'Tag2': 0})
+        self.assertIn('tags: fixed 2', out.getvalue())
@@ -0,0 +1,74 @@
+import datetime
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer, json_array_chunks
+
+
+SAMPLE = OrderedDict([
+    ('title', 'Crème brûlée   "quoted" \\ end'),
+    ('price', Decimal('4.50')),
+    ('when', datetime.datetime(
+        2020, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc
+    )),
+    ('day', datetime.date(2020, 1, 2)),
+    ('message', gettext_lazy('This field is required.')),
+    ('counts', {1: 2, 3: 4}),
+    ('nested', [None, True, 1.5, -7, [], {}]),
+])
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def test_same_bytes_as_stock_renderer(self):
+        """ Test orjson output matches the stock renderer """
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE), JSONRenderer().render(SAMPLE)
+        )
+
+    def test_none_renders_empty(self):
+        """ Test no data renders no body """
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indent_uses_stock_renderer(self):
+        """ Test pretty printed output is left to the stock renderer """
+        media_type = 'application/json; indent=4'
+
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE, media_type),
+            JSONRenderer().render(SAMPLE, media_type)
+        )
+
+    def test_unsupported_data_falls_back(self):
+        """ Test data orjson rejects is rendered by the stock renderer """
+        data = {'big': 2 ** 70}
+
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+
+class JSONArrayChunksTests(SimpleTestCase):
+
+    def test_chunks_join_to_whole_array(self):
+        """ Test streamed chunks join to the list rendered at once """
+        items = [SAMPLE, {'id': 1}, [2], 'three']
+        renderer = FastJSONRenderer()
+
+        streamed = b''.join(json_array_chunks(
+            renderer, [items[:1], [], items[1:3], items[3:]]
+        ))
+
+        self.assertEqual(streamed, renderer.render(items))
+
+    def test_no_items(self):
+        """ Test an empty stream is an empty array """
+        self.assertEqual(
+            b''.join(json_array_chunks(JSONRenderer(), [[], []])), b'[]'
+        )
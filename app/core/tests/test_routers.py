@@ -0,0 +1,184 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Tag, Recipe
+from core.routers import _replica, choose_replica, replica_lag
+from core.test_runner import REPLICA_STANDIN
+
+from recipe.facets import FacetIndex
+from recipe.search import SearchIndex
+
+
+TAGS_URL = reverse('recipe:tag-list')
+ME_URL = reverse('users:me')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(
+    DB_REPLICAS = [REPLICA_STANDIN], DB_REPLICA_LAG_CHECK_INTERVAL = 0,
+    DB_REPLICA_MAX_LAG = 5, DB_REPLICA_LAG_FALLBACK = 'primary',
+    DB_PRIMARY_PIN_SECONDS = 10, RESPONSE_CACHE_TIMEOUT = 0,
+)
+class ReplicaRoutingTests(TestCase):
+    """ test reads against a stand-in replica nothing is replicated to """
+
+    databases = {'default', REPLICA_STANDIN}
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'Pass123'
+        )
+        token = Token.objects.create(user = self.user)
+        self.user.save(using = REPLICA_STANDIN)
+        Tag.objects.create(user = self.user, name = 'Primary')
+        Tag.objects.using(REPLICA_STANDIN).create(
+            user = self.user, name = 'Replica'
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION = f'Token {token.key}')
+
+    def tag_names(self):
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [tag['name'] for tag in res.data]
+
+    def test_reads_from_replica(self):
+        """ test list and retrieve read from the replica """
+        self.assertEqual(self.tag_names(), ['Replica'])
+
+        recipe = Recipe.objects.using(REPLICA_STANDIN).create(
+            user = self.user, title = 'Soup', time_minutes = 5,
+            price = Decimal('2.00')
+        )
+        res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Soup')
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_write_pins_user_to_primary(self):
+        """ test writes go to the primary and its reads follow them """
+        res = self.client.post(TAGS_URL, {'name': 'New'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertTrue(Tag.objects.using('default').filter(
+            name = 'New'
+        ).exists())
+        self.assertEqual(sorted(self.tag_names()), ['New', 'Primary'])
+
+    def test_failed_write_does_not_pin(self):
+        res = self.client.post(TAGS_URL, {'name': ''})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self.tag_names(), ['Replica'])
+
+    @override_settings(DB_PRIMARY_PIN_SECONDS = 0)
+    def test_pin_expires(self):
+        self.client.post(TAGS_URL, {'name': 'New'})
+
+        self.assertEqual(self.tag_names(), ['Replica'])
+
+    def test_lag_fallback(self):
+        """ test a lagging replica is skipped unless configured not to """
+        with patch('core.routers._query_lag', return_value = 30.0):
+            self.assertEqual(self.tag_names(), ['Primary'])
+            with self.settings(DB_REPLICA_LAG_FALLBACK = 'replica'):
+                self.assertEqual(self.tag_names(), ['Replica'])
+
+        with patch('core.routers._query_lag', side_effect = DatabaseError):
+            with self.settings(DB_REPLICA_LAG_FALLBACK = 'replica'):
+                self.assertEqual(self.tag_names(), ['Primary'])
+
+    @override_settings(DB_REPLICAS = [])
+    def test_no_replicas(self):
+        self.assertEqual(self.tag_names(), ['Primary'])
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT = 60)
+    def test_replica_lists_not_cached(self):
+        """ test lists read from a replica are neither cached nor tagged
+        with the version of the primary """
+        res = self.client.get(TAGS_URL)
+        self.assertNotIn('ETag', res)
+
+        with self.settings(DB_REPLICAS = []):
+            res = self.client.get(TAGS_URL)
+        self.assertEqual([tag['name'] for tag in res.data], ['Primary'])
+        self.assertIn('ETag', res)
+
+    def test_indexes_built_from_primary(self):
+        """ test indexes kept per version never hold replica rows """
+        recipe = Recipe.objects.create(
+            user = self.user, title = 'Soup', time_minutes = 5,
+            price = Decimal('2.00')
+        )
+        token = _replica.set(REPLICA_STANDIN)
+        try:
+            facets = FacetIndex.build(self.user.pk, 1)
+            search = SearchIndex.build(self.user.pk, 1)
+        finally:
+            _replica.reset(token)
+
+        self.assertEqual(facets.recipe_ids, [recipe.id])
+        self.assertEqual(
+            [recipe_id for recipe_id, _ in search.search('soup', 10)],
+            [recipe.id]
+        )
+
+
+@override_settings(
+    DB_REPLICAS = ['replica1', 'replica2', 'replica3'],
+    DB_REPLICA_MAX_LAG = 5, DB_REPLICA_LAG_FALLBACK = 'primary',
+)
+class ReplicaSelectionTests(SimpleTestCase):
+    """ test choosing among replicas by their lag """
+
+    LAGS = {'replica1': 3.0, 'replica2': 1.0, 'replica3': 60.0}
+
+    def setUp(self):
+        patcher = patch('core.routers.replica_lag', self.LAGS.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def choices(self, selection, count = 4):
+        with self.settings(DB_REPLICA_SELECTION = selection):
+            return [choose_replica() for _ in range(count)]
+
+    def test_selection(self):
+        self.assertEqual(self.choices('first'), ['replica1'] * 4)
+        self.assertEqual(self.choices('least_lag'), ['replica2'] * 4)
+        self.assertEqual(set(self.choices('round_robin', 2)),
+                         {'replica1', 'replica2'})
+        self.assertTrue(
+            set(self.choices('random', 20)) <= {'replica1', 'replica2'}
+        )
+
+    @override_settings(DB_REPLICA_MAX_LAG = 0.5)
+    def test_fallback(self):
+        self.assertEqual(self.choices('first', 1), [None])
+        with self.settings(DB_REPLICA_LAG_FALLBACK = 'replica'):
+            self.assertEqual(self.choices('first', 1), ['replica2'])
+
+
+class ReplicaLagTests(SimpleTestCase):
+
+    @override_settings(DB_REPLICA_LAG_CHECK_INTERVAL = 60)
+    def test_lag_checked_per_interval(self):
+        with patch('core.routers._query_lag', return_value = 2.0) as query:
+            self.assertEqual(replica_lag('lag-test'), 2.0)
+            self.assertEqual(replica_lag('lag-test'), 2.0)
+
+        query.assert_called_once()
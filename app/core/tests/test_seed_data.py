@@ -0,0 +1,96 @@
+import random
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from core.models import Tag, Ingredient, MediaBlob, Recipe, User
+from core.seed import zipf_cum_weights, zipf_sample
+
+
+def seed(**options):
+    out = StringIO()
+    call_command(
+        'seed_data', stdout = out, stderr = StringIO(),
+        **dict({'users': 3, 'recipes': 20, 'tags': 8, 'ingredients': 15},
+               **options)
+    )
+    return out.getvalue()
+
+
+class SeedDataCommandTests(TestCase):
+    """ test the seed_data command """
+
+    def test_seed_data(self):
+        """ test users, their rows and stored recipe counts are created """
+        out = seed(batch_size = 25, password = 'Pass123')
+
+        users = User.objects.filter(email__startswith = 'seed-')
+        self.assertEqual(users.count(), 3)
+        self.assertTrue(users.first().check_password('Pass123'))
+        self.assertEqual(Tag.objects.count(), 24)
+        self.assertEqual(Ingredient.objects.count(), 45)
+        self.assertIn(f'{Recipe.objects.count()} recipes', out)
+        self.assertEqual(Tag.objects.recount(), 0)
+        self.assertEqual(Ingredient.objects.recount(), 0)
+        for recipe in Recipe.objects.all()[:10]:
+            self.assertTrue(1 <= recipe.tags.count() <= 5)
+            self.assertEqual(set(recipe.tags.values_list('user', flat=True)),
+                             {recipe.user_id})
+            self.assertTrue(0 < recipe.price < 1000)
+            self.assertEqual(recipe.time_minutes % 5, 0)
+
+    def test_seed_is_deterministic(self):
+        """ test the same seed gives the same data in any batch size """
+        seed(prefix = 'a', scale = 2)
+        seed(prefix = 'b', scale = 2, batch_size = 1)
+
+        def rows(prefix):
+            return list(Recipe.objects.filter(
+                user__email__startswith = prefix
+            ).order_by('id').values_list('title', 'price', 'time_minutes'))
+
+        self.assertEqual(len(rows('a-')), len(rows('b-')))
+        self.assertEqual(rows('a-'), rows('b-'))
+        self.assertEqual(User.objects.filter(
+            email__startswith = 'a-'
+        ).count(), 6)
+
+    def test_existing_prefix_rejected(self):
+        """ test a second run must use another prefix """
+        seed(users = 1)
+
+        with self.assertRaises(CommandError):
+            seed(users = 1)
+
+    def test_placeholder_images(self):
+        """ test a fraction of recipes share counted placeholder images """
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT = media_root):
+            seed(images = 0.5)
+
+        with_image = Recipe.objects.exclude(image = None).exclude(image = '')
+        self.assertTrue(0 < with_image.count() < Recipe.objects.count())
+        self.assertEqual(
+            sum(MediaBlob.objects.values_list('ref_count', flat=True)),
+            with_image.count()
+        )
+
+
+class ZipfTests(TestCase):
+
+    def test_zipf_sample(self):
+        """ test picks are distinct and favour the first ranks """
+        rng = random.Random(0)
+        weights = zipf_cum_weights(50, 1.1)
+        picks = [zipf_sample(rng, weights, 5) for _ in range(2000)]
+
+        self.assertTrue(all(len(set(pick)) == 5 for pick in picks))
+        first = sum(0 in pick for pick in picks)
+        last = sum(49 in pick for pick in picks)
+        self.assertGreater(first, 5 * last)
+        self.assertEqual(len(zipf_sample(rng, weights[:3], 5)), 3)
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.models import MediaBlob, Recipe
+
+
+class ContentAddressedStorageTests(TestCase):
+    """ test content-addressed media storage and reference counting """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT = self.media_root)
+        self.settings.enable()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def sample_recipe(self, content = b'image'):
+        recipe = Recipe.objects.create(
+            user = self.user, title = 'Recipe', time_minutes = 5, price = 5
+        )
+        recipe.image.save('photo.JPG', ContentFile(content))
+        return recipe
+
+    def refs(self, name):
+        return MediaBlob.objects.get(name = name).ref_count
+
+    def test_identical_content_shares_one_file(self):
+        """ test that uploads of the same bytes resolve to one blob"""
+        first = default_storage.save('uploads/a.jpg', ContentFile(b'same'))
+        second = default_storage.save('uploads/b.jpg', ContentFile(b'same'))
+        other = default_storage.save('uploads/c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^uploads/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(len(os.listdir(os.path.dirname(
+            default_storage.path(first)
+        ))), 1)
+
+    def test_references_follow_recipe_images(self):
+        """ test that reference counts track saves, replaces and deletes"""
+        first = self.sample_recipe()
+        second = self.sample_recipe()
+        name = first.image.name
+
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(self.refs(name), 2)
+
+        second.image.save('other.jpg', ContentFile(b'other'))
+        self.assertEqual(self.refs(name), 1)
+        self.assertEqual(self.refs(second.image.name), 1)
+
+        Recipe.objects.get(id = first.id).delete()
+        self.assertEqual(self.refs(name), 0)
+
+    def test_cleanup_deletes_orphans_and_derived_files(self):
+        """ test that cleanup removes unreferenced blobs only"""
+        orphan = self.sample_recipe(b'orphan')
+        kept = self.sample_recipe(b'kept')
+        name = orphan.image.name
+        thumbnail = name.replace('.jpg', '_128px.jpg')
+        default_storage.save(thumbnail, ContentFile(b'thumb'))
+        orphan.delete()
+        MediaBlob.objects.update(
+            updated_at = timezone.now() - timedelta(hours = 2)
+        )
+        os.utime(default_storage.path(name), (0, 0))
+
+        call_command('cleanup_media', stdout = open(os.devnull, 'w'))
+
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name = name).exists())
+        self.assertTrue(default_storage.exists(kept.image.name))
+
+    def test_recount_rebuilds_reference_counts(self):
+        """ test that recount matches counts to recipe images"""
+        recipe = self.sample_recipe()
+        MediaBlob.objects.all().delete()
+
+        call_command(
+            'cleanup_media', '--recount', stdout = open(os.devnull, 'w')
+        )
+
+        self.assertEqual(self.refs(recipe.image.name), 1)
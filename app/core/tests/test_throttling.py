@@ -0,0 +1,254 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.throttling import SlidingWindowStore, parse_rate
+
+
+TAGS_URL = reverse('recipe:tag-list')
+CREATE_USER_URL = reverse('users:create')
+ME_URL = reverse('users:me')
+
+
+def temporary_store_path(test):
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    return os.path.join(directory, 'throttle')
+
+
+def hit_many(path, times, results):
+    store = SlidingWindowStore(path, 64)
+    results.put(sum(
+        store.hit(42, 100, 60000, now = 1000)[0] for _ in range(times)
+    ))
+
+
+class SlidingWindowStoreTests(SimpleTestCase):
+    """ test the shared sliding window counters """
+
+    def setUp(self):
+        self.path = temporary_store_path(self)
+        self.store = SlidingWindowStore(self.path, 64)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('100/min'), (100, 60000))
+        self.assertEqual(parse_rate('5/s'), (5, 1000))
+        self.assertEqual(parse_rate('1000/day'), (1000, 86400000))
+
+    def test_sliding_window(self):
+        """ test the previous window counts for the part still covered """
+        for _ in range(3):
+            self.assertEqual(self.store.hit(7, 3, 1000, now = 10000),
+                             (True, None))
+        self.assertEqual(self.store.hit(7, 3, 1000, now = 10000),
+                         (False, 1.0))
+
+        # half way into the next window 1.5 of the 3 still count
+        for _ in range(2):
+            self.assertTrue(self.store.hit(7, 3, 1000, now = 11500)[0])
+        allowed, wait = self.store.hit(7, 3, 1000, now = 11500)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1 / 6)
+        self.assertTrue(self.store.hit(7, 3, 1000, now = 11700)[0])
+
+        # a whole window later nothing is left
+        for _ in range(3):
+            self.assertTrue(self.store.hit(7, 3, 1000, now = 13000)[0])
+
+    def test_keys_and_stores(self):
+        """ test keys count apart and stores of one file share counts """
+        self.assertTrue(self.store.hit(1, 1, 1000, now = 0)[0])
+        self.assertTrue(self.store.hit(2, 1, 1000, now = 0)[0])
+        other = SlidingWindowStore(self.path, 64)
+        self.assertFalse(other.hit(1, 1, 1000, now = 0)[0])
+
+        other.clear()
+        self.assertTrue(self.store.hit(1, 1, 1000, now = 0)[0])
+
+    def test_full_table(self):
+        """ test keys only take over slots whose windows expired """
+        store = SlidingWindowStore(temporary_store_path(self), 2)
+        self.assertTrue(store.hit(1, 1, 1000, now = 0)[0])
+        self.assertTrue(store.hit(2, 1, 1000, now = 500)[0])
+        self.assertEqual(store.hit(3, 1, 1000, now = 600), (None, 1.4))
+        self.assertFalse(store.hit(1, 1, 1000, now = 600)[0])
+        self.assertFalse(store.hit(2, 1, 1000, now = 600)[0])
+
+        # both windows ended over a window ago
+        self.assertTrue(store.hit(3, 1, 1000, now = 2000)[0])
+        self.assertFalse(store.hit(3, 1, 1000, now = 2000)[0])
+
+    def test_processes(self):
+        """ test worker processes never let more than the limit through """
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [
+            context.Process(target = hit_many,
+                            args = (self.path, 50, results))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        allowed = sum(results.get(timeout = 30) for _ in processes)
+        for process in processes:
+            process.join()
+
+        self.assertEqual(allowed, 100)
+
+
+class ThrottleApiTests(TestCase):
+    """ test request budgets of the API endpoints """
+
+    def setUp(self):
+        settings = override_settings(
+            THROTTLE_STORE_PATH = temporary_store_path(self),
+            THROTTLE_RATES = {
+                'token_read': '3/min', 'token_write': '1/min',
+                'ip_read': '', 'ip_write': '2/min',
+            },
+            RESPONSE_CACHE_TIMEOUT = 0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'Pass123'
+        )
+        self.token = Token.objects.create(user = self.user)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION = f'Token {self.token.key}'
+        )
+
+    def test_read_and_write_budgets(self):
+        """ test reads and writes of a token are counted apart """
+        for _ in range(3):
+            res = self.client.get(TAGS_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertTrue(1 <= int(res['Retry-After']) <= 60)
+
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        res = self.client.post(TAGS_URL, {'name': 'Dessert'})
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_rejected_without_queries(self):
+        """ test a token over budget is refused before it is looked up """
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION = 'Token bogus')
+        for _ in range(3):
+            res = client.get(TAGS_URL)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with self.assertNumQueries(0):
+            res = client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # other tokens keep their own budget
+        self.assertEqual(self.client.get(TAGS_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_ip_budget(self):
+        """ test anonymous writes are counted per client address """
+        client = APIClient()
+        for index in range(2):
+            res = client.post(CREATE_USER_URL, {
+                'email': f'new{index}@example.com', 'password': 'Pass123',
+                'name': 'New',
+            })
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        payload = {'email': 'new@example.com', 'password': 'Pass123',
+                   'name': 'New'}
+        res = client.post(CREATE_USER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        res = client.post(CREATE_USER_URL, payload,
+                          REMOTE_ADDR = '10.0.0.2')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_forwarded_for_ignored(self):
+        """ test addresses a client claims in X-Forwarded-For are not
+        counted against instead of its own """
+        client = APIClient()
+        for index in range(3):
+            res = client.post(CREATE_USER_URL, {},
+                              HTTP_X_FORWARDED_FOR = f'1.2.3.{index}')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_STORE_SLOTS = 8)
+    def test_full_store_refuses_no_new_client(self):
+        """ test clients the flooded store has no slot for are let in """
+        for index in range(8):
+            APIClient(REMOTE_ADDR = f'10.0.1.{index}').post(
+                CREATE_USER_URL, {}
+            )
+
+        res = APIClient(REMOTE_ADDR = '10.0.2.1').post(CREATE_USER_URL, {
+            'email': 'new@example.com', 'password': 'Pass123',
+            'name': 'New',
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(THROTTLE_STORE_SLOTS = 8)
+    def test_token_flood_keeps_other_budgets(self):
+        """ test random tokens filling the store reset no other budget and
+        are let through once neither they nor their address get a slot """
+        self.assertEqual(self.client.get(TAGS_URL).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(self.client.get(TAGS_URL).status_code,
+                         status.HTTP_200_OK)
+
+        flooder = APIClient(REMOTE_ADDR = '10.0.0.9')
+        statuses = set()
+        for index in range(20):
+            flooder.credentials(HTTP_AUTHORIZATION = f'Token random{index}')
+            statuses.add(flooder.get(TAGS_URL).status_code)
+        self.assertEqual(statuses, {status.HTTP_401_UNAUTHORIZED})
+
+        self.assertEqual(self.client.get(TAGS_URL).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(self.client.get(TAGS_URL).status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_STORE_SLOTS = 4)
+    def test_token_without_slot_counted_per_address(self):
+        """ test tokens crowded out share the budget of their address """
+        keys = {
+            self.token.key: 8, 'ip 10.0.0.9': 2,
+            # these all probe slots 0 and 1 only
+            'random0': 4, 'random1': 12, 'random2': 16, 'random3': 20,
+            'random4': 24,
+        }
+        flooder = APIClient(REMOTE_ADDR = '10.0.0.9')
+        statuses = []
+        with patch('core.throttling.PROBES', 2), \
+                patch('core.throttling._key',
+                      lambda scope, ident: keys[ident]):
+            self.assertEqual(self.client.get(TAGS_URL).status_code,
+                             status.HTTP_200_OK)
+            for index in range(5):
+                flooder.credentials(
+                    HTTP_AUTHORIZATION = f'Token random{index}'
+                )
+                statuses.append(flooder.get(TAGS_URL).status_code)
+            for _ in range(3):
+                statuses.append(self.client.get(TAGS_URL).status_code)
+
+        self.assertEqual(statuses, [
+            status.HTTP_401_UNAUTHORIZED, status.HTTP_401_UNAUTHORIZED,
+            status.HTTP_401_UNAUTHORIZED, status.HTTP_401_UNAUTHORIZED,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            status.HTTP_200_OK, status.HTTP_200_OK,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        ])
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+
+class ServeMediaTests(TestCase):
+    """ test serving media files """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT = self.media_root)
+        self.settings.enable()
+        self.name = default_storage.save(
+            'uploads/recipe/photo.png', ContentFile(b'0123456789')
+        )
+        self.url = f'/media/{self.name}'
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_serves_with_strong_etag_and_long_cache(self):
+        """ test that content-addressed files are cached as immutable"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), b'0123456789')
+        self.assertEqual(res['Content-Type'], 'image/png')
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertIn('immutable', res['Cache-Control'])
+        digest = self.name.rsplit('/', 1)[1].split('.')[0]
+        self.assertEqual(res['ETag'], f'"{digest}"')
+
+    def test_if_none_match_returns_not_modified(self):
+        """ test that a matching ETag returns 304 without a body"""
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH = etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+    def test_range_requests(self):
+        """ test serving single byte ranges"""
+        res = self.client.get(self.url, HTTP_RANGE = 'bytes=2-4')
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), b'234')
+        self.assertEqual(res['Content-Range'], 'bytes 2-4/10')
+
+        res = self.client.get(self.url, HTTP_RANGE = 'bytes=-3')
+        self.assertEqual(b''.join(res.streaming_content), b'789')
+
+        res = self.client.get(self.url, HTTP_RANGE = 'bytes=20-')
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_serves_whole_file(self):
+        """ test that a range for another version is ignored"""
+        res = self.client.get(
+            self.url, HTTP_RANGE = 'bytes=2-4', HTTP_IF_RANGE = '"stale"'
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT = '/protected-media/')
+    def test_accel_redirect(self):
+        """ test handing the body to the proxy when configured"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected-media/{self.name}'
+        )
+        self.assertEqual(res.content, b'')
+
+    def test_missing_and_outside_paths_not_found(self):
+        """ test that missing files and traversal return 404"""
+        self.assertEqual(self.client.get('/media/nope.png').status_code, 404)
+        self.assertEqual(
+            self.client.get('/media/../settings.py').status_code, 404
+        )
@@ -0,0 +1,47 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import get_resolver
+
+from core import warmup
+
+
+class WarmUpTests(TestCase):
+
+    def test_warm_up_runs_every_step(self):
+        """ Test warm up times each step """
+        timings = warmup.warm_up()
+
+        self.assertEqual(
+            [step for step, _ in timings],
+            [step for step, _ in warmup.WARM_UP_STEPS]
+        )
+
+    def test_url_names_of_namespaces(self):
+        """ Test the recipe and users routes are resolved """
+        names = set(warmup._url_names(get_resolver().url_patterns))
+
+        self.assertIn('recipe:recipe-list', names)
+        self.assertIn('recipe:recipe-detail', names)
+        self.assertIn('users:token', names)
+        self.assertNotIn('database-stats', names)
+
+    def test_failing_step_does_not_stop_warm_up(self):
+        """ Test a failing step is logged and the rest still run """
+        with patch.object(warmup, 'WARM_UP_STEPS', (
+            ('broken', lambda: 1 / 0),
+            ('caches', warmup.prime_caches),
+        )):
+            with self.assertLogs('core.warmup', 'ERROR'):
+                timings = warmup.warm_up()
+
+        self.assertEqual([step for step, _ in timings], ['broken', 'caches'])
+
+    def test_warm_up_command(self):
+        """ Test the command reports every step """
+        out = StringIO()
+        call_command('warm_up', stdout=out)
+
+        self.assertIn('serializers:', out.getvalue())
@@ -0,0 +1,258 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+from rest_framework.authentication import get_authorization_header
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+
+# key hash, start of current window (ms), requests in the current and
+# previous window, window length (ms)
+SLOT = struct.Struct('<QqIII4x')
+
+# slots probed for a key; when all of them count live windows the key
+# gets none
+PROBES = 8
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """ return (requests, window ms) of a rate like '100/min' """
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]] * 1000
+
+
+class SlidingWindowStore:
+    """ sliding window request counters in a memory mapped file
+
+    Every worker process on the host maps the same file, so budgets are
+    shared without a round trip to a cache or database. Keys live in a
+    fixed table of slots found by hash; a slot is only reused once its
+    windows expired, so keys flooding the table cannot reset the counts
+    of others, and a key finding no such slot is not counted. The
+    sliding count is the
+    current fixed window's count plus the previous window's, weighted by
+    how much of it the sliding window still covers. Updates hold a
+    thread lock and an fcntl lock on the file, for a few microseconds.
+    """
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        size = slots * SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, duration, now=None):
+        """ count a request against key unless it is over limit requests
+        per duration ms; return (allowed, seconds until allowed), with
+        allowed None if no slot was free to count it in """
+        if now is None:
+            now = int(time.time() * 1000)
+        key = key or 1
+        window = now - now % duration
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1)
+            try:
+                offset, slot = self._find(key, now)
+                if offset is None:
+                    return None, slot
+                if slot is None or slot[0] != key or slot[4] != duration:
+                    slot = (key, window, 0, 0, duration)
+                current, previous = self._roll(slot, window, duration)
+
+                weight = (duration - (now - window)) / duration
+                if previous * weight + current >= limit:
+                    SLOT.pack_into(
+                        self._map, offset, key, window, current, previous,
+                        duration
+                    )
+                    return False, self._wait(
+                        limit, current, previous, duration, now - window
+                    )
+
+                SLOT.pack_into(
+                    self._map, offset, key, window, current + 1, previous,
+                    duration
+                )
+                return True, None
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1)
+
+    def _find(self, key, now):
+        """ return (offset, slot) of key, (offset, None) of a free or
+        expired slot to take for it, else (None, seconds until one of the
+        probed slots expires) """
+        free = expires = None
+        for probe in range(PROBES):
+            offset = (key + probe) % self.slots * SLOT.size
+            slot = SLOT.unpack_from(self._map, offset)
+            if slot[0] == key:
+                return offset, slot
+            end = slot[1] + 2 * slot[4]
+            if free is None and (slot[0] == 0 or end <= now):
+                free = offset
+            if expires is None or end < expires:
+                expires = end
+
+        if free is None:
+            return None, (expires - now) / 1000
+        return free, None
+
+    def _roll(self, slot, window, duration):
+        """ return (current, previous) counts of slot as of window """
+        _, start, current, previous, _ = slot
+        if start == window:
+            return current, previous
+        if start == window - duration:
+            return 0, current
+        return 0, 0
+
+    def _wait(self, limit, current, previous, duration, elapsed):
+        """ seconds until the weighted count drops below limit """
+        if current >= limit or not previous:
+            return (duration - elapsed) / 1000
+        # previous * (duration - t) / duration + current < limit
+        wait = duration * (1 - (limit - current) / previous) - elapsed
+        return max(wait, 0) / 1000
+
+    def clear(self):
+        """ forget every counter """
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1)
+            try:
+                self._map[:] = bytes(len(self._map))
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """ return the store of THROTTLE_STORE_PATH, opened on first use """
+    global _store
+    path, slots = settings.THROTTLE_STORE_PATH, settings.THROTTLE_STORE_SLOTS
+    store = _store
+    if store is not None and store.path == path and store.slots == slots:
+        return store
+
+    with _store_lock:
+        if _store is None or _store.path != path or _store.slots != slots:
+            _store = SlidingWindowStore(path, slots)
+        return _store
+
+
+def _key(scope, ident):
+    """ return 64 bit slot key of scope and identity """
+    return int.from_bytes(hashlib.blake2b(
+        f'{scope}:{ident}'.encode(), digest_size=8
+    ).digest(), 'little')
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """ throttle with separate read and write budgets per identity
+
+    Rates come from THROTTLE_RATES under `<kind>_read` and `<kind>_write`;
+    a missing or empty rate turns that budget off. An identity the store
+    has no slot for is counted as its fallback identity instead, and let
+    through if there is none or it has no slot either, so a table flooded
+    with identities refuses no new client. Identities are taken
+    from the request as sent, without authenticating it, so clients over
+    budget are refused before any database work, see ThrottledViewMixin.
+    """
+
+    kind = None
+
+    def get_identity(self, request):
+        """ return the identity counted against, None to skip the request """
+        raise NotImplementedError
+
+    def get_fallback_identity(self, request):
+        """ return the identity counted against when the store has no
+        slot for get_identity's, None to let the request through """
+        return None
+
+    def allow_request(self, request, view):
+        access = 'read' if request.method in SAFE_METHODS else 'write'
+        scope = f'{self.kind}_{access}'
+        rate = settings.THROTTLE_RATES.get(scope)
+        if not rate:
+            return True
+        ident = self.get_identity(request)
+        if ident is None:
+            return True
+
+        limit, duration = parse_rate(rate)
+        allowed, self._wait = get_store().hit(
+            _key(scope, ident), limit, duration
+        )
+        if allowed is None:
+            ident = self.get_fallback_identity(request)
+            if ident is not None:
+                allowed, self._wait = get_store().hit(
+                    _key(scope, ident), limit, duration
+                )
+        return allowed is not False
+
+    def wait(self):
+        return self._wait
+
+
+class TokenRateThrottle(SlidingWindowThrottle):
+    """ budgets per API token presented in the Authorization header """
+
+    kind = 'token'
+
+    def get_identity(self, request):
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2 or auth[0].lower() != b'token':
+            return None
+        return auth[1].decode('latin1')
+
+    def get_fallback_identity(self, request):
+        """ tokens crowded out of the store, like random ones sent to
+        flood it, share a budget per client address; the space keeps it
+        apart from any token """
+        return f'ip {self.get_ident(request)}'
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    """ budgets per client address, see REST_FRAMEWORK NUM_PROXIES """
+
+    kind = 'ip'
+
+    def get_identity(self, request):
+        return self.get_ident(request)
+
+
+class ThrottledViewMixin:
+    """ view mixin applying the token and address budgets
+
+    Throttles are checked before authentication instead of after it, as
+    they only read the request, so a client over budget costs no token
+    lookup.
+    """
+
+    throttle_classes = (TokenRateThrottle, IPRateThrottle)
+
+    def initial(self, request, *args, **kwargs):
+        super().check_throttles(request)
+        super().initial(request, *args, **kwargs)
+
+    def check_throttles(self, request):
+        """ already done by initial() """
@@ -1,3 +1,233 @@
-from django.shortcuts import render
+import mimetypes
+import os
+import hmac
+import re
+import stat
 
-# Create your views here.
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection
+from django.http import FileResponse, Http404, HttpResponse, \
+                        HttpResponseForbidden
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+from rest_framework.authentication import SessionAuthentication, \
+                                        TokenAuthentication
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.db import connection_stats
+from core.metrics import render_metrics
+from core.storage import content_tag
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# content-addressed files never change under their name
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+
+class RangeFile:
+    """ file object reading at most length bytes from its position
+
+    Exposes fileno() so a server's wsgi.file_wrapper can still send the
+    range with sendfile(), starting from the current file offset.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """ return (start, end) of a single byte range header, inclusive
+
+    Returns None when the header is missing, malformed or asks for
+    several ranges, in which case the whole file is served, and raises
+    ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range, the last `last` bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+
+    return start, end
+
+
+def _etag(path, st):
+    tag = content_tag(path)
+    if tag is not None:
+        return f'"{tag}"'
+
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _matches(etag, header):
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+@require_safe
+def serve_media(request, path):
+    """ serve a file of MEDIA_ROOT with validators and byte ranges
+
+    Content-addressed files get their hash as a strong ETag and are
+    cached for a year. Bodies go out through wsgi.file_wrapper, which
+    servers like gunicorn implement with sendfile(). With
+    MEDIA_ACCEL_REDIRECT set, only headers are produced and the front
+    proxy sends the file itself from that internal location.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if full_path.endswith('.tmp'):
+        # a write in progress, see core.storage
+        raise Http404(path)
+
+    try:
+        file = open(full_path, 'rb')
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        raise Http404(path)
+
+    try:
+        st = os.fstat(file.fileno())
+        if not stat.S_ISREG(st.st_mode):
+            raise Http404(path)
+        response = _file_response(request, path, file, st)
+    except BaseException:
+        file.close()
+        raise
+    if not isinstance(response, FileResponse):
+        file.close()
+
+    return response
+
+
+def _file_response(request, path, file, st):
+    etag = _etag(path, st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': (
+            IMMUTABLE_CACHE_CONTROL if content_tag(path)
+            else REVALIDATE_CACHE_CONTROL
+        ),
+        'Accept-Ranges': 'bytes',
+    }
+
+    if _matches(etag, request.META.get('HTTP_IF_NONE_MATCH', '')):
+        return _with_headers(HttpResponse(status=304), headers)
+
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+
+    accel_prefix = settings.MEDIA_ACCEL_REDIRECT
+    if accel_prefix:
+        # the proxy handles Range and conditional requests from here
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + path
+        return _with_headers(response, headers)
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None or if_range == etag:
+        try:
+            byte_range = parse_range(
+                request.META.get('HTTP_RANGE'), st.st_size
+            )
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{st.st_size}'
+            return _with_headers(response, headers)
+
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = st.st_size
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(
+            RangeFile(file, end - start + 1), content_type=content_type,
+            status=206
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+
+    return _with_headers(response, headers)
+
+
+def _with_headers(response, headers):
+    for name, value in headers.items():
+        response[name] = value
+
+    return response
+
+
+class DatabaseStatsView(APIView):
+    """ report connection counters of the worker serving the request """
+
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': settings.DB_HEALTH_CHECKS,
+            'connections': connection_stats.snapshot(),
+        })
+
+
+@require_safe
+def metrics(request):
+    """ expose request timings and counters of the serving worker to
+    Prometheus, behind a bearer token when METRICS_TOKEN is set """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE
+    )
@@ -0,0 +1,113 @@
+import inspect
+import logging
+import time
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver, resolve, \
+                         reverse
+from django.urls.exceptions import NoReverseMatch
+from django.utils import translation
+
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+
+from core.async_views import open_thread_connections
+
+
+logger = logging.getLogger(__name__)
+
+# url namespaces whose patterns are resolved ahead of the first request
+WARM_UP_NAMESPACES = ('recipe', 'users')
+WARM_UP_SERIALIZER_MODULES = ('recipe.serializers', 'users.serializers')
+
+
+def open_connections():
+    """ connect to every configured database from the serving threads """
+    if settings.ASYNC_READS:
+        # reads run in the database threads, not the loading thread
+        open_thread_connections()
+        return
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _url_names(patterns, namespace=None):
+    """ yield namespaced names of patterns, compiling their regexes """
+    for pattern in patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            yield from _url_names(
+                pattern.url_patterns, pattern.namespace or namespace
+            )
+        elif isinstance(pattern, URLPattern) and pattern.name and \
+                namespace in WARM_UP_NAMESPACES:
+            pattern.callback
+            yield f'{namespace}:{pattern.name}'
+
+
+def resolve_urls():
+    """ compile url patterns and resolve every named route once """
+    for name in set(_url_names(get_resolver().url_patterns)):
+        try:
+            path = reverse(name)
+        except NoReverseMatch:
+            # detail routes; a sample pk resolves them just the same
+            try:
+                path = reverse(name, args=[1])
+            except NoReverseMatch:
+                continue
+        resolve(path)
+
+
+def build_serializers():
+    """ instantiate every serializer class and build its fields """
+    for module_name in WARM_UP_SERIALIZER_MODULES:
+        module = import_module(module_name)
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, BaseSerializer) and \
+                    cls.__module__ == module_name:
+                cls().fields
+
+
+def prime_caches():
+    """ fill lazily built process caches the first request would fill """
+    for model in apps.get_models():
+        model._meta.get_fields()
+    for alias in settings.CACHES:
+        caches[alias].get('warm-up')
+    translation.activate(settings.LANGUAGE_CODE)
+    for setting in ('DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES',
+                    'DEFAULT_CONTENT_NEGOTIATION_CLASS'):
+        getattr(api_settings, setting)
+
+
+WARM_UP_STEPS = (
+    ('connections', open_connections),
+    ('urls', resolve_urls),
+    ('serializers', build_serializers),
+    ('caches', prime_caches),
+)
+
+
+def warm_up():
+    """ run every warm up step and return [(step, seconds)]
+
+    Called when the WSGI/ASGI application is loaded, so the first request
+    a worker serves does not pay for connecting, url pattern compilation
+    and serializer construction. Steps that fail are logged and skipped;
+    readiness is checked by wait_for_db.
+    """
+    timings = []
+    for step, func in WARM_UP_STEPS:
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            logger.exception("Warm-up step %s failed", step)
+        timings.append((step, time.perf_counter() - start))
+
+    return timings
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RecipeConfig(AppConfig):
     name = 'recipe'
+
+    def ready(self):
+        """ connect response cache invalidation signals """
+        from recipe import signals  # noqa: F401
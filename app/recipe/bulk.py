@@ -0,0 +1,150 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from core.bulk import bulk_insert, bulk_link, bulk_update_fields
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.cache import bump_data_version
+from recipe.search import update_search_vectors
+from recipe.serializers import BulkRecipeSerializer
+
+
+RELATED_MODELS = (('tags', Tag), ('ingredients', Ingredient))
+
+
+def _missing_ids_error(ids):
+    return [f'Invalid pk "{pk}" - object does not exist.' for pk in ids]
+
+
+def _unique(ids):
+    """ return ids without duplicates, keeping order """
+    return list(dict.fromkeys(ids))
+
+
+def bulk_write_recipes(user, items):
+    """ create or update many recipes of user in a few queries
+
+    Items with an `id` partially update that recipe, others create a new
+    one. Invalid items are reported by index in the results and skipped;
+    all valid items are written in one transaction with batched INSERT
+    and CASE UPDATE statements and one bulk insert per M2M relation.
+    """
+    results = [None] * len(items)
+    valid = []
+    # one serializer per mode, reused for every item, so field
+    # construction is paid once rather than per recipe
+    create_serializer = BulkRecipeSerializer()
+    update_serializer = BulkRecipeSerializer(partial = True)
+    for index, item in enumerate(items):
+        serializer = create_serializer
+        if isinstance(item, dict) and 'id' in item:
+            serializer = update_serializer
+        try:
+            valid.append((index, serializer.run_validation(item)))
+        except ValidationError as exc:
+            results[index] = {
+                'index': index, 'errors': as_serializer_error(exc)
+            }
+
+    owned = {}
+    for field, model in RELATED_MODELS:
+        ids = {pk for _, data in valid for pk in data.get(field, ())}
+        owned[field] = set(model.objects.filter(
+            user = user, id__in = ids
+        ).values_list('id', flat=True))
+
+    update_ids = {data['id'] for _, data in valid if 'id' in data}
+    existing = Recipe.objects.filter(
+        user = user, id__in = update_ids
+    ).only('id').in_bulk()
+
+    creates, updates, seen_ids = [], [], set()
+    for index, data in valid:
+        errors = {}
+        for field, _ in RELATED_MODELS:
+            missing = [
+                pk for pk in data.get(field, ()) if pk not in owned[field]
+            ]
+            if missing:
+                errors[field] = _missing_ids_error(missing)
+        recipe_id = data.get('id')
+        if recipe_id is not None:
+            if recipe_id not in existing or recipe_id in seen_ids:
+                errors['id'] = ['Not found.']
+            seen_ids.add(recipe_id)
+
+        if errors:
+            results[index] = {'index': index, 'errors': errors}
+        elif recipe_id is None:
+            creates.append((index, data))
+        else:
+            updates.append((index, data))
+
+    if creates or updates:
+        with transaction.atomic():
+            _write(user, creates, updates, existing, results)
+
+        bump_data_version(user.pk)
+        update_search_vectors([
+            result['id'] for result in results if 'id' in result
+        ])
+
+    return results
+
+
+def _write(user, creates, updates, existing, results):
+    """ write validated creates and updates, filling in results """
+    batch_size = settings.BULK_BATCH_SIZE
+    scalar_fields = [
+        name for name in BulkRecipeSerializer.Meta.fields
+        if name not in ('id', 'tags', 'ingredients')
+    ]
+
+    recipes = bulk_insert(Recipe, [
+        Recipe(user = user, **{
+            name: data[name] for name in scalar_fields if name in data
+        })
+        for _, data in creates
+    ], batch_size)
+    for (index, _), recipe in zip(creates, recipes):
+        results[index] = {'index': index, 'id': recipe.pk, 'created': True}
+
+    by_fields = {}
+    for index, data in updates:
+        recipe = existing[data['id']]
+        fields = tuple(name for name in scalar_fields if name in data)
+        for name in fields:
+            setattr(recipe, name, data[name])
+        if fields:
+            by_fields.setdefault(fields, []).append(recipe)
+        results[index] = {'index': index, 'id': recipe.pk, 'created': False}
+    for fields, objs in by_fields.items():
+        bulk_update_fields(Recipe, objs, fields, batch_size)
+
+    written = [
+        (recipe.pk, data) for recipe, (_, data) in zip(recipes, creates)
+    ]
+    written += [(data['id'], data) for _, data in updates]
+    for field, model in RELATED_MODELS:
+        relation = getattr(Recipe, field)
+        links = [
+            (recipe_id, pk)
+            for recipe_id, data in written
+            for pk in _unique(data.get(field, ()))
+        ]
+        replace_ids = [data['id'] for _, data in updates if field in data]
+        target = relation.field.m2m_reverse_field_name()
+        # links bypass m2m_changed, so recipe counts are adjusted here by
+        # the difference between replaced and written links
+        deltas = Counter(pk for _, pk in links)
+        deltas.subtract(relation.through.objects.filter(
+            recipe_id__in = replace_ids
+        ).values_list(f'{target}_id', flat=True))
+
+        bulk_link(relation, links, batch_size, replace_ids=replace_ids)
+        model.objects.adjust_recipe_counts(deltas)
@@ -0,0 +1,149 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.routers import reading_replica
+
+
+VERSION_KEY = 'recipe:data-version:{}'
+COMMITTED_VERSION_KEY = 'recipe:committed-version:{}'
+RESPONSE_KEY = 'recipe:response:{}'
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def get_counter(key):
+    """ return value of shared version counter, creating it if missing """
+    value = _cache().get(key)
+    if value is None:
+        # start from the clock rather than 1 so a counter lost on eviction
+        # never matches entries cached before it was lost
+        _cache().add(key, int(time.time() * 1000), None)
+        value = _cache().get(key)
+
+    return value
+
+
+def incr_counter(key):
+    """ increment shared version counter and return new value """
+    try:
+        return _cache().incr(key)
+    except ValueError:
+        return get_counter(key)
+
+
+def data_version(user_id):
+    """ return current version of user's recipe data """
+    return get_counter(VERSION_KEY.format(user_id))
+
+
+def committed_version(user_id):
+    """ return version of user's data bumped only after commits """
+    return get_counter(COMMITTED_VERSION_KEY.format(user_id))
+
+
+def bump_data_version(user_id, on_commit=None):
+    """ invalidate all cached responses of user
+
+    The version is bumped right away and again once the transaction
+    commits, so a response cached by a concurrent reader from the
+    pre-commit rows is invalidated as well. The committed version is
+    bumped with the second one and passed to `on_commit(version)`.
+    """
+    key = VERSION_KEY.format(user_id)
+    incr_counter(key)
+
+    def committed():
+        incr_counter(key)
+        version = incr_counter(COMMITTED_VERSION_KEY.format(user_id))
+        if on_commit is not None:
+            on_commit(version)
+
+    transaction.on_commit(committed)
+
+
+def etag_matches(etag, header):
+    """ return whether If-None-Match header value matches etag, comparing
+    weakly as RFC 7232 asks of If-None-Match """
+    etags = [
+        tag[2:] if tag.startswith('W/') else tag
+        for tag in parse_etags(header)
+    ]
+    return '*' in etags or etag in etags
+
+
+def _normalize(name, value):
+    """ return canonical form of query param so equal filters share key """
+    if name.startswith(('tags', 'ingredients')):
+        try:
+            return ','.join(str(i) for i in sorted({
+                int(str_id) for str_id in value.split(',')
+            }))
+        except ValueError:
+            pass
+
+    return value
+
+
+class CachedListMixin:
+    """ serve list responses from a per-user versioned cache
+
+    Responses are keyed by user, host, path, renderer format and the
+    view's `cache_query_params`; the host as paginated bodies carry
+    absolute `next` links. Any write to the user's tags, ingredients or
+    recipes bumps the user's data version (see recipe.signals), which
+    changes every key and ETag at once. A matching `If-None-Match` is
+    answered with 304 before any rows are fetched. Lists read from a
+    replica, which may lag behind the version, are neither cached nor
+    tagged, so only rows read from the primary are kept under it.
+    """
+    cache_query_params = ()
+
+    def list(self, request, *args, **kwargs):
+        """ return cached list or build and cache it """
+        params = '&'.join(
+            f'{name}={_normalize(name, request.query_params[name])}'
+            for name in sorted(self.cache_query_params)
+            if name in request.query_params
+        )
+        version = data_version(request.user.pk)
+        digest = hashlib.sha1(
+            f'{request.user.pk}:{version}:{request.get_host()}:'
+            f'{request.path}:{request.accepted_renderer.format}:'
+            f'{params}'.encode()
+        ).hexdigest()
+        etag = f'"{digest}"'
+
+        current = True
+        if etag_matches(etag, request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = RESPONSE_KEY.format(digest)
+            data = _cache().get(key)
+            if data is None:
+                response = super().list(request, *args, **kwargs)
+                current = reading_replica() is None
+                # streamed lists are too large to keep
+                if current and not response.streaming:
+                    _cache().set(
+                        key, response.data, settings.RESPONSE_CACHE_TIMEOUT
+                    )
+            else:
+                response = Response(data)
+
+        if current:
+            response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+
+        return response
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import re
+from itertools import groupby
+from operator import itemgetter
+
+from core.models import Recipe
+
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+RELATIONS = ('tags', 'ingredients')
+
+# CSV cells hold several names, joined with this separator; separators
+# and backslashes inside names are escaped with a backslash
+CSV_LIST_SEPARATOR = '|'
+
+_CSV_NAME = re.compile(r'(?:\\.|[^|\\])+')
+_CSV_ESCAPE = re.compile(r'\\(.)')
+
+
+def join_names(names):
+    """ return names as one CSV cell, escaping separators in them """
+    return CSV_LIST_SEPARATOR.join(
+        name.replace('\\', '\\\\').replace(
+            CSV_LIST_SEPARATOR, '\\' + CSV_LIST_SEPARATOR
+        )
+        for name in names
+    )
+
+
+def split_names(value):
+    """ return the non-empty names of a CSV cell written by join_names """
+    return [
+        _CSV_ESCAPE.sub(r'\1', name) for name in _CSV_NAME.findall(value)
+    ]
+
+
+def _names_by_recipe(user, relation, chunk_size):
+    """ stream (recipe id, [names]) of user's recipes in recipe id order """
+    through = getattr(Recipe, relation).through
+    target = getattr(Recipe, relation).field.m2m_reverse_field_name()
+    # a semi-join ordered by recipe only lets rows stream off the
+    # (recipe_id, ...) index without a sort; the few names of a recipe are
+    # sorted here instead
+    rows = through.objects.filter(
+        recipe__in = Recipe.objects.filter(user = user).values('id')
+    ).order_by('recipe_id').values_list(
+        'recipe_id', f'{target}__name'
+    ).iterator(chunk_size=chunk_size)
+
+    for recipe_id, group in groupby(rows, key=itemgetter(0)):
+        yield recipe_id, sorted(name for _, name in group)
+
+
+def iter_recipes(user, chunk_size):
+    """ stream every recipe of user as a dict, with tag and ingredient names
+
+    Recipes and the links of each relation are read by three server-side
+    cursors, all in recipe id order, and merged as they arrive, so memory
+    use does not depend on the number of recipes.
+    """
+    recipes = Recipe.objects.filter(user = user).order_by('id').values_list(
+        *EXPORT_FIELDS
+    ).iterator(chunk_size=chunk_size)
+    links = {
+        relation: _names_by_recipe(user, relation, chunk_size)
+        for relation in RELATIONS
+    }
+    pending = {
+        relation: next(links[relation], None) for relation in RELATIONS
+    }
+
+    for values in recipes:
+        recipe = dict(zip(EXPORT_FIELDS, values))
+        recipe['price'] = str(recipe['price'])
+        for relation in RELATIONS:
+            # skip links of recipes the recipe cursor did not see, like
+            # ones created or deleted while exporting
+            while pending[relation] and pending[relation][0] < recipe['id']:
+                pending[relation] = next(links[relation], None)
+            if pending[relation] and pending[relation][0] == recipe['id']:
+                recipe[relation] = pending[relation][1]
+                pending[relation] = next(links[relation], None)
+            else:
+                recipe[relation] = []
+        yield recipe
+
+
+def _chunked(recipes, chunk_size):
+    """ group recipes into lists of chunk_size """
+    chunk = []
+    for recipe in recipes:
+        chunk.append(recipe)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ndjson_lines(recipes, chunk_size):
+    """ encode recipes as newline delimited JSON, one string per chunk """
+    for chunk in _chunked(recipes, chunk_size):
+        yield ''.join(
+            json.dumps(recipe, separators=(',', ':')) + '\n'
+            for recipe in chunk
+        )
+
+
+def csv_lines(recipes, chunk_size):
+    """ encode recipes as CSV with a header, one string per chunk """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS + RELATIONS)
+    for chunk in _chunked(recipes, chunk_size):
+        writer.writerows(
+            [recipe[field] for field in EXPORT_FIELDS] +
+            [join_names(recipe[field]) for field in RELATIONS]
+            for recipe in chunk
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # header of an empty export
+        yield buffer.getvalue()
+
+
+# export format: (content type, encoder)
+FORMATS = {
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+    'csv': ('text/csv', csv_lines),
+}
+
+
+def export_recipes(user, export_format, chunk_size):
+    """ return content type and string chunks of user's recipes export """
+    content_type, encode = FORMATS[export_format]
+    return content_type, encode(iter_recipes(user, chunk_size), chunk_size)
@@ -0,0 +1,301 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+from recipe.cache import committed_version
+
+
+# query params understood by the faceted filter, per relation:
+# `<relation>` matches any id, `<relation>_all` every id and
+# `<relation>_exclude` none of the ids
+RELATIONS = ('tags', 'ingredients')
+MODES = ('', '_all', '_exclude')
+FILTER_PARAMS = tuple(
+    relation + mode for relation in RELATIONS for mode in MODES
+)
+
+
+def popcount(bitset):
+    """ return number of set bits """
+    return bin(bitset).count('1')
+
+
+def _bitset(positions):
+    """ return int bitset with given bit positions set """
+    if not positions:
+        return 0
+
+    buf = bytearray(max(positions) // 8 + 1)
+    for pos in positions:
+        buf[pos >> 3] |= 1 << (pos & 7)
+
+    return int.from_bytes(buf, 'little')
+
+
+class FacetIndex:
+    """ inverted index of one user's recipes
+
+    Each recipe gets a dense bit position, and every tag and ingredient id
+    maps to the bitset of recipes linked to it, so AND/OR/NOT filters and
+    facet counts are plain integer bit operations.
+    """
+
+    def __init__(self, version, recipe_ids, links):
+        self.version = version
+        self.recipe_ids = list(recipe_ids)
+        self.positions = {
+            recipe_id: pos for pos, recipe_id in enumerate(self.recipe_ids)
+        }
+        self.alive = (1 << len(self.recipe_ids)) - 1
+        self.bitsets = {}
+        for relation in RELATIONS:
+            positions = {}
+            for recipe_id, related_id in links[relation]:
+                # links are read after the recipes, so they may include
+                # recipes created in between; those bump the data version
+                # and the index is rebuilt on next use anyway
+                pos = self.positions.get(recipe_id)
+                if pos is not None:
+                    positions.setdefault(related_id, []).append(pos)
+            self.bitsets[relation] = {
+                related_id: _bitset(pos)
+                for related_id, pos in positions.items()
+            }
+
+    @classmethod
+    def build(cls, user_id, version):
+        """ load index of user's recipes from the through tables of the
+        primary, as the index is kept for the version it was built at """
+        recipe_ids = Recipe.objects.using(DEFAULT_DB_ALIAS).filter(
+            user_id = user_id
+        ).order_by('id').values_list('id', flat=True)
+        links = {}
+        for relation in RELATIONS:
+            through = getattr(Recipe, relation).through
+            field = f'{relation[:-1]}_id'
+            links[relation] = through.objects.using(DEFAULT_DB_ALIAS).filter(
+                recipe__user_id = user_id
+            ).values_list('recipe_id', field)
+
+        return cls(version, recipe_ids, links)
+
+    def copy(self):
+        """ return copy of index that can be changed while readers keep
+        using this one """
+        index = FacetIndex.__new__(FacetIndex)
+        index.version = self.version
+        index.recipe_ids = list(self.recipe_ids)
+        index.positions = dict(self.positions)
+        index.alive = self.alive
+        index.bitsets = {
+            relation: dict(bitsets)
+            for relation, bitsets in self.bitsets.items()
+        }
+        return index
+
+    def add_recipe(self, recipe_id):
+        """ give new recipe a bit position """
+        if recipe_id in self.positions:
+            return
+        pos = len(self.recipe_ids)
+        self.recipe_ids.append(recipe_id)
+        self.positions[recipe_id] = pos
+        self.alive |= 1 << pos
+
+    def remove_recipe(self, recipe_id):
+        """ clear deleted recipe from every bitset """
+        pos = self.positions.pop(recipe_id, None)
+        if pos is None:
+            return
+        mask = ~(1 << pos)
+        self.alive &= mask
+        for bitsets in self.bitsets.values():
+            for related_id in list(bitsets):
+                bitsets[related_id] &= mask
+
+    def remove_related(self, relation, related_id):
+        """ drop deleted tag or ingredient """
+        self.bitsets[relation].pop(related_id, None)
+
+    def link(self, relation, recipe_ids, related_ids, linked):
+        """ set or clear recipe bits of related ids """
+        mask = _bitset([
+            self.positions[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in self.positions
+        ])
+        bitsets = self.bitsets[relation]
+        for related_id in related_ids:
+            if linked:
+                bitsets[related_id] = bitsets.get(related_id, 0) | mask
+            else:
+                bitsets[related_id] = bitsets.get(related_id, 0) & ~mask
+
+    def unlink_all(self, relation, recipe_id=None, related_id=None):
+        """ clear all links of one recipe or of one related id """
+        if related_id is not None:
+            self.bitsets[relation][related_id] = 0
+        elif recipe_id in self.positions:
+            self.link(
+                relation, [recipe_id], list(self.bitsets[relation]), False
+            )
+
+    def match(self, filters):
+        """ return bitset of recipes matching {param: [ids]} filters """
+        result = self.alive
+        for relation in RELATIONS:
+            bitsets = self.bitsets[relation]
+            any_ids = filters.get(relation)
+            if any_ids:
+                union = 0
+                for related_id in any_ids:
+                    union |= bitsets.get(related_id, 0)
+                result &= union
+            for related_id in filters.get(f'{relation}_all', ()):
+                result &= bitsets.get(related_id, 0)
+            for related_id in filters.get(f'{relation}_exclude', ()):
+                result &= ~bitsets.get(related_id, 0)
+
+        return result
+
+    def ids(self, bitset):
+        """ return recipe ids of bits set in bitset """
+        ids = []
+        data = bitset.to_bytes((bitset.bit_length() + 7) // 8, 'little')
+        for byte_pos, byte in enumerate(data):
+            if not byte:
+                continue
+            for bit in range(8):
+                if byte >> bit & 1:
+                    ids.append(self.recipe_ids[byte_pos * 8 + bit])
+
+        return ids
+
+    def counts(self, bitset):
+        """ return per relation {id: number of matching recipes} """
+        return {
+            relation: {
+                related_id: count
+                for related_id, count in (
+                    (related_id, popcount(bitset & related))
+                    for related_id, related in self.bitsets[relation].items()
+                )
+                if count
+            }
+            for relation in RELATIONS
+        }
+
+
+class IndexRegistry:
+    """ bounded LRU of per-user indexes built by `index_class.build`
+
+    An index is valid for the committed data version it was built or last
+    updated at (see recipe.cache). Once a write commits, signal handlers
+    apply it to a copy of the in-process index, see `update`, which
+    replaces the index at the new version; a version skipped by another
+    process makes the index stale and it is rebuilt on next use. Indexes
+    handed out are never changed, so requests read them without locking.
+    """
+
+    def __init__(self, index_class, max_users):
+        self.index_class = index_class
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """ return up to date index of user, building it if needed """
+        version = committed_version(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        index = self.index_class.build(user_id, version)
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+
+        return index
+
+    def update(self, user_id, version, change):
+        """ replace index with a copy changed by change(index) if index is
+        exactly one version behind """
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                return
+            if index.version != version - 1:
+                del self._indexes[user_id]
+                return
+            index = index.copy()
+            change(index)
+            index.version = version
+            self._indexes[user_id] = index
+
+    def discard(self, user_id):
+        """ drop index of user """
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def clear(self):
+        """ drop all indexes """
+        with self._lock:
+            self._indexes.clear()
+
+
+facet_indexes = IndexRegistry(FacetIndex, settings.FACET_INDEX_MAX_USERS)
+
+
+def parse_filters(query_params):
+    """ return {param: [ids]} of facet params present in query, ignoring
+    empty items and rejecting ones that are not ids """
+    filters = {}
+    for param in FILTER_PARAMS:
+        value = query_params.get(param)
+        if not value:
+            continue
+        try:
+            ids = [
+                int(str_id) for str_id in value.split(',') if str_id.strip()
+            ]
+        except ValueError:
+            raise ValidationError(
+                {param: ['Expected a comma separated list of ids.']}
+            )
+        if ids:
+            filters[param] = ids
+
+    return filters
+
+
+def filter_recipes(queryset, filters):
+    """ return queryset of recipes matching {param: [ids]} filters, in
+    subqueries on the through tables instead of a list of matched ids """
+    for relation in RELATIONS:
+        through = getattr(Recipe, relation).through
+        field = f'{relation[:-1]}_id'
+
+        def linked(ids):
+            return through.objects.filter(
+                **{f'{field}__in': ids}
+            ).values('recipe_id')
+
+        if filters.get(relation):
+            queryset = queryset.filter(id__in=linked(filters[relation]))
+        for related_id in filters.get(f'{relation}_all', ()):
+            queryset = queryset.filter(id__in=linked([related_id]))
+        if filters.get(f'{relation}_exclude'):
+            queryset = queryset.exclude(
+                id__in=linked(filters[f'{relation}_exclude'])
+            )
+
+    return queryset
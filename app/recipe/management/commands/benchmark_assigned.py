@@ -0,0 +1,71 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.benchmark import format_summary, summarize, timed
+from core.models import Tag
+from core.seed import seed_recipes, seed_users
+
+
+class Rollback(Exception):
+    """ raised to discard benchmark data """
+
+
+class Command(BaseCommand):
+    """ Django command to compare assigned_only tag list queries """
+
+    help = (
+        "Seed one user with --tags tags and --recipes recipes, then print "
+        "plans and latency of the assigned_only tag list as JOIN + "
+        "DISTINCT and as an EXISTS semi-join with usage counts. All data "
+        "is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=50000)
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, options):
+        user = seed_users(1, 'benchmark-assigned')[0]
+        seed_recipes(
+            random.Random(options['seed']), user, options['recipes'],
+            options['tags'], ingredients = 1, ingredients_per_recipe = 1
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        plans = (
+            ('join + distinct', Tag.objects.filter(
+                user = user, recipe__isnull = False
+            ).order_by('-name', '-id').distinct()),
+            ('exists + usage_count', Tag.objects.assigned().filter(
+                user = user
+            ).with_usage_count().order_by('-name', '-id')),
+        )
+        results = {}
+        for label, queryset in plans:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(queryset.explain())
+            samples = []
+            for _ in range(options['repeat']):
+                elapsed, rows = timed(list, queryset.all())
+                samples.append(elapsed)
+            results[label] = rows
+            self.stdout.write(format_summary(label, summarize(samples)))
+
+        old, new = (
+            [tag.pk for tag in rows] for rows in results.values()
+        )
+        if old != new:
+            self.stderr.write("plans returned different tags")
@@ -0,0 +1,82 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+
+
+class Rollback(Exception):
+    """ raised to discard benchmark data """
+
+
+class Command(BaseCommand):
+    """ Django command to compare single and bulk recipe creation """
+
+    help = (
+        "Create --recipes recipes through POST recipes/ one at a time and "
+        "through POST recipes/bulk/, report recipes/sec of each. All "
+        "data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--tags', type=int, default=3)
+
+    def handle(self, *args, **options):
+        count = options['recipes']
+        try:
+            with transaction.atomic(), \
+                    override_settings(ALLOWED_HOSTS=['testserver']):
+                single, bulk = self._run(count, options['tags'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"single: {count / single:.0f} recipes/s")
+        self.stdout.write(f"bulk:   {count / bulk:.0f} recipes/s")
+        self.stdout.write(self.style.SUCCESS(
+            f"bulk speedup: {single / bulk:.1f}x"
+        ))
+
+    def _run(self, count, tag_count):
+        """ return seconds taken by single and bulk creation """
+        user = get_user_model().objects.create_user(
+            'benchmark-bulk@example.com', 'benchmark'
+        )
+        tags = [
+            Tag.objects.create(user=user, name=f'tag{i}').id
+            for i in range(tag_count)
+        ]
+        ingredient = Ingredient.objects.create(user=user, name='salt').id
+        payload = [
+            {'title': f'Recipe {i}', 'time_minutes': 10, 'price': '5.00',
+             'tags': tags, 'ingredients': [ingredient]}
+            for i in range(count)
+        ]
+        client = APIClient()
+        client.force_authenticate(user)
+
+        start = time.perf_counter()
+        for item in payload:
+            res = client.post(
+                reverse('recipe:recipe-list'), item, format='json'
+            )
+        single = time.perf_counter() - start
+        if res.status_code != 201:
+            raise CommandError(f"single request failed: {res.status_code}")
+
+        start = time.perf_counter()
+        res = client.post(
+            reverse('recipe:recipe-bulk'), payload, format='json'
+        )
+        bulk = time.perf_counter() - start
+        if res.status_code != 200:
+            raise CommandError(f"bulk request failed: {res.status_code}")
+
+        return single, bulk
@@ -0,0 +1,86 @@
+import random
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.benchmark import format_summary, summarize, timed
+from core.db import connection_stats, count_closed_connections
+from core.seed import seed_recipes, seed_users
+
+
+class Command(BaseCommand):
+    """ Django command to compare per-request and persistent connections """
+
+    help = (
+        "Time GET recipes/ with a new database connection per request "
+        "(CONN_MAX_AGE=0) and with persistent connections, and report "
+        "latency and connection counters of each. Requests go through "
+        "the WSGI handler, so connections are opened and closed exactly "
+        "as in a worker. The benchmark user is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=50)
+        parser.add_argument('--max-age', type=int, default=600)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and \
+                connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError("An in-memory database cannot be reopened")
+
+        # committed rather than rolled back: an open transaction would
+        # pin the connection, which is what is being measured
+        with transaction.atomic():
+            user = seed_users(1, 'benchmark-connections')[0]
+            seed_recipes(random.Random(0), user, options['recipes'], 10, 10)
+        try:
+            # a timeout of 0 stores nothing, so every list is built from
+            # the database
+            with override_settings(
+                ALLOWED_HOSTS=['testserver'], RESPONSE_CACHE_TIMEOUT=0
+            ):
+                for max_age in (0, options['max_age']):
+                    self._run(user, max_age, options['requests'])
+        finally:
+            user.delete()
+
+    def _run(self, user, max_age, count):
+        """ time count list requests with CONN_MAX_AGE set to max_age """
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        # the test client stops Django from closing connections between
+        # requests, so requests are passed to the WSGI handler directly
+        handler = WSGIHandler()
+        token, _ = Token.objects.get_or_create(user = user)
+        environ = RequestFactory()._base_environ(
+            PATH_INFO = reverse('recipe:recipe-list'),
+            HTTP_AUTHORIZATION = f'Token {token.key}',
+        )
+        connection.close()
+        count_closed_connections()
+        connection_stats.reset()
+
+        samples = []
+        for _ in range(count):
+            elapsed, status = timed(self._request, handler, dict(environ))
+            if status != 200:
+                raise CommandError(f"request failed: {status}")
+            samples.append(elapsed)
+
+        label = f"CONN_MAX_AGE={max_age}"
+        self.stdout.write(format_summary(label, summarize(samples)))
+        self.stdout.write(f"  connections: {connection_stats.snapshot()}")
+
+    def _request(self, handler, environ):
+        """ run one request through handler and return its status code """
+        response = handler(environ, lambda status, headers: None)
+        # closing the response sends request_finished like a WSGI server
+        response.close()
+        return response.status_code
@@ -0,0 +1,106 @@
+import itertools
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import format_summary, summarize, timed
+from core.models import Recipe
+
+from recipe.search import SearchIndex, search_recipes, uses_database_search
+
+
+class Vocabulary:
+    """ synthetic words drawn with Zipf-distributed frequencies """
+
+    def __init__(self, rng, size, exponent=1.1):
+        self.rng = rng
+        self.words = [f'w{i}' for i in range(size)]
+        self.cum_weights = list(itertools.accumulate(
+            1 / (rank ** exponent) for rank in range(1, size + 1)
+        ))
+
+    def sample(self, count):
+        """ return text of count random words """
+        return ' '.join(self.rng.choices(
+            self.words, cum_weights=self.cum_weights, k=count
+        ))
+
+
+class Command(BaseCommand):
+    """ Django command to measure recipe search latency """
+
+    help = (
+        "Time ranked recipe search. Without --user a synthetic in-memory "
+        "index of --recipes documents over a Zipf-distributed vocabulary "
+        "is searched; with --user the database search of that user's "
+        "recipes is timed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--user', help="email of user to search")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = Vocabulary(rng, options['vocabulary'])
+        queries = [
+            vocabulary.sample(rng.randint(1, 2))
+            for _ in range(options['queries'])
+        ]
+
+        if options['user']:
+            search = self._database_search(options)
+        else:
+            search = self._memory_search(vocabulary, options)
+
+        samples = []
+        for query in queries:
+            elapsed, _ = timed(search, query)
+            samples.append(elapsed)
+
+        self.stdout.write(self.style.SUCCESS(
+            format_summary('search', summarize(samples))
+        ))
+
+    def _memory_search(self, vocabulary, options):
+        """ build synthetic index and return query function """
+        documents = (
+            (recipe_id, {
+                'title': vocabulary.sample(3),
+                'tags': vocabulary.sample(2),
+                'ingredients': vocabulary.sample(5),
+                'link': '',
+            })
+            for recipe_id in range(options['recipes'])
+        )
+        start = time.perf_counter()
+        index = SearchIndex(0, documents)
+        self.stdout.write(
+            f"indexed {index.size} recipes, {len(index.postings)} tokens "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+        return lambda query: index.search(query, options['limit'])
+
+    def _database_search(self, options):
+        """ return query function running the real search for user """
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        self.stdout.write(
+            "database full-text search" if uses_database_search()
+            else "in-memory fallback index"
+        )
+        queryset = Recipe.objects.filter(user=user)
+
+        return lambda query: list(search_recipes(
+            queryset, user.pk, query, options['limit']
+        ).values_list('id', flat=True))
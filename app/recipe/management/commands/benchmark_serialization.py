@@ -0,0 +1,113 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmark import timed
+from core.models import Tag, Ingredient, Recipe
+from core.seed import seed_recipes, seed_users
+
+from recipe.rows import row_builder
+from recipe.serializers import IngredientSerializer, RecipeSerializer, \
+                               TagSerializer
+from recipe.views import RecipeViewSet
+
+
+class Rollback(Exception):
+    """ raised to discard benchmark data """
+
+
+class Command(BaseCommand):
+    """ Django command to compare serializer and row builder list costs """
+
+    help = (
+        "Seed one user with the largest of --sizes recipes, tags and "
+        "ingredients, then time building the list representation of the "
+        "first N of each with the serializer (model instances, prefetched "
+        "relations) and with the row builder (value rows), reporting the "
+        "cost per row. Every output is checked to render byte identical. "
+        "All data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000]
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = max(options['sizes'])
+        try:
+            with transaction.atomic():
+                user = seed_users(1, 'benchmark-serialization')[0]
+                seed_recipes(random.Random(0), user, rows, rows, rows)
+                self._report(user, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _report(self, user, options):
+        lists = (
+            ('recipes', Recipe, RecipeSerializer,
+             RecipeViewSet.related_fields['list']),
+            ('tags', Tag, TagSerializer, None),
+            ('ingredients', Ingredient, IngredientSerializer, None),
+        )
+        for label, model, serializer_class, related_fields in lists:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            for size in options['sizes']:
+                queryset = model.objects.filter(user = user).order_by('-id')
+                slow = self._best(options['repeat'], self._serialize,
+                                  queryset, size, serializer_class,
+                                  related_fields)
+                fast = self._best(options['repeat'], self._build,
+                                  queryset, size, serializer_class)
+                self._check_identical(slow[1], fast[1])
+                self.stdout.write(
+                    f"{size:>7} rows: serializer "
+                    f"{slow[0] / size * 1e6:.2f}us/row, row builder "
+                    f"{fast[0] / size * 1e6:.2f}us/row "
+                    f"({slow[0] / fast[0]:.1f}x)"
+                )
+
+    def _best(self, repeat, func, *args):
+        """ return fastest (seconds, result) of repeat calls """
+        return min(
+            (timed(func, *args) for _ in range(repeat)),
+            key=lambda run: run[0]
+        )
+
+    def _serialize(self, queryset, size, serializer_class, related_fields):
+        """ list representation the way the regular list action builds it """
+        if related_fields:
+            queryset = queryset.only(*RecipeViewSet.list_fields)
+        instances = list(queryset[:size])
+        if related_fields:
+            lookups = [
+                Prefetch(relation, queryset = related_model.objects.only(
+                    *related_fields
+                ).order_by('id'))
+                for relation, related_model in (
+                    ('tags', Tag), ('ingredients', Ingredient)
+                )
+            ]
+            # prefetched in batches, as one IN list of 100k ids is over
+            # SQLite's variable limit
+            for start in range(0, len(instances), 10000):
+                prefetch_related_objects(
+                    instances[start:start + 10000], *lookups
+                )
+        return serializer_class(instances, many=True).data
+
+    def _build(self, queryset, size, serializer_class):
+        """ list representation built from value rows """
+        builder = row_builder(serializer_class)
+        return builder.build(list(builder.values(queryset)[:size]))
+
+    def _check_identical(self, slow, fast):
+        renderer = JSONRenderer()
+        if renderer.render(slow) != renderer.render(fast):
+            raise CommandError("Row builder output differs from serializer")
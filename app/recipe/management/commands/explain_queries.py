@@ -0,0 +1,107 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.benchmark import format_summary, summarize, timed
+from core.models import Tag, Ingredient, Recipe
+from core.seed import seed_recipes, seed_users
+
+
+class Rollback(Exception):
+    """ raised to discard benchmark data """
+
+
+class Command(BaseCommand):
+    """ Django command to report plans and timings of the hot queries """
+
+    help = (
+        "Seed --users users with --recipes recipes each, then print the "
+        "EXPLAIN plan and latency of the queries behind the tag, "
+        "ingredient and recipe list endpoints for one of them. All data "
+        "is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--ingredients', type=int, default=300)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help="run EXPLAIN ANALYZE where the database supports it"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = self._seed(random.Random(options['seed']), options)
+                with connection.cursor() as cursor:
+                    # give the planner statistics of the seeded tables
+                    cursor.execute('ANALYZE')
+                for label, queryset in self._queries(user):
+                    self._report(label, queryset, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _queries(self, user):
+        """ return (label, queryset) of the list endpoints' queries """
+        some_tag = Tag.objects.filter(user = user).order_by('id').first()
+        last_tag = Tag.objects.filter(user = user).order_by('name').last()
+
+        yield 'tags', Tag.objects.filter(
+            user = user
+        ).with_usage_count().order_by('-name', '-id')
+        yield 'tags next page', Tag.objects.filter(
+            user = user, name__lt = last_tag.name
+        ).order_by('-name', '-id')[:100]
+        yield 'tags assigned_only', Tag.objects.assigned().filter(
+            user = user
+        ).with_usage_count().order_by('-name', '-id')
+        yield 'ingredients', Ingredient.objects.filter(
+            user = user
+        ).with_usage_count().order_by('-name', '-id')
+        yield 'recipes by id', Recipe.objects.filter(
+            user = user
+        ).order_by('-id')[:100]
+        yield 'recipes by price', Recipe.objects.filter(
+            user = user
+        ).order_by('price', 'id')[:100]
+        yield 'recipes of tag', Recipe.tags.through.objects.filter(
+            tag = some_tag
+        ).values_list('recipe_id', flat=True)
+        yield 'recipe tags of user', Recipe.tags.through.objects.filter(
+            recipe__user = user
+        ).values_list('recipe_id', 'tag_id')
+
+    def _report(self, label, queryset, options):
+        """ print plan and latency summary of queryset """
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(queryset.explain(**explain_options))
+
+        samples = []
+        for _ in range(options['repeat']):
+            elapsed, _ = timed(list, queryset.all())
+            samples.append(elapsed)
+        self.stdout.write(format_summary(label, summarize(samples)))
+
+    def _seed(self, rng, options):
+        """ insert the synthetic dataset and return the user to query """
+        users = seed_users(options['users'], 'explain')
+        for user in users:
+            seed_recipes(
+                rng, user, options['recipes'], options['tags'],
+                options['ingredients']
+            )
+        self.stdout.write(
+            f"seeded {len(users)} users x {options['recipes']} recipes"
+        )
+
+        return users[len(users) // 2]
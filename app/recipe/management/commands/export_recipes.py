@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.export import FORMATS, export_recipes
+
+
+class Command(BaseCommand):
+    """ Django command to stream a user's recipes to a file """
+
+    help = (
+        "Write all recipes of --user, with tag and ingredient names, as "
+        "NDJSON or CSV to --output, or to stdout when it is '-'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="email of user")
+        parser.add_argument(
+            '--format', dest='export_format', choices=sorted(FORMATS),
+            default='ndjson'
+        )
+        parser.add_argument('--output', default='-')
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        _, chunks = export_recipes(
+            user, options['export_format'], options['chunk_size']
+        )
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported recipes to {options['output']}"
+        ))
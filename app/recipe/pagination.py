@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def after_position(ordering, position):
+    """ build lexicographic `keys > position` filter for the ordering
+
+    For keys (a, b) ordered descending this yields
+    `a < pa OR (a = pa AND b < pb)`.
+    """
+    conditions = []
+    for i, key in enumerate(ordering):
+        field = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        equal = {
+            prev.lstrip('-'): value
+            for prev, value in zip(ordering[:i], position)
+        }
+        equal[f'{field}__{lookup}'] = position[i]
+        conditions.append(Q(**equal))
+
+    return reduce(or_, conditions)
+
+
+class KeysetPagination(BasePagination):
+    """ cursor pagination over a composite key such as (name, id)
+
+    Each page is fetched with a `WHERE key < last_key` condition instead
+    of an OFFSET, so deep pages cost the same as the first one. Pagination
+    is opt-in: it only applies when the client sends `cursor` or
+    `page_size`, otherwise the full list is returned as before.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def get_page_size(self, request):
+        """ return requested page size capped to the configured maximum """
+        page_size = settings.PAGINATION_PAGE_SIZE
+        if self.page_size_query_param in request.query_params:
+            try:
+                page_size = int(
+                    request.query_params[self.page_size_query_param]
+                )
+            except ValueError:
+                pass
+
+        return max(1, min(page_size, settings.PAGINATION_MAX_PAGE_SIZE))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """ return one page of the queryset ordered by the view keys """
+        params = request.query_params
+        if self.cursor_query_param not in params and \
+                self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.ordering = tuple(view.get_ordering_keys())
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        encoded = params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(
+                after_position(
+                    self.ordering, self.decode_cursor(encoded, queryset.model)
+                )
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        """ wrap page data with the link to the next page """
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        """ return absolute url of the next page or None on last page """
+        if not self.has_next:
+            return None
+
+        last = self.page[-1]
+        position = [
+            self._key_value(last, key.lstrip('-')) for key in self.ordering
+        ]
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(
+            url, self.page_size_query_param, self.page_size
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(position)
+        )
+
+    def encode_cursor(self, position):
+        """ return opaque token for ordering keys and the last position """
+        payload = json.dumps(
+            {'o': self.ordering, 'p': position},
+            separators=(',', ':')
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, encoded, model):
+        """ return position stored in token as values of model's ordering
+        fields, rejecting foreign or tampered tokens """
+        try:
+            payload = json.loads(
+                base64.urlsafe_b64decode(encoded.encode()).decode()
+            )
+            ordering, position = tuple(payload['o']), payload['p']
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if ordering != self.ordering or not isinstance(position, list) or \
+                len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            return [
+                model._meta.get_field(key.lstrip('-')).to_python(value)
+                for key, value in zip(ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _key_value(self, instance, field):
+        """ return json safe value of an ordering key of an instance or a
+        values() row """
+        if isinstance(instance, dict):
+            value = instance[field]
+        else:
+            value = getattr(instance, field)
+        if isinstance(value, (int, str)) or value is None:
+            return value
+
+        return str(value)
@@ -0,0 +1,230 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from django.http import StreamingHttpResponse
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from core.metrics import timer
+from core.renderers import json_array_chunks, streams_json_arrays
+
+from recipe.pagination import after_position
+
+
+# model fields whose values already are what these serializer fields
+# return, so the builder copies them without a conversion call
+IDENTITY_FIELDS = {
+    serializers.IntegerField: (
+        'AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+        'SmallIntegerField', 'PositiveIntegerField',
+        'PositiveSmallIntegerField',
+    ),
+    serializers.CharField: ('CharField', 'TextField'),
+}
+
+# serializer fields whose to_representation takes the raw column value;
+# file fields, for example, expect the model's FieldFile instead
+CONVERTED_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField,
+    serializers.DateField, serializers.DateTimeField,
+    serializers.DecimalField, serializers.FloatField,
+    serializers.IntegerField, serializers.TimeField,
+)
+
+
+def _none_safe(convert):
+    return lambda value: None if value is None else convert(value)
+
+
+class RowBuilder:
+    """ builds the list representation of a serializer from value rows
+
+    Compiled once per serializer class from its fields: plain columns are
+    read with values(), many related primary keys with one query on the
+    through table per relation, and each row becomes a dict with the same
+    keys, order and values the serializer would return.
+    """
+
+    def __init__(self, model, columns, relations, build):
+        self.model = model
+        self.columns = columns
+        self.relations = relations
+        self._build = build
+
+    def values(self, queryset, extra_columns=()):
+        """ return queryset of dicts with the columns the builder reads """
+        columns = list(dict.fromkeys(self.columns + tuple(extra_columns)))
+        return queryset.prefetch_related(None).values(*columns)
+
+    def build(self, rows):
+        """ return representation of value rows, fetching related ids """
+        with timer('serialize'):
+            pk_name = self.model._meta.pk.attname
+            ids = [row[pk_name] for row in rows]
+            related = [
+                self._related_ids(relation, ids)
+                for _, relation in self.relations
+            ]
+            return self._build(rows, related)
+
+    def _related_ids(self, relation, ids):
+        """ return {pk: [related pks in pk order]} of a many relation """
+        descriptor = getattr(self.model, relation)
+        through = descriptor.through
+        source = f'{descriptor.field.m2m_field_name()}_id'
+        target = f'{descriptor.field.m2m_reverse_field_name()}_id'
+        batch_size = connection.features.max_query_params or len(ids) or 1
+
+        related = {}
+        for start in range(0, len(ids), batch_size):
+            links = through.objects.filter(**{
+                f'{source}__in': ids[start:start + batch_size]
+            }).order_by(target).values_list(source, target)
+            for pk, related_pk in links:
+                related.setdefault(pk, []).append(related_pk)
+
+        return related
+
+
+def _column(model, field):
+    """ return (column, converter) of a plain field, None if unsupported """
+    source = field.source
+    if not isinstance(field, CONVERTED_FIELDS) or source == '*' or \
+            '.' in source:
+        return None
+    try:
+        model_field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete or model_field.is_relation:
+        return None
+
+    if model_field.get_internal_type() in \
+            IDENTITY_FIELDS.get(type(field), ()):
+        return model_field.attname, None
+    convert = field.to_representation
+    if model_field.null:
+        convert = _none_safe(convert)
+
+    return model_field.attname, convert
+
+
+def _relation(model, field):
+    """ return model relation of a many primary key field, None if not """
+    if not isinstance(field, serializers.ManyRelatedField):
+        return None
+    child = field.child_relation
+    if not isinstance(child, serializers.PrimaryKeyRelatedField) or \
+            child.pk_field is not None or '.' in field.source:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return None
+
+    return field.source if model_field.many_to_many else None
+
+
+@lru_cache(maxsize=None)
+def row_builder(serializer_class):
+    """ return RowBuilder of a model serializer, None if a field of it is
+    not one the builder reproduces exactly """
+    serializer = serializer_class()
+    model = serializer.Meta.model
+    columns = [model._meta.pk.attname]
+    converters = {}
+    relations = []
+    items = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        relation = _relation(model, field)
+        if relation is not None:
+            items.append(f'{name!r}: related[{len(relations)}]'
+                         f'.get(row[{model._meta.pk.attname!r}], [])')
+            relations.append((name, relation))
+            continue
+        column = _column(model, field)
+        if column is None:
+            return None
+        attname, convert = column
+        columns.append(attname)
+        if convert is None:
+            items.append(f'{name!r}: row[{attname!r}]')
+        else:
+            convert_name = f'convert_{len(converters)}'
+            converters[convert_name] = convert
+            items.append(f'{name!r}: {convert_name}(row[{attname!r}])')
+
+    # one dict display per row is much cheaper than running each field
+    source = (
+        'def build(rows, related):\n'
+        f'    return [{{{", ".join(items)}}} for row in rows]\n'
+    )
+    namespace = dict(converters)
+    exec(compile(source, f'<row builder {serializer_class.__name__}>',
+                 'exec'), namespace)
+
+    return RowBuilder(
+        model, tuple(dict.fromkeys(columns)), tuple(relations),
+        namespace['build']
+    )
+
+
+class FastListMixin:
+    """ build list responses from value rows instead of model instances
+
+    Opt-in for viewsets whose serializer row_builder supports; the
+    output is identical to the serializer's. Other serializers, and
+    every action except list, use the regular path. Unpaginated lists of
+    more than STREAM_LIST_MIN_ROWS rows are streamed as a JSON array.
+    """
+
+    def list(self, request, *args, **kwargs):
+        builder = row_builder(self.get_serializer_class())
+        if builder is None:
+            return super().list(request, *args, **kwargs)
+
+        ordering = tuple(getattr(self, 'get_ordering_keys', tuple)())
+        queryset = builder.values(
+            self.filter_queryset(self.get_queryset()),
+            [key.lstrip('-') for key in ordering]
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(builder.build(page))
+
+        if not ordering or queryset.query.is_sliced or \
+                not streams_json_arrays(
+                    request.accepted_renderer, request.accepted_media_type
+                ):
+            return Response(builder.build(list(queryset)))
+
+        threshold = settings.STREAM_LIST_MIN_ROWS
+        rows = list(queryset[:threshold + 1])
+        if len(rows) <= threshold:
+            return Response(builder.build(rows))
+
+        renderer = request.accepted_renderer
+        return StreamingHttpResponse(
+            json_array_chunks(
+                renderer, self._row_chunks(builder, queryset, ordering, rows)
+            ),
+            content_type = renderer.media_type
+        )
+
+    def _row_chunks(self, builder, queryset, ordering, rows):
+        """ yield built rows, then the rest of queryset in keyset chunks
+
+        Each chunk is its own query continuing after the last row, so no
+        cursor stays open between chunks.
+        """
+        while rows:
+            yield builder.build(rows)
+            position = [rows[-1][key.lstrip('-')] for key in ordering]
+            rows = list(queryset.filter(
+                after_position(ordering, position)
+            )[:settings.STREAM_LIST_CHUNK_SIZE])
@@ -0,0 +1,214 @@
+import heapq
+import math
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models import Case, F, IntegerField, When
+
+from core.models import Recipe
+
+from recipe.facets import IndexRegistry
+
+
+# text search configuration used both for the stored vectors (see
+# core/migrations/0005) and the queries; `simple` does not stem, which
+# keeps PostgreSQL results in line with the Python fallback index
+SEARCH_CONFIG = 'simple'
+
+# relative weight of a match per field, mirroring the A/B/C weights
+# of the PostgreSQL vector
+FIELD_WEIGHTS = {'title': 1.0, 'tags': 0.4, 'ingredients': 0.4, 'link': 0.2}
+
+TOKEN_RE = re.compile(r'\w+')
+
+UPDATE_VECTORS_SQL = """
+    UPDATE core_recipe r SET search_vector =
+        setweight(to_tsvector(%(config)s, r.title), 'A') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(t.name, ' ') FROM core_tag t
+            JOIN core_recipe_tags rt ON rt.tag_id = t.id
+            WHERE rt.recipe_id = r.id), '')), 'B') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(i.name, ' ') FROM core_ingredient i
+            JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id
+            WHERE ri.recipe_id = r.id), '')), 'B') ||
+        setweight(to_tsvector(%(config)s, r.link), 'C')
+    WHERE r.id = ANY(%(ids)s)
+"""
+
+
+def tokenize(text):
+    """ return lowercase word tokens of text """
+    return TOKEN_RE.findall(text.lower())
+
+
+def uses_database_search():
+    """ return whether the database maintains search vectors """
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids):
+    """ recompute stored search vectors of recipes in one statement """
+    if not recipe_ids or not uses_database_search():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPDATE_VECTORS_SQL,
+            {'config': SEARCH_CONFIG, 'ids': list(recipe_ids)}
+        )
+
+
+class SearchIndex:
+    """ in-memory inverted index of one user's recipes
+
+    Maps each token to {recipe id: field weight} postings. Queries match
+    recipes containing every token and rank them by weighted tf-idf.
+    """
+
+    def __init__(self, version, documents):
+        self.version = version
+        self.postings = {}
+        self._ranked = {}
+        self.size = 0
+        for recipe_id, fields in documents:
+            self.add(recipe_id, fields)
+        for token in self.postings:
+            self._ranked_postings(token)
+
+    @classmethod
+    def build(cls, user_id, version):
+        """ load index of user's recipes and their tag/ingredient names
+        from the primary, as the index is kept for the version it was built
+        at """
+        recipes = Recipe.objects.using(DEFAULT_DB_ALIAS).filter(
+            user_id = user_id
+        )
+        fields = {}
+        for recipe_id, title, link in recipes.values_list(
+                'id', 'title', 'link'):
+            fields[recipe_id] = {
+                'title': title, 'link': link, 'tags': [], 'ingredients': []
+            }
+        for relation in ('tags', 'ingredients'):
+            through = getattr(Recipe, relation).through
+            name = f'{relation[:-1]}__name'
+            links = through.objects.using(DEFAULT_DB_ALIAS).filter(
+                recipe__user_id = user_id
+            )
+            for recipe_id, related_name in links.values_list(
+                    'recipe_id', name):
+                fields[recipe_id][relation].append(related_name)
+
+        documents = (
+            (recipe_id, {
+                'title': doc['title'],
+                'link': doc['link'],
+                'tags': ' '.join(doc['tags']),
+                'ingredients': ' '.join(doc['ingredients']),
+            })
+            for recipe_id, doc in fields.items()
+        )
+
+        return cls(version, documents)
+
+    def add(self, recipe_id, fields):
+        """ index document given as {field name: text} """
+        self.size += 1
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                postings = self.postings.setdefault(token, {})
+                postings[recipe_id] = postings.get(recipe_id, 0) + weight
+                self._ranked.pop(token, None)
+
+    def _ranked_postings(self, token):
+        """ return postings of token as (weight, id) best first """
+        ranked = self._ranked.get(token)
+        if ranked is None:
+            ranked = sorted(
+                ((weight, recipe_id)
+                 for recipe_id, weight in self.postings[token].items()),
+                reverse=True
+            )
+            self._ranked[token] = ranked
+
+        return ranked
+
+    def search(self, query, limit):
+        """ return up to limit (recipe id, score) best matches
+
+        Uses the threshold algorithm: postings are walked best weight
+        first in lockstep, and the walk stops as soon as no unseen recipe
+        can beat the current top `limit`, so common tokens do not force a
+        scan of every matching recipe. Every match has all tokens, so the
+        walk never goes deeper than the shortest postings list.
+        """
+        tokens = set(tokenize(query))
+        if limit < 1 or not tokens or \
+                any(token not in self.postings for token in tokens):
+            return []
+
+        terms = [
+            (math.log(1 + self.size / len(self.postings[token])),
+             self.postings[token],
+             self._ranked_postings(token))
+            for token in tokens
+        ]
+
+        top, seen = [], set()
+        for depth in range(min(len(ranked) for _, _, ranked in terms)):
+            threshold = 0.0
+            for idf, _, ranked in terms:
+                weight, recipe_id = ranked[depth]
+                threshold += idf * weight
+                if recipe_id in seen:
+                    continue
+                seen.add(recipe_id)
+
+                score = 0.0
+                for other_idf, postings, _ in terms:
+                    other_weight = postings.get(recipe_id)
+                    if other_weight is None:
+                        break
+                    score += other_idf * other_weight
+                else:
+                    if len(top) < limit:
+                        heapq.heappush(top, (score, recipe_id))
+                    elif (score, recipe_id) > top[0]:
+                        heapq.heapreplace(top, (score, recipe_id))
+
+            if len(top) == limit and top[0][0] >= threshold:
+                break
+
+        return [
+            (recipe_id, score)
+            for score, recipe_id in sorted(top, reverse=True)
+        ]
+
+
+search_indexes = IndexRegistry(SearchIndex, settings.SEARCH_INDEX_MAX_USERS)
+
+
+def search_recipes(queryset, user_id, query, limit):
+    """ filter queryset to best matches of query, ordered by relevance """
+    if uses_database_search():
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-id')[:limit]
+
+    ranked = search_indexes.get(user_id).search(query, limit)
+    if not ranked:
+        return queryset.none()
+
+    ordering = Case(
+        *[When(id=recipe_id, then=pos)
+          for pos, (recipe_id, _) in enumerate(ranked)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(
+        id__in=[recipe_id for recipe_id, _ in ranked]
+    ).order_by(ordering)
@@ -1,35 +1,113 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
+from core.metrics import TimedRepresentationMixin
 from core.models import Tag, Ingredient, Recipe
 
+from recipe.thumbnails import ready_thumbnails
+
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedRepresentationMixin,
+                    serializers.ModelSerializer):
     """ Serializer for tag objects"""
 
+    usage_count = serializers.IntegerField(
+        source = 'recipe_count', read_only = True
+    )
+
     class Meta:
         model = Tag
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'usage_count')
         read_only_fields = ("id",)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     """ serializer for ingredient objects"""
 
+    usage_count = serializers.IntegerField(
+        source = 'recipe_count', read_only = True
+    )
+
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'usage_count')
         read_only_fields = ("id", )
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """ primary key field accepting only objects of the requesting user """
+
+    def get_queryset(self):
+        """ return queryset limited to the user of the request """
+        request = self.context.get('request')
+        if request is None:
+            return super().get_queryset().none()
+        return super().get_queryset().filter(user = request.user)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserManyRelatedField(**list_kwargs)
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """ list of primary keys validated together in one query
+
+    The stock field looks up each id with its own query; every missing
+    id is reported here at once instead of only the first.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks, errors = [], []
+        for item in data:
+            if child.pk_field is not None:
+                item = child.pk_field.to_internal_value(item)
+            try:
+                if isinstance(item, bool):
+                    raise DjangoValidationError('')
+                pks.append(pk_field.to_python(item))
+            except DjangoValidationError:
+                errors.append(child.error_messages['incorrect_type'].format(
+                    data_type=type(item).__name__
+                ))
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        objects = queryset.only(pk_field.name).in_bulk(set(pks))
+        missing = list(dict.fromkeys(pk for pk in pks if pk not in objects))
+        if missing:
+            raise serializers.ValidationError([
+                child.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing
+            ])
+
+        return [objects[pk] for pk in pks]
+
+
+class RecipeSerializer(TimedRepresentationMixin,
+                       serializers.ModelSerializer):
     """ serializer for recipe objects """
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many = True,
         queryset = Ingredient.objects.all()
     )
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many = True,
         queryset = Tag.objects.all()
     )
@@ -50,10 +128,49 @@ class RecipeDetailSerializer(RecipeSerializer):
     ingredients = IngredientSerializer(many = True, read_only = True)
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedRepresentationMixin,
+                            serializers.ModelSerializer):
     """ serializer for uploading images to recipes"""
 
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'image', 'thumbnails')
+        read_only_fields = ('id',)
+
+    def get_thumbnails(self, obj):
+        """ return urls of thumbnails generated so far by size """
+        urls = ready_thumbnails(obj.image)
+        request = self.context.get('request')
+        if request is not None:
+            urls = {
+                size: request.build_absolute_uri(url)
+                for size, url in urls.items()
+            }
+        return urls
+
+
+class BulkRecipeSerializer(serializers.ModelSerializer):
+    """ serializer validating one item of a bulk recipe write
+
+    Tag and ingredient ids are only checked for shape here; the view
+    checks all items' ids against the user's rows in a single query.
+    """
+
+    id = serializers.IntegerField(required = False)
+    tags = serializers.ListField(
+        child = serializers.IntegerField(),
+        required = False
+    )
+    ingredients = serializers.ListField(
+        child = serializers.IntegerField(),
+        required = False
+    )
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
\ No newline at end of file
+        fields = (
+            'id', 'title', 'tags', 'ingredients',
+            'price', 'link', 'time_minutes'
+        )
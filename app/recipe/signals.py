@@ -0,0 +1,162 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                     pre_delete
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.cache import bump_data_version
+from recipe.facets import FacetIndex, facet_indexes
+from recipe.search import search_indexes, update_search_vectors, \
+                          uses_database_search
+
+
+RELATION_MODELS = {Tag: 'tags', Ingredient: 'ingredients'}
+
+
+def _bump(user_id, change=None):
+    """ bump user data version, applying change to facet index on commit """
+    on_commit = None
+    if change is not None:
+        on_commit = partial(facet_indexes.update, user_id, change=change)
+
+    bump_data_version(user_id, on_commit=on_commit)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def bump_version_on_attr_saved(sender, instance, **kwargs):
+    """ invalidate cached responses of owner of changed object """
+    _bump(instance.user_id)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_version_on_attr_deleted(sender, instance, **kwargs):
+    """ invalidate cached responses and drop deleted id from facets """
+    relation, related_id = RELATION_MODELS[sender], instance.pk
+    _bump(
+        instance.user_id,
+        lambda index: index.remove_related(relation, related_id)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def bump_version_on_recipe_saved(sender, instance, created, **kwargs):
+    """ invalidate cached responses and index new recipe """
+    change = None
+    if created:
+        change = partial(FacetIndex.add_recipe, recipe_id=instance.pk)
+    _bump(instance.user_id, change)
+
+
+@receiver(post_delete, sender=Recipe)
+def bump_version_on_recipe_deleted(sender, instance, **kwargs):
+    """ invalidate cached responses and clear recipe from facets """
+    recipe_id = instance.pk
+    _bump(instance.user_id, lambda index: index.remove_recipe(recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_version_on_relation_change(sender, instance, action, reverse,
+                                    pk_set, **kwargs):
+    """ invalidate cached responses and update facet bitsets """
+    if not action.startswith('post_'):
+        return
+
+    if sender is Recipe.tags.through:
+        relation = 'tags'
+    else:
+        relation = 'ingredients'
+
+    def change(index):
+        if action == 'post_clear':
+            if reverse:
+                index.unlink_all(relation, related_id=instance.pk)
+            else:
+                index.unlink_all(relation, recipe_id=instance.pk)
+        elif reverse:
+            index.link(
+                relation, pk_set, [instance.pk], action == 'post_add'
+            )
+        else:
+            index.link(
+                relation, [instance.pk], pk_set, action == 'post_add'
+            )
+
+    _bump(instance.user_id, change)
+
+
+@receiver(post_save, sender=get_user_model())
+def bump_version_on_user_created(sender, instance, created, **kwargs):
+    """ start new users on fresh caches in case their id was reused """
+    if created:
+        facet_indexes.discard(instance.pk)
+        search_indexes.discard(instance.pk)
+        bump_data_version(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def update_vector_on_recipe_saved(sender, instance, **kwargs):
+    """ keep stored search vector in line with title and link """
+    update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_vectors_on_attr_saved(sender, instance, created, **kwargs):
+    """ reindex recipes linked to renamed tag or ingredient """
+    if created or not uses_database_search():
+        return
+    relation = RELATION_MODELS[sender]
+    update_search_vectors(
+        Recipe.objects.filter(**{relation: instance}).values_list(
+            'id', flat=True
+        )
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_vectors_on_attr_deleted(sender, instance, **kwargs):
+    """ remember recipes linked to tag or ingredient being deleted """
+    if uses_database_search():
+        relation = RELATION_MODELS[sender]
+        instance._search_recipe_ids = list(
+            Recipe.objects.filter(**{relation: instance}).values_list(
+                'id', flat=True
+            )
+        )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_vectors_on_attr_deleted(sender, instance, **kwargs):
+    """ drop deleted tag or ingredient name from recipe vectors """
+    update_search_vectors(getattr(instance, '_search_recipe_ids', ()))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_vectors_on_relation_change(sender, instance, action, reverse,
+                                      pk_set, **kwargs):
+    """ reindex recipes whose tags or ingredients changed """
+    if not uses_database_search():
+        return
+
+    if not reverse:
+        if action.startswith('post_'):
+            update_search_vectors([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        update_search_vectors(getattr(instance, '_search_recipe_ids', ()))
+    elif action.startswith('post_'):
+        update_search_vectors(pk_set)
@@ -0,0 +1,131 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.bulk import can_return_bulk_ids
+from core.models import Tag, Ingredient, Recipe
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def recipe_payload(**params):
+    """ return payload of a valid recipe """
+    payload = {'title': 'Recipe', 'time_minutes': 5, 'price': '4.50'}
+    payload.update(params)
+    return payload
+
+
+class BulkRecipeApiTests(TestCase):
+    """ test the bulk recipe endpoint """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user = self.user, name = 'Tag1')
+        self.ingredient = Ingredient.objects.create(
+            user = self.user, name = 'Ingredient1'
+        )
+
+    def test_bulk_create_with_relations(self):
+        """ test creating many recipes with tags and ingredients"""
+        payload = [
+            recipe_payload(
+                title = f'Recipe{i}',
+                tags = [self.tag.id],
+                ingredients = [self.ingredient.id]
+            )
+            for i in range(50)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.filter(user = self.user).count(), 50)
+        recipe = Recipe.objects.get(id = res.data['results'][7]['id'])
+        self.assertEqual(recipe.title, 'Recipe7')
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_update(self):
+        """ test updating fields and replacing tags of recipes"""
+        recipe = Recipe.objects.create(
+            user = self.user, title = 'Old', time_minutes = 5, price = 5
+        )
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+        tag2 = Tag.objects.create(user = self.user, name = 'Tag2')
+
+        res = self.client.post(BULK_URL, [
+            {'id': recipe.id, 'title': 'New', 'price': '7.25',
+             'tags': [tag2.id]},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'New')
+        self.assertEqual(recipe.price, Decimal('7.25'))
+        self.assertEqual(recipe.time_minutes, 5)
+        self.assertEqual(list(recipe.tags.all()), [tag2])
+        self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+        self.tag.refresh_from_db()
+        tag2.refresh_from_db()
+        self.assertEqual((self.tag.recipe_count, tag2.recipe_count), (0, 1))
+
+    def test_invalid_items_reported_without_aborting(self):
+        """ test that invalid items are skipped and reported by index"""
+        other = get_user_model().objects.create_user('o@test.com', 'Pass123')
+        other_tag = Tag.objects.create(user = other, name = 'Other')
+        other_recipe = Recipe.objects.create(
+            user = other, title = 'Other', time_minutes = 5, price = 5
+        )
+
+        res = self.client.post(BULK_URL, [
+            recipe_payload(title = 'Good'),
+            recipe_payload(time_minutes = 'soon'),
+            recipe_payload(tags = [self.tag.id, other_tag.id]),
+            {'id': other_recipe.id, 'title': 'Stolen'},
+            'not a recipe',
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        results = res.data['results']
+        self.assertIn('id', results[0])
+        self.assertIn('time_minutes', results[1]['errors'])
+        self.assertEqual(len(results[2]['errors']['tags']), 1)
+        self.assertIn('id', results[3]['errors'])
+        self.assertIn('errors', results[4])
+        self.assertEqual(Recipe.objects.filter(user = self.user).count(), 1)
+        other_recipe.refresh_from_db()
+        self.assertEqual(other_recipe.title, 'Other')
+
+    @skipUnless(can_return_bulk_ids(), "needs keys from bulk INSERT")
+    def test_bulk_write_query_count_constant(self):
+        """ test that query count does not grow with number of recipes"""
+        def count_queries(count):
+            payload = [
+                recipe_payload(tags = [self.tag.id]) for _ in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(BULK_URL, payload, format='json')
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(200))
+
+    def test_rejects_non_list(self):
+        """ test that payload must be a list"""
+        res = self.client.post(BULK_URL, recipe_payload(), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
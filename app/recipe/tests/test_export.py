@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.export import iter_recipes
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportTests(TestCase):
+    """ test streaming recipe exports """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        vegan = Tag.objects.create(user = self.user, name = 'Vegan')
+        dinner = Tag.objects.create(user = self.user, name = 'Dinner')
+        salt = Ingredient.objects.create(user = self.user, name = 'Salt')
+        self.recipes = []
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user = self.user, title = f'Recipe {i}',
+                time_minutes = 5, price = '4.50'
+            )
+            self.recipes.append(recipe)
+        self.recipes[0].tags.add(vegan, dinner)
+        self.recipes[0].ingredients.add(salt)
+        self.recipes[3].tags.add(vegan)
+        other = get_user_model().objects.create_user('o@test.com', 'Pass123')
+        Recipe.objects.create(
+            user = other, title = 'Other', time_minutes = 5, price = 5
+        ).tags.add(Tag.objects.create(user = other, name = 'Other'))
+
+    def test_iter_recipes_merges_relations_across_chunks(self):
+        """ test that names land on their recipe with tiny chunks"""
+        exported = list(iter_recipes(self.user, chunk_size = 1))
+
+        self.assertEqual(
+            [recipe['id'] for recipe in exported],
+            [recipe.id for recipe in self.recipes]
+        )
+        self.assertEqual(exported[0]['tags'], ['Dinner', 'Vegan'])
+        self.assertEqual(exported[0]['ingredients'], ['Salt'])
+        self.assertEqual(exported[3]['tags'], ['Vegan'])
+        self.assertEqual(exported[4]['tags'], [])
+        self.assertEqual(exported[1]['price'], '4.50')
+
+    def test_export_ndjson(self):
+        """ test streaming recipes as newline delimited JSON"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['title'], 'Recipe 0')
+
+    def test_export_csv(self):
+        """ test streaming recipes as CSV with joined names"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(
+            b''.join(res.streaming_content).decode()
+        )))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['tags'], 'Dinner|Vegan')
+
+    def test_export_unknown_format(self):
+        """ test that unknown formats are rejected"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_command(self):
+        """ test exporting through the management command"""
+        out = StringIO()
+
+        call_command('export_recipes', user = 'test@test.com', stdout = out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
@@ -0,0 +1,205 @@
+from unittest.mock import patch
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.facets import FacetIndex, IndexRegistry, facet_indexes
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+FACETS_URL = reverse('recipe:recipe-facets')
+
+
+def sample_recipe(user, title, tags=(), ingredients=()):
+    """ create recipe linked to given tags and ingredients """
+    recipe = Recipe.objects.create(
+        user = user, title = title, time_minutes = 5, price = 5
+    )
+    recipe.tags.add(*tags)
+    recipe.ingredients.add(*ingredients)
+
+    return recipe
+
+
+class FacetFilterApiTests(TestCase):
+    """ test AND/OR/NOT filtering and facet counts """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.vegan = Tag.objects.create(user = self.user, name = 'vegan')
+        self.quick = Tag.objects.create(user = self.user, name = 'quick')
+        self.salt = Ingredient.objects.create(user = self.user, name = 'salt')
+
+        self.r1 = sample_recipe(self.user, 'r1', [self.vegan, self.quick])
+        self.r2 = sample_recipe(self.user, 'r2', [self.vegan], [self.salt])
+        self.r3 = sample_recipe(self.user, 'r3', [self.quick], [self.salt])
+        self.r4 = sample_recipe(self.user, 'r4')
+
+    def _titles(self, params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return sorted(recipe['title'] for recipe in res.data)
+
+    def test_any_tags_without_duplicates(self):
+        """ test OR filter returns each matching recipe once"""
+        titles = self._titles({'tags': f'{self.vegan.id},{self.quick.id}'})
+
+        self.assertEqual(titles, ['r1', 'r2', 'r3'])
+
+    def test_all_tags(self):
+        """ test AND filter returns recipes having every tag"""
+        titles = self._titles({
+            'tags_all': f'{self.vegan.id},{self.quick.id}'
+        })
+
+        self.assertEqual(titles, ['r1'])
+
+    def test_exclude_combined_with_other_facet(self):
+        """ test NOT filter combined with an ingredient filter"""
+        titles = self._titles({
+            'ingredients': f'{self.salt.id}',
+            'tags_exclude': f'{self.vegan.id}',
+        })
+
+        self.assertEqual(titles, ['r3'])
+
+    def test_facet_counts(self):
+        """ test counts of recipes left by each additional facet"""
+        res = self.client.get(FACETS_URL, {'tags': f'{self.vegan.id}'})
+
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(
+            res.data['tags'], {self.vegan.id: 2, self.quick.id: 1}
+        )
+        self.assertEqual(res.data['ingredients'], {self.salt.id: 1})
+
+    def test_unknown_id_matches_nothing(self):
+        """ test filtering by id of another user returns no recipes"""
+        self.assertEqual(self._titles({'tags_all': '999999'}), [])
+
+    def test_empty_items_ignored(self):
+        """ test empty items of an id list are skipped"""
+        titles = self._titles({'tags_all': f',{self.vegan.id},,'})
+
+        self.assertEqual(titles, ['r1', 'r2'])
+
+    def test_invalid_ids_rejected(self):
+        """ test ids that are not integers are a bad request"""
+        for params in ({'tags_exclude': 'x'}, {'ingredients': '1,2.5'}):
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            res = self.client.get(FACETS_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_many_matches_filtered_in_subqueries(self):
+        """ test filters matching more than FACET_MAX_ID_LIST recipes give
+        the same results without listing their ids"""
+        for params in (
+                {'tags': f'{self.vegan.id},{self.quick.id}'},
+                {'tags_all': f'{self.vegan.id},{self.quick.id}'},
+                {'ingredients': f'{self.salt.id}',
+                 'tags_exclude': f'{self.vegan.id}'},
+                {'tags_all': '999999'}):
+            expected = self._titles(params)
+            with override_settings(FACET_MAX_ID_LIST = 0):
+                self.assertEqual(self._titles(params), expected)
+
+
+class FacetIndexTests(TestCase):
+    """ test the bitset index itself """
+
+    def test_link_unlink_and_remove(self):
+        """ test incremental changes to the index"""
+        index = FacetIndex(1, [10, 20, 30], {
+            'tags': [(10, 1), (20, 1)],
+            'ingredients': [],
+        })
+
+        index.link('tags', [30], [1, 2], True)
+        index.link('tags', [10], [1], False)
+        index.remove_recipe(20)
+        index.add_recipe(40)
+        index.link('tags', [40], [2], True)
+
+        self.assertEqual(index.ids(index.match({'tags': [1]})), [30])
+        self.assertEqual(index.ids(index.match({'tags_all': [2]})), [30, 40])
+        self.assertEqual(
+            index.ids(index.match({'tags_exclude': [2]})), [10]
+        )
+
+    def test_links_of_unknown_recipes_skipped(self):
+        """ test links of recipes created after the recipe ids were read"""
+        index = FacetIndex(1, [10], {
+            'tags': [(10, 1), (20, 1)],
+            'ingredients': [(20, 2)],
+        })
+
+        self.assertEqual(index.ids(index.match({'tags': [1]})), [10])
+        self.assertEqual(index.ids(index.match({'ingredients': [2]})), [])
+
+    def test_update_replaces_index(self):
+        """ test updates leave the index readers already hold unchanged"""
+        registry = IndexRegistry(FacetIndex, 10)
+        with patch.object(FacetIndex, 'build', return_value = FacetIndex(
+                1, [10], {'tags': [], 'ingredients': []})), \
+                patch('recipe.facets.committed_version', return_value = 1):
+            index = registry.get(1)
+
+        registry.update(
+            1, 2, lambda index: index.link('tags', [10], [5], True)
+        )
+
+        with patch('recipe.facets.committed_version', return_value = 2):
+            updated = registry.get(1)
+        self.assertEqual(index.match({'tags': [5]}), 0)
+        self.assertEqual(updated.ids(updated.match({'tags': [5]})), [10])
+        self.assertEqual((index.version, updated.version), (1, 2))
+
+
+class FacetIndexMaintenanceTests(TransactionTestCase):
+    """ test that committed writes update the in-process index """
+
+    def setUp(self):
+        facet_indexes.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.tag = Tag.objects.create(user = self.user, name = 'vegan')
+        self.recipe = sample_recipe(self.user, 'r1')
+
+    def test_m2m_change_applied_without_rebuild(self):
+        """ test that linking after index build updates it in place"""
+        index = facet_indexes.get(self.user.pk)
+
+        self.recipe.tags.add(self.tag)
+        other = sample_recipe(self.user, 'r2', [self.tag])
+
+        with patch.object(FacetIndex, 'build') as build:
+            current = facet_indexes.get(self.user.pk)
+            build.assert_not_called()
+
+        self.assertIsNot(current, index)
+        self.assertEqual(
+            current.ids(current.match({'tags_all': [self.tag.id]})),
+            [self.recipe.id, other.id]
+        )
+
+        self.recipe.tags.clear()
+        self.tag.delete()
+        current = facet_indexes.get(self.user.pk)
+        self.assertEqual(
+            current.ids(current.match({'tags': [self.tag.id]})), []
+        )
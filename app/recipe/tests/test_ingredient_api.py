@@ -106,8 +106,12 @@ class PrivateIngredientsApiTests(TestCase):
 
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
+        # serialized with the counts stored by the link signals
+        ingredient1.refresh_from_db()
+        ingredient2.refresh_from_db()
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
+        self.assertEqual(serializer1.data['usage_count'], 1)
         self.assertIn(serializer1.data, res.data)
         self.assertNotIn(serializer2.data, res.data)
 
@@ -0,0 +1,141 @@
+import base64
+import json
+from decimal import Decimal
+from urllib.parse import urlparse, parse_qs
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Recipe
+
+
+TAGS_URL = reverse("recipe:tag-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def collect_pages(client, url, params):
+    """ follow next links and return all results and page count """
+    results, pages = [], 0
+    res = client.get(url, params)
+    while True:
+        pages += 1
+        results.extend(res.data['results'])
+        if not res.data['next']:
+            return results, pages
+        res = client.get(res.data['next'])
+
+
+class KeysetPaginationTests(TestCase):
+    """ test cursor pagination of list endpoints """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_unpaginated_without_params(self):
+        """ test that list stays a plain list without pagination params"""
+        Tag.objects.create(user = self.user, name="Tag1")
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.data, list)
+
+    def test_tags_pages_cover_all_rows_with_duplicate_names(self):
+        """ test that pages ordered by (name, id) skip and repeat nothing"""
+        names = ['b', 'a', 'b', 'c', 'a', 'b', 'd']
+        for name in names:
+            Tag.objects.create(user = self.user, name = name)
+
+        results, pages = collect_pages(self.client, TAGS_URL, {'page_size': 2})
+
+        expected = Tag.objects.order_by('-name', '-id')
+        self.assertEqual(pages, 4)
+        self.assertEqual(
+            [tag['id'] for tag in results],
+            [tag.id for tag in expected]
+        )
+
+    def test_recipes_paginated_by_price(self):
+        """ test paginating recipes ordered by (price, id)"""
+        for price in ['5.00', '1.50', '5.00', '3.20', '1.50']:
+            Recipe.objects.create(
+                user = self.user,
+                title = "Recipe",
+                time_minutes = 5,
+                price = Decimal(price)
+            )
+
+        results, pages = collect_pages(
+            self.client, RECIPES_URL, {'page_size': 2, 'ordering': 'price'}
+        )
+
+        expected = Recipe.objects.order_by('price', 'id')
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            [recipe['id'] for recipe in results],
+            [recipe.id for recipe in expected]
+        )
+
+    @override_settings(PAGINATION_MAX_PAGE_SIZE = 3)
+    def test_page_size_capped(self):
+        """ test that requested page size is capped to the maximum"""
+        for i in range(5):
+            Tag.objects.create(user = self.user, name = f"Tag{i}")
+
+        res = self.client.get(TAGS_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_invalid_cursor(self):
+        """ test that tampered cursor is rejected"""
+        res = self.client.get(TAGS_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_wrong_value_types_rejected(self):
+        """ test that cursor of valid shape but bad positions is rejected """
+        for ordering, url, position in (
+                (['-id'], RECIPES_URL, ['abc']),
+                (['-id'], RECIPES_URL, [{'x': 1}]),
+                (['-id'], RECIPES_URL, [[1]]),
+                (['-name', '-id'], TAGS_URL, ['Vegan', 'abc']),
+                (['price', 'id'], RECIPES_URL, ['cheap', 1])):
+            cursor = base64.urlsafe_b64encode(json.dumps(
+                {'o': ordering, 'p': position}
+            ).encode()).decode()
+            params = {'cursor': cursor}
+            if ordering[0] == 'price':
+                params['ordering'] = 'price'
+            res = self.client.get(url, params)
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_from_other_ordering_rejected(self):
+        """ test that cursor cannot be reused with another ordering"""
+        for price in ['1.00', '2.00', '3.00']:
+            Recipe.objects.create(
+                user = self.user,
+                title = "Recipe",
+                time_minutes = 5,
+                price = Decimal(price)
+            )
+        res = self.client.get(RECIPES_URL, {'page_size': 1})
+        cursor = parse_qs(urlparse(res.data['next']).query)['cursor'][0]
+        res = self.client.get(RECIPES_URL, {'cursor': cursor})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(
+            RECIPES_URL, {'cursor': cursor, 'ordering': 'price'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,9 +1,13 @@
 import os
+import shutil
 import tempfile
+from unittest.mock import patch
 
 from PIL import Image
 
-from django.test import TestCase
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
@@ -13,6 +17,8 @@ from rest_framework import status
 from core.models import Recipe, Tag, Ingredient
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe import thumbnails
+from recipe.thumbnails import generate_thumbnails, thumbnail_name
 
 RECIPES_URL = reverse('recipe:recipe-list')
 
@@ -167,6 +173,78 @@ class PrivateRecipesApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_with_other_users_tag(self):
+        """ test tags of other users are rejected like missing ones """
+        user2 = get_user_model().objects.create_user(
+            'other@test.com', 'Pass123'
+        )
+        tag = sample_tag(user = user2)
+
+        payload = {
+            'title': 'recipe 1',
+            'tags': [tag.id],
+            'time_minutes': 3,
+            'price': 3.39
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['tags'],
+            [f'Invalid pk "{tag.id}" - object does not exist.']
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_reports_every_missing_id(self):
+        """ test all missing and malformed ids are reported at once """
+        ingredient = sample_ingredient(user = self.user)
+
+        payload = {
+            'title': 'recipe 1',
+            'ingredients': [ingredient.id, 9998, 9999, 9998],
+            'tags': ['x'],
+            'time_minutes': 3,
+            'price': 3.39
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['ingredients'], [
+            'Invalid pk "9998" - object does not exist.',
+            'Invalid pk "9999" - object does not exist.',
+        ])
+        self.assertEqual(
+            res.data['tags'],
+            ['Incorrect type. Expected pk value, received str.']
+        )
+
+    def test_create_recipe_validates_ids_in_one_query(self):
+        """ test ingredient ids are checked with a single query """
+        ingredients = [
+            sample_ingredient(user = self.user, name=f"Ingredient{i}")
+            for i in range(40)
+        ]
+
+        payload = {
+            'title': 'recipe 1',
+            'ingredients': [ingredient.id for ingredient in ingredients],
+            'tags': [],
+            'time_minutes': 3,
+            'price': 3.39
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['ingredients']), 40)
+        # the other ingredient queries read the links of the new recipe
+        lookups = [
+            query for query in queries.captured_queries
+            if 'FROM "core_ingredient"' in query['sql'] and
+            'core_recipe_ingredients' not in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
     def test_partial_update_recipe(self):
         """ test partial update recipe """
         recipe = sample_recipe(user = self.user)
@@ -248,7 +326,42 @@ class PrivateRecipesApiTests(TestCase):
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
 
+    def _create_recipes_with_relations(self, count):
+        """ create recipes that each have a tag and an ingredient """
+        for i in range(count):
+            recipe = sample_recipe(user = self.user, title=f"Recipe{i}")
+            recipe.tags.add(sample_tag(user = self.user, name=f"Tag{i}"))
+            recipe.ingredients.add(
+                sample_ingredient(user = self.user, name=f"Ingredient{i}")
+            )
+
+    def test_list_recipes_query_count_constant(self):
+        """ test listing recipes runs same queries for any recipe count """
+        self._create_recipes_with_relations(2)
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data), 2)
+
+        self._create_recipes_with_relations(20)
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data), 22)
+
+    def test_retrieve_recipe_query_count(self):
+        """ test recipe detail prefetches nested tags and ingredients """
+        recipe = sample_recipe(user = self.user)
+        recipe.tags.add(sample_tag(user = self.user, name="Tag1"))
+        recipe.tags.add(sample_tag(user = self.user, name="Tag2"))
+        recipe.ingredients.add(sample_ingredient(user = self.user))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertEqual(len(res.data['ingredients']), 1)
 
+
+@override_settings(THUMBNAIL_WORKERS = 0, THUMBNAIL_SIZES = (4, 8))
 class RecipeUploadImageTests(TestCase):
 
     def setUp(self):
@@ -261,6 +374,11 @@ class RecipeUploadImageTests(TestCase):
         self.recipe = sample_recipe(user = self.user)
 
     def tearDown(self):
+        if self.recipe.image:
+            for size in (4, 8):
+                self.recipe.image.storage.delete(
+                    thumbnail_name(self.recipe.image.name, size)
+                )
         self.recipe.image.delete()
 
     def test_upload_image_to_recipe(self):
@@ -284,3 +402,60 @@ class RecipeUploadImageTests(TestCase):
         res = self.client.post(url, {'image': 'noimage'}, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_image_generates_thumbnails(self):
+        """ test that thumbnails are generated and exposed by size"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+            Image.new("RGB", (20, 10)).save(ntf, format='PNG')
+            ntf.seek(0)
+            self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        res = self.client.get(url)
+
+        self.assertEqual(set(res.data['thumbnails']), {'4', '8'})
+        thumb_path = thumbnail_name(self.recipe.image.path, 8)
+        with Image.open(thumb_path) as thumb:
+            self.assertEqual(thumb.size, (8, 4))
+
+
+class ThumbnailWorkerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'image.png')
+        Image.new("RGB", (20, 10)).save(self.path, format='PNG')
+
+    def test_thumbnails_in_spawned_worker(self):
+        """ test that workers are spawned and leave no temporary files"""
+        self.addCleanup(setattr, thumbnails, '_executor', None)
+        with override_settings(THUMBNAIL_WORKERS = 1):
+            executor = thumbnails._get_executor()
+        self.addCleanup(executor.shutdown)
+
+        executor.submit(generate_thumbnails, self.path, (4, 8)).result(60)
+
+        self.assertEqual(executor._mp_context.get_start_method(), 'spawn')
+        self.assertEqual(sorted(os.listdir(self.directory)), [
+            'image.png', 'image_4px.png', 'image_8px.png'
+        ])
+
+    def test_concurrent_generation(self):
+        """ test that generating the same thumbnails twice at once does not
+        share a temporary file"""
+        names = []
+        save = Image.Image.save
+
+        def record(image, fp, *args, **kwargs):
+            names.append(fp.name)
+            return save(image, fp, *args, **kwargs)
+
+        with patch.object(Image.Image, 'save', record):
+            generate_thumbnails(self.path, (8,))
+            generate_thumbnails(self.path, (8,))
+
+        self.assertEqual(len(set(names)), 2)
+        with Image.open(thumbnail_name(self.path, 8)) as thumb:
+            self.assertEqual(thumb.size, (8, 4))
@@ -0,0 +1,147 @@
+from urllib.parse import urlparse
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.checks import check_shared_caches
+from core.models import Tag, Recipe
+
+
+TAGS_URL = reverse("recipe:tag-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class ResponseCacheTests(TestCase):
+    """ test versioned list response cache """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_not_modified_without_queries(self):
+        """ test that matching If-None-Match returns 304 with no queries"""
+        Tag.objects.create(user = self.user, name="Tag1")
+        res = self.client.get(TAGS_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_none_match_list(self):
+        """ test that If-None-Match is parsed as a list of etags """
+        res = self.client.get(TAGS_URL)
+        etag = res['ETag']
+
+        for header, code in (
+                (f'"other", {etag}', status.HTTP_304_NOT_MODIFIED),
+                (f'W/{etag}', status.HTTP_304_NOT_MODIFIED),
+                ('*', status.HTTP_304_NOT_MODIFIED),
+                (f'"{etag}"', status.HTTP_200_OK),
+                (f'"x{etag[1:]}', status.HTTP_200_OK)):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(res.status_code, code, header)
+
+    @override_settings(ALLOWED_HOSTS = ['a.example', 'b.example'])
+    def test_cache_scoped_to_host(self):
+        """ test that cached pages keep the next links of their host """
+        for name in ('Tag1', 'Tag2'):
+            Tag.objects.create(user = self.user, name = name)
+
+        for host in ('a.example', 'b.example'):
+            res = self.client.get(
+                TAGS_URL, {'page_size': 1}, HTTP_HOST = host
+            )
+            self.assertEqual(urlparse(res.data['next']).hostname, host)
+
+    def test_cached_response_served_without_queries(self):
+        """ test that repeated list is served from cache"""
+        Tag.objects.create(user = self.user, name="Tag1")
+        first = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(TAGS_URL)
+
+        self.assertEqual(first.data, second.data)
+
+    def test_write_invalidates_cache(self):
+        """ test that creating tag changes etag and content"""
+        res = self.client.get(TAGS_URL)
+        etag = res['ETag']
+
+        self.client.post(TAGS_URL, {'name': 'Tag1'})
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.data), 1)
+
+    def test_relation_change_invalidates_cache(self):
+        """ test that adding tag to recipe invalidates recipe list"""
+        tag = Tag.objects.create(user = self.user, name="Tag1")
+        recipe = Recipe.objects.create(
+            user = self.user, title="Recipe1", time_minutes=5, price=5
+        )
+        self.client.get(RECIPES_URL)
+
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+
+    def test_normalized_filter_params_share_etag(self):
+        """ test that reordered ids map to the same cache entry"""
+        res1 = self.client.get(RECIPES_URL, {'tags': '2,1'})
+        res2 = self.client.get(RECIPES_URL, {'tags': '1,2,2'})
+
+        self.assertEqual(res1['ETag'], res2['ETag'])
+
+    def test_cache_scoped_to_user(self):
+        """ test that users never share cached responses"""
+        user2 = get_user_model().objects.create_user(
+            'test2@test.com',
+            'Pass123'
+        )
+        Tag.objects.create(user = user2, name="Other")
+        res = self.client.get(TAGS_URL)
+
+        self.client.force_authenticate(user2)
+        res2 = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res2.data), 1)
+
+
+class SharedCacheCheckTests(TestCase):
+    """ test the system check on process local shared caches """
+
+    LOCMEM = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }}
+
+    @override_settings(REQUIRE_SHARED_CACHE = True, CACHES = LOCMEM)
+    def test_local_cache_fails_check(self):
+        errors = check_shared_caches(None)
+
+        self.assertEqual({error.id for error in errors}, {'core.E001'})
+        self.assertEqual(len(errors), 3)
+
+    @override_settings(REQUIRE_SHARED_CACHE = True, CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': 'localhost:11211',
+    }})
+    def test_shared_cache_passes_check(self):
+        self.assertEqual(check_shared_caches(None), [])
+
+    @override_settings(REQUIRE_SHARED_CACHE = False, CACHES = LOCMEM)
+    def test_check_off_in_debug(self):
+        self.assertEqual(check_shared_caches(None), [])
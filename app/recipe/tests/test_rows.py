@@ -0,0 +1,136 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.rows import row_builder
+from recipe.serializers import RecipeSerializer, TagSerializer
+
+
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT = 0)
+class FastListTests(TestCase):
+    """ test list responses built from rows match the serializers """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        tags = [
+            Tag.objects.create(user = self.user, name = f'Tag {i}')
+            for i in range(5)
+        ]
+        ingredients = [
+            Ingredient.objects.create(user = self.user, name = f'Ingr {i}')
+            for i in range(5)
+        ]
+        prices = ['4.50', '0.05', '12.00', '999.99', '7.10', '3']
+        for i, price in enumerate(prices):
+            recipe = Recipe.objects.create(
+                user = self.user, title = f'Recipe "{i}" ü', time_minutes = i,
+                price = Decimal(price), link = f'http://x/{i}' if i else ''
+            )
+            # added out of id order, listed by id
+            recipe.tags.add(*reversed(tags[i % 3:]))
+            recipe.ingredients.add(*ingredients[:i])
+
+    def assertSameBytes(self, url, params=None):
+        """ assert url renders the same with and without row builders """
+        fast = self.client.get(url, params)
+        with patch('recipe.rows.row_builder', return_value=None):
+            slow = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_tags_identical(self):
+        """ test tag lists, ordered and paginated, are byte identical """
+        self.assertSameBytes(TAGS_URL)
+        self.assertSameBytes(TAGS_URL, {'ordering': 'usage_count'})
+        self.assertSameBytes(TAGS_URL, {'page_size': 2, 'assigned_only': 1})
+
+    def test_ingredients_identical(self):
+        """ test ingredient lists are byte identical """
+        self.assertSameBytes(INGREDIENTS_URL)
+
+    def test_recipes_identical(self):
+        """ test recipe lists, filtered and paginated, are byte identical """
+        self.assertSameBytes(RECIPES_URL)
+        self.assertSameBytes(RECIPES_URL, {'ordering': 'price'})
+        self.assertSameBytes(
+            RECIPES_URL, {'ordering': 'price', 'page_size': 4}
+        )
+        self.assertSameBytes(RECIPES_URL, {'q': 'recipe'})
+
+    def test_large_lists_streamed(self):
+        """ test lists over the threshold stream the same JSON array """
+        params = {'ordering': 'price'}
+        whole = self.client.get(RECIPES_URL, params)
+        with self.settings(STREAM_LIST_MIN_ROWS = 2,
+                           STREAM_LIST_CHUNK_SIZE = 2):
+            streamed = self.client.get(RECIPES_URL, params)
+            small = self.client.get(INGREDIENTS_URL, {'min_usage_count': 4})
+
+        self.assertFalse(whole.streaming)
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        self.assertEqual(b''.join(streamed.streaming_content), whole.content)
+        self.assertFalse(small.streaming)
+
+    def test_next_page_from_rows(self):
+        """ test cursors of row pages continue where the page ended """
+        res = self.client.get(
+            RECIPES_URL, {'ordering': 'price', 'page_size': 4}
+        )
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [recipe['price'] for recipe in res.data['results']],
+            ['12.00', '999.99']
+        )
+
+
+class RowBuilderTests(TestCase):
+
+    def test_builders_of_list_serializers(self):
+        """ test the list serializers are compiled """
+        self.assertIsNotNone(row_builder(TagSerializer))
+        self.assertEqual(
+            row_builder(RecipeSerializer).relations,
+            (('tags', 'tags'), ('ingredients', 'ingredients'))
+        )
+
+    def test_unsupported_fields_fall_back(self):
+        """ test serializers with fields a row cannot reproduce get none """
+        class TitleSerializer(serializers.ModelSerializer):
+            shout = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Recipe
+                fields = ('id', 'shout')
+
+            def get_shout(self, obj):
+                return obj.title.upper()
+
+        class ImageSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = Recipe
+                fields = ('id', 'image')
+
+        self.assertIsNone(row_builder(TitleSerializer))
+        self.assertIsNone(row_builder(ImageSerializer))
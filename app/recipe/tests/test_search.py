@@ -0,0 +1,93 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.search import SearchIndex
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeSearchApiTests(TestCase):
+    """ test ranked recipe search """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _recipe(self, title, link='', tags=(), ingredients=()):
+        recipe = Recipe.objects.create(
+            user = self.user, title = title, link = link,
+            time_minutes = 5, price = 5
+        )
+        for name in tags:
+            recipe.tags.add(Tag.objects.create(user = self.user, name = name))
+        for name in ingredients:
+            recipe.ingredients.add(
+                Ingredient.objects.create(user = self.user, name = name)
+            )
+        return recipe
+
+    def _search(self, query):
+        res = self.client.get(RECIPES_URL, {'q': query})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_title_match_ranked_above_ingredient_match(self):
+        """ test that title matches rank before ingredient matches"""
+        self._recipe('Lemon Cake')
+        self._recipe('Fish Tacos', ingredients=['Lemon'])
+        self._recipe('Beef Stew')
+
+        self.assertEqual(self._search('lemon'), ['Lemon Cake', 'Fish Tacos'])
+
+    def test_all_terms_required(self):
+        """ test that every query term must match"""
+        self._recipe('Garlic Bread', tags=['quick'])
+        self._recipe('Garlic Soup')
+
+        self.assertEqual(self._search('garlic quick'), ['Garlic Bread'])
+
+    def test_search_link_and_limited_to_user(self):
+        """ test matching link and not returning other users recipes"""
+        self._recipe('Pie', link='https://example.com/grandma')
+        other = get_user_model().objects.create_user('o@test.com', 'Pass123')
+        Recipe.objects.create(
+            user = other, title = 'grandma', time_minutes = 5, price = 5
+        )
+
+        self.assertEqual(self._search('Grandma'), ['Pie'])
+
+    def test_no_match(self):
+        """ test that unknown term returns an empty list"""
+        self._recipe('Pie')
+
+        self.assertEqual(self._search('lasagna'), [])
+
+
+class SearchIndexTests(TestCase):
+    """ test in-memory search index """
+
+    def test_rare_term_outranks_common_term(self):
+        """ test that idf favors documents matching rarer tokens"""
+        index = SearchIndex(0, [
+            (1, {'title': 'rice bowl'}),
+            (2, {'title': 'rice saffron'}),
+            (3, {'title': 'rice'}),
+        ])
+
+        ranked = index.search('rice saffron', 10)
+
+        self.assertEqual([recipe_id for recipe_id, _ in ranked], [2])
+        self.assertEqual(
+            [recipe_id for recipe_id, _ in index.search('rice', 2)], [3, 2]
+        )
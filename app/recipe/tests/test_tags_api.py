@@ -103,8 +103,12 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
+        # serialized with the counts stored by the link signals
+        tag1.refresh_from_db()
+        tag2.refresh_from_db()
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
+        self.assertEqual(serializer1.data['usage_count'], 1)
         self.assertIn(serializer1.data, res.data)
         self.assertNotIn(serializer2.data, res.data)
 
@@ -130,3 +134,60 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
         self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['usage_count'], 2)
+
+    def test_tags_include_usage_count(self):
+        """ test that tags list how many recipes use them"""
+        used = Tag.objects.create(user = self.user, name="used")
+        Tag.objects.create(user = self.user, name="unused")
+        for title in ('Title1', 'Title2', 'Title3'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=30,
+                price=Decimal("5.39"),
+                user = self.user
+            )
+            recipe.tags.add(used)
+
+        res = self.client.get(TAGS_URL)
+
+        counts = {tag['name']: tag['usage_count'] for tag in res.data}
+        self.assertEqual(counts, {'used': 3, 'unused': 0})
+
+    def test_created_tag_has_zero_usage_count(self):
+        """ test that a new tag is returned with usage count"""
+        res = self.client.post(TAGS_URL, {'name': 'new tag'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['usage_count'], 0)
+
+    def test_order_and_filter_by_usage_count(self):
+        """ test sorting tags by usage and filtering by minimum usage"""
+        tags = [
+            Tag.objects.create(user = self.user, name = name)
+            for name in ('a', 'b', 'c')
+        ]
+        for count, tag in zip((1, 3, 0), tags):
+            for _ in range(count):
+                Recipe.objects.create(
+                    title="Title",
+                    time_minutes=30,
+                    price=Decimal("5.39"),
+                    user = self.user
+                ).tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {'ordering': 'usage_count'})
+        self.assertEqual([tag['name'] for tag in res.data], ['b', 'a', 'c'])
+
+        res = self.client.get(TAGS_URL, {'min_usage_count': 1})
+        self.assertEqual({tag['name'] for tag in res.data}, {'a', 'b'})
+
+    def test_invalid_count_params_rejected(self):
+        """ test that non integer or negative counts are a bad request"""
+        for params in ({'min_usage_count': 'abc'},
+                       {'min_usage_count': '-1'},
+                       {'assigned_only': 'yes'}):
+            res = self.client.get(TAGS_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
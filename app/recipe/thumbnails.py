@@ -0,0 +1,103 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def thumbnail_name(name, size):
+    """ return storage name of thumbnail of image name at size """
+    root, ext = os.path.splitext(name)
+    return f'{root}_{size}px{ext}'
+
+
+def generate_thumbnails(path, sizes):
+    """ write downscaled copies of image at path, largest size first
+
+    Runs in a worker process. Each thumbnail is written to a temporary
+    file of its own and renamed into place, so a thumbnail that exists is
+    complete even when two uploads of an image generate it at once.
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image_format = image.format
+        if image_format == 'JPEG':
+            # let the decoder downscale while reading large photos
+            image.draft('RGB', (max(sizes), max(sizes)))
+        image.load()
+        for size in sorted(sizes, reverse=True):
+            image.thumbnail((size, size), Image.LANCZOS)
+            target = thumbnail_name(path, size)
+            with tempfile.NamedTemporaryFile(
+                    dir=os.path.dirname(target), suffix='.tmp',
+                    delete=False) as tmp:
+                try:
+                    image.save(tmp, format=image_format)
+                except BaseException:
+                    os.unlink(tmp.name)
+                    raise
+            os.chmod(tmp.name, 0o644)
+            os.replace(tmp.name, target)
+
+    return path
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # workers are spawned rather than forked, as a fork of this
+            # multi-threaded process can copy a lock another thread holds
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _log_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Thumbnail generation failed: %s", exc)
+
+
+def schedule_thumbnails(path):
+    """ generate thumbnails of image at path off the request thread
+
+    With THUMBNAIL_WORKERS = 0 they are generated inline instead. Images
+    are content-addressed, so a re-uploaded image already has them.
+    """
+    sizes = settings.THUMBNAIL_SIZES
+    if all(os.path.exists(thumbnail_name(path, size)) for size in sizes):
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        generate_thumbnails(path, sizes)
+        return
+
+    future = _get_executor().submit(generate_thumbnails, path, sizes)
+    future.add_done_callback(_log_failure)
+
+
+def ready_thumbnails(image):
+    """ return {size: url} of thumbnails of image field already written """
+    if not image:
+        return {}
+
+    storage = image.storage
+    urls = {}
+    for size in settings.THUMBNAIL_SIZES:
+        name = thumbnail_name(image.name, size)
+        if storage.exists(name):
+            urls[str(size)] = storage.url(name)
+
+    return urls
@@ -1,33 +1,82 @@
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import IntegerField
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from core.async_views import AsyncReadMixin
 from core.models import Tag, Ingredient, Recipe
+from core.routers import ReplicaReadMixin
+from core.throttling import ThrottledViewMixin
+
+from users.authentication import CachedTokenAuthentication
 
 from recipe import serializers
+from recipe.bulk import bulk_write_recipes
+from recipe.cache import CachedListMixin
+from recipe.export import FORMATS, export_recipes
+from recipe.facets import FILTER_PARAMS, facet_indexes, filter_recipes, \
+                          parse_filters, popcount
+from recipe.pagination import KeysetPagination
+from recipe.rows import FastListMixin
+from recipe.search import search_recipes
+from recipe.thumbnails import schedule_thumbnails
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ThrottledViewMixin,
+                            ReplicaReadMixin,
+                            AsyncReadMixin,
+                            CachedListMixin,
+                            FastListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """ base reicpe attrubutes viewset """
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    orderings = {
+        'name': ('-name', '-id'),
+        'usage_count': ('-recipe_count', '-id'),
+    }
+    cache_query_params = (
+        'assigned_only', 'min_usage_count', 'ordering', 'cursor', 'page_size'
+    )
+
+    def get_ordering_keys(self):
+        """ return composite key selected by `ordering` query param """
+        ordering = self.request.query_params.get('ordering', 'name')
+        return self.orderings.get(ordering, self.orderings['name'])
+
+    def _count_param(self, name):
+        """ return non-negative integer query param, 0 when absent """
+        try:
+            return IntegerField(min_value = 0).run_validation(
+                self.request.query_params.get(name, 0)
+            )
+        except ValidationError as exc:
+            raise ValidationError({name: exc.detail})
 
     def get_queryset(self):
         """ return objects for current authenticated user"""
         queryset = self.queryset
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
+        assigned_only = bool(self._count_param('assigned_only'))
+        min_usage_count = self._count_param('min_usage_count')
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.assigned()
+        if min_usage_count:
+            queryset = queryset.filter(recipe_count__gte = min_usage_count)
 
-        return queryset.filter(user = self.request.user).order_by('-name').distinct()
+        return queryset.filter(
+            user = self.request.user
+        ).order_by(*self.get_ordering_keys())
 
     def perform_create(self, serializer):
         """create new object"""
@@ -47,33 +96,97 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ThrottledViewMixin, ReplicaReadMixin, AsyncReadMixin,
+                    CachedListMixin, FastListMixin, viewsets.ModelViewSet):
     """ manage recipes in the database """
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    pagination_class = KeysetPagination
+    orderings = {
+        'id': ('-id',),
+        'price': ('price', 'id'),
+    }
+    cache_query_params = FILTER_PARAMS + (
+        'q', 'ordering', 'cursor', 'page_size'
+    )
+
+    # columns and relations each read action actually serializes, so list
+    # and retrieve cost a fixed number of queries whatever the recipe count
+    list_fields = ('id', 'title', 'price', 'link', 'time_minutes')
+    related_fields = {
+        'list': ('id',),
+        'retrieve': ('id', 'name', 'recipe_count'),
+    }
+
+    def get_ordering_keys(self):
+        """ return composite key selected by `ordering` query param """
+        ordering = self.request.query_params.get('ordering', 'id')
+        return self.orderings.get(ordering, self.orderings['id'])
+
+    @property
+    def paginator(self):
+        """ ranked search results are capped instead of paginated """
+        if self.request.query_params.get('q'):
+            return None
+        return super().paginator
 
-    def _params_to_ints(self, qs):
-        """ convert list of string ids into list of intgers"""
-        return [int(str_id) for str_id in qs.split(',')]
+    def _facet_match(self):
+        """ return facet index and bitset of recipes matching filters """
+        filters = parse_filters(self.request.query_params)
+        index = facet_indexes.get(self.request.user.pk)
+
+        return index, index.match(filters)
 
     def get_queryset(self):
         """ retrive recipes for authenticated user only"""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-
         queryset = self.queryset
 
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+        filters = parse_filters(self.request.query_params)
+        if filters:
+            index = facet_indexes.get(self.request.user.pk)
+            matched = index.match(filters)
+            # ids are listed in the query only while few match, so page
+            # and count queries stay small whatever the catalog size
+            if popcount(matched) <= settings.FACET_MAX_ID_LIST:
+                queryset = queryset.filter(id__in=index.ids(matched))
+            else:
+                queryset = filter_recipes(queryset, filters)
+
+        queryset = queryset.filter(
+            user = self.request.user
+        ).order_by(*self.get_ordering_keys())
+
+        query = self.request.query_params.get('q')
+        if query and self.action == 'list':
+            queryset = search_recipes(
+                queryset,
+                self.request.user.pk,
+                query,
+                settings.SEARCH_MAX_RESULTS
+            )
+
+        return self._optimize_queryset(queryset)
 
-        return queryset.filter(user = self.request.user)
+    def _optimize_queryset(self, queryset):
+        """ prefetch the relations and columns needed by current action """
+        related_fields = self.related_fields.get(self.action)
+        if related_fields is None:
+            return queryset
+
+        return queryset.only(*self.list_fields).prefetch_related(
+            Prefetch(
+                'tags',
+                queryset = Tag.objects.only(*related_fields).order_by('id')
+            ),
+            Prefetch(
+                'ingredients',
+                queryset = Ingredient.objects.only(
+                    *related_fields
+                ).order_by('id')
+            ),
+        )
 
     def get_serializer_class(self):
         """ return appropriate serializer class """
@@ -89,10 +202,73 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """ create recipe object"""
         serializer.save(user = self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(methods=['GET'], detail=False)
+    def facets(self, request):
+        """ return count of filtered recipes linked to each tag and
+        ingredient, i.e. how many recipes adding that id would leave """
+        index, matched = self._facet_match()
+        counts = index.counts(matched)
+
+        return Response({
+            'count': popcount(matched),
+            'tags': counts['tags'],
+            'ingredients': counts['ingredients'],
+        })
+
+    @action(methods=['POST'], detail=False)
+    def bulk(self, request):
+        """ create or update many recipes, reporting errors per item """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'detail': 'Expected a list of recipes.'},
+                status = status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.BULK_MAX_ITEMS:
+            return Response(
+                {'detail': f'At most {settings.BULK_MAX_ITEMS} recipes '
+                           f'are accepted per request.'},
+                status = status.HTTP_400_BAD_REQUEST
+            )
+
+        results = bulk_write_recipes(self.request.user, items)
+        failed = sum(1 for result in results if 'errors' in result)
+        if not failed:
+            response_status = status.HTTP_200_OK
+        elif failed == len(results):
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+
+        return Response({'results': results}, status = response_status)
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """ stream all recipes of user as NDJSON or CSV """
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in FORMATS:
+            expected = ', '.join(FORMATS)
+            return Response(
+                {'export_format': [f'Expected one of {expected}.']},
+                status = status.HTTP_400_BAD_REQUEST
+            )
+
+        content_type, chunks = export_recipes(
+            request.user, export_format, settings.EXPORT_CHUNK_SIZE
+        )
+        response = StreamingHttpResponse(chunks, content_type = content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+        return response
+
+    @action(methods=['GET', 'POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """ upload image to recipe"""
+        """ upload image to recipe, or get image and ready thumbnails"""
         recipe = self.get_object()
+        if request.method == 'GET':
+            return Response(self.get_serializer(recipe).data)
+
         serializer = self.get_serializer(
             recipe,
             data = request.data
@@ -100,6 +276,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             serializer.save()
+            schedule_thumbnails(recipe.image.path)
             return Response(
                 serializer.data,
                 status = status.HTTP_200_OK
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        """ connect token cache invalidation signals """
+        from users import signals  # noqa: F401
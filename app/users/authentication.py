@@ -0,0 +1,196 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+
+from core.metrics import register_collector, timer
+
+
+USER_VERSION_KEY = 'auth:user-version:{}'
+
+
+def token_digest(key):
+    """ return digest used to key cache entries instead of raw token """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared_cache():
+    return caches[settings.TOKEN_CACHE_VERSION_ALIAS]
+
+
+def user_version(user_id):
+    """ return shared version of user's credentials, creating it if
+    missing """
+    key = USER_VERSION_KEY.format(user_id)
+    version = _shared_cache().get(key)
+    if version is None:
+        # start from the clock so a version lost on eviction never
+        # matches entries cached before it was lost
+        _shared_cache().add(key, int(time.time() * 1000), None)
+        version = _shared_cache().get(key)
+
+    return version
+
+
+def bump_user_version(user_id):
+    """ invalidate cached authentication of user in every process """
+    try:
+        _shared_cache().incr(USER_VERSION_KEY.format(user_id))
+    except ValueError:
+        # missing, so the next lookup starts a new version anyway
+        pass
+
+
+class TokenCache:
+    """ bounded in-process LRU of token digest -> (user, token, version)
+    with TTL """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._user_digests = {}
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        """ return cached (user, token, version) for digest or None """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(digest)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1], entry[2], entry[3]
+
+    def set(self, digest, user, token, version=None):
+        """ cache user and token as of user's credentials version, evicting
+        least recently used entries """
+        with self._lock:
+            self._remove(digest)
+            self._entries[digest] = (
+                time.monotonic() + self.ttl, user, token, version
+            )
+            self._user_digests.setdefault(user.pk, set()).add(digest)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_token(self, digest):
+        """ drop entry of a single token """
+        with self._lock:
+            self._remove(digest)
+
+    def invalidate_user(self, user_id):
+        """ drop entries of all tokens belonging to user """
+        with self._lock:
+            for digest in list(self._user_digests.get(user_id, ())):
+                self._remove(digest)
+
+    def clear(self):
+        """ drop all entries and reset counters """
+        with self._lock:
+            self._entries.clear()
+            self._user_digests.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """ return hit/miss counters and current size """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
+
+    def _remove(self, digest):
+        """ remove entry and its user index, caller holds the lock """
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+
+        user_id = entry[1].pk
+        digests = self._user_digests.get(user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._user_digests[user_id]
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL
+)
+
+
+def collect_token_cache():
+    """ token cache counters for the metrics endpoint """
+    stats = token_cache.stats()
+    return [
+        (f'app_token_cache_{name}_total', 'counter',
+         f'Token cache {name}.', {None: stats[name]})
+        for name in ('hits', 'misses', 'evictions')
+    ] + [
+        ('app_token_cache_size', 'gauge', 'Tokens cached.',
+         {None: stats['size']}),
+    ]
+
+
+register_collector(collect_token_cache)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ token authentication that skips the Token JOIN User lookup for
+    recently seen tokens
+
+    Entries are dropped by signals when the token is deleted or the user is
+    saved (deactivation, password change). The signals also bump the
+    user's version in the shared TOKEN_CACHE_VERSION_ALIAS cache, which
+    every hit is checked against, so other worker processes drop their
+    entries on the next request too. Changes made with queryset `update()`
+    bypass signals and are only picked up once the TTL expires.
+    """
+
+    def authenticate(self, request):
+        with timer('auth'):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        """ return (user, token) from cache or from the database """
+        digest = token_digest(key)
+        cached = token_cache.get(digest)
+        if cached is not None:
+            user, token, version = cached
+            if version == user_version(user.pk):
+                # each request gets its own instance so in-view changes to
+                # request.user never leak into the shared cache entry
+                return copy.copy(user), token
+            token_cache.invalidate_user(user.pk)
+
+        # the version is read before the user, so a change committed while
+        # the user is looked up leaves the entry under an outdated version
+        user_id = self.get_model().objects.filter(key = key).values_list(
+            'user_id', flat=True
+        ).first()
+        version = None if user_id is None else user_version(user_id)
+        user, token = super().authenticate_credentials(key)
+        if user.pk == user_id:
+            token_cache.set(digest, user, token, version)
+
+        return user, token
@@ -3,7 +3,11 @@ from django.utils.translation import ugettext as _
 
 from rest_framework import serializers
 
-class UserSerializer(serializers.ModelSerializer):
+from core.metrics import TimedRepresentationMixin
+
+
+class UserSerializer(TimedRepresentationMixin,
+                     serializers.ModelSerializer):
     """ Serializer for the users object """
 
     class Meta:
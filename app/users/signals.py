@@ -0,0 +1,32 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from users.authentication import bump_user_version, token_cache, \
+                                 token_digest
+
+
+def _bump_user_version(user_id):
+    """ bump now and again once the change is committed, so workers
+    reading the user before the commit do not cache it as current """
+    bump_user_version(user_id)
+    transaction.on_commit(partial(bump_user_version, user_id))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """ drop cached authentication of deleted token """
+    token_cache.invalidate_token(token_digest(instance.key))
+    _bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_saved_user(sender, instance, **kwargs):
+    """ drop cached tokens of user on deactivation or password change """
+    token_cache.invalidate_user(instance.pk)
+    _bump_user_version(instance.pk)
@@ -0,0 +1,150 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from users.authentication import TokenCache, bump_user_version, \
+                                 token_cache
+
+ME_URL = reverse("users:me")
+
+
+class TokenCacheTests(TestCase):
+    """ test the in-process token cache """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+
+    def test_lru_eviction(self):
+        """ test that least recently used entry is evicted when full"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', self.user, None)
+        cache.set('b', self.user, None)
+        cache.get('a')
+        cache.set('c', self.user, None)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    @patch("time.monotonic")
+    def test_expired_entry_is_miss(self, monotonic):
+        """ test that entries expire after the ttl"""
+        cache = TokenCache(max_size=2, ttl=60)
+        monotonic.return_value = 100
+        cache.set('a', self.user, None)
+
+        monotonic.return_value = 161
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """ test token authentication through the cache """
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'Pass123'
+        )
+        self.token = Token.objects.create(user = self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_lookup(self):
+        """ test that repeated requests hit the cache"""
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+        self.assertEqual(token_cache.stats()['misses'], 1)
+
+    def test_deleted_token_invalidated(self):
+        """ test that deleting token stops authentication immediately"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """ test that deactivated user can no longer authenticate"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        """ test that changing password drops cached user"""
+        self.client.get(ME_URL)
+        self.user.set_password('NewPass123')
+        self.user.save()
+
+        self.assertEqual(token_cache.stats()['size'], 0)
+
+    def test_change_in_other_process_invalidates(self):
+        """ test that a version bumped by another worker drops the entry """
+        self.client.get(ME_URL)
+        # another worker deactivates the user; its signals only reach the
+        # shared version, not this process' cache
+        get_user_model().objects.filter(pk = self.user.pk).update(
+            is_active = False
+        )
+        bump_user_version(self.user.pk)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stale_user_not_served(self):
+        """ test that the user endpoint reflects changes of other workers """
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk = self.user.pk).update(
+            name = 'Renamed'
+        )
+        bump_user_version(self.user.pk)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Renamed')
+
+    def test_change_during_lookup_not_cached(self):
+        """ test that a version bumped while the user is looked up drops
+        the entry made from it """
+        lookup = TokenAuthentication.authenticate_credentials
+
+        def racing_lookup(authentication, key):
+            user, token = lookup(authentication, key)
+            # another worker deactivates the user right after it was read
+            get_user_model().objects.filter(pk = self.user.pk).update(
+                is_active = False
+            )
+            bump_user_version(self.user.pk)
+            return user, token
+
+        with patch.object(TokenAuthentication, 'authenticate_credentials',
+                          racing_lookup):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,25 +1,30 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.routers import ReplicaReadMixin
+from core.throttling import ThrottledViewMixin
+
+from users.authentication import CachedTokenAuthentication
 from users.serializers import UserSerializer, AuthTokenSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(ThrottledViewMixin, generics.CreateAPIView):
     """ create new user in the system """
     serializer_class = UserSerializer
 
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(ThrottledViewMixin, ObtainAuthToken):
     """ create new token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ThrottledViewMixin, ReplicaReadMixin,
+                     generics.RetrieveUpdateAPIView):
     """ manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):